@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Benchmark the protocols of the mrjob sort and word count jobs with mrjob's inline runner.
+
+Each job and protocol runs twice in a separate process: once for the time, and once under cProfile
+for the share of CPU time spent in protocols, i.e. in calls into mrjob.protocol and common/mrprotocol.py
+from outside them. The number of output records and the total count are printed to check that
+the protocols give the same results.
+"""
+
+from __future__ import print_function, division
+import argparse
+import cProfile
+import multiprocessing
+import os
+import pstats
+import sys
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(root, 'sort', 'mrjob'))
+sys.path.append(os.path.join(root, 'wordcount', 'mrjob'))
+from sort import MRSort
+from wordcount import MRWordcount
+import mrjob.protocol
+import mrprotocol
+
+JOBS = {'sort': MRSort, 'wordcount': MRWordcount}
+
+def protocol_seconds(stats):
+    """
+    Return the cumulative seconds of calls into protocol modules from outside them.
+    """
+    fnames = set(os.path.splitext(os.path.abspath(module.__file__))[0] for module in [mrjob.protocol, mrprotocol])
+    is_protocol = lambda func: os.path.splitext(os.path.abspath(func[0]))[0] in fnames
+    seconds = 0.0
+    for (func, (_, _, _, _, callers)) in stats.stats.items():
+        if not is_protocol(func):
+            continue
+        seconds += sum(caller_stats[3] for (caller, caller_stats) in callers.items() if not is_protocol(caller))
+    return seconds
+
+def run(job_name, protocol, files_in, profile, queue):
+    """
+    Run a job with the inline runner and put its time, protocol time, and output totals on the queue.
+    With profile, time under cProfile.
+    """
+    job = JOBS[job_name](args=['-r', 'inline', '--no-conf', '--protocol', protocol] + files_in)
+    with job.make_runner() as runner:
+        profiler = cProfile.Profile() if profile else None
+        time_start = time.time()
+        if profile:
+            profiler.enable()
+        runner.run()
+        if profile:
+            profiler.disable()
+        seconds = time.time() - time_start
+        (records, total) = (0, 0)
+        for (_, count) in job.parse_output(runner.cat_output()):
+            records += 1
+            total += count
+    seconds_protocol = protocol_seconds(pstats.Stats(profiler)) if profile else None
+    queue.put((seconds, seconds_protocol, records, total))
+    return None
+
+def run_process(job_name, protocol, files_in, profile):
+    """
+    Run a job in its own process and return its results.
+    """
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=run, args=(job_name, protocol, files_in, profile, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def main(files_in, jobs, protocols):
+    """
+    Run each job with each protocol and print a comparison.
+    """
+    print(("{job:<10} {protocol:<8} {seconds:>9} {profiled:>9} {protocol_pct:>11} {records:>10} {total:>12}").format(
+        job='job', protocol='protocol', seconds='seconds', profiled='profiled',
+        protocol_pct='protocol_%', records='records', total='total'))
+    for job_name in jobs:
+        for protocol in protocols:
+            (seconds, _, records, total) = run_process(job_name, protocol, files_in, False)
+            (seconds_profiled, seconds_protocol, _, _) = run_process(job_name, protocol, files_in, True)
+            print(("{job:<10} {protocol:<8} {seconds:>9.2f} {profiled:>9.2f} {protocol_pct:>11.1f} {records:>10d} {total:>12d}").format(
+                job=job_name, protocol=protocol, seconds=seconds, profiled=seconds_profiled,
+                protocol_pct=100.0*seconds_protocol/seconds_profiled, records=records, total=total))
+    return None
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['jobs'] = sorted(JOBS)
+    arg_default_map['protocols'] = ['json', 'raw', 'binary']
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Benchmark protocols of the mrjob jobs with the inline runner.")
+    parser.add_argument('--files_in',
+                        nargs='+',
+                        required=True,
+                        help=("Input text files, e.g. from common/gen_zipf.py.\n"
+                              +"Example: --files_in /path/to/files/*.txt"))
+    parser.add_argument('--jobs',
+                        nargs='+',
+                        choices=sorted(JOBS),
+                        default=arg_default_map['jobs'],
+                        help=(("Jobs to run.\n"
+                               +"Default: {default}").format(default=arg_default_map['jobs'])))
+    parser.add_argument('--protocols',
+                        nargs='+',
+                        choices=sorted(mrprotocol.PROTOCOLS),
+                        default=arg_default_map['protocols'],
+                        help=(("Protocols to compare.\n"
+                               +"Default: {default}").format(default=arg_default_map['protocols'])))
+    args = parser.parse_args()
+    print(args)
+
+    main(files_in=args.files_in, jobs=args.jobs, protocols=args.protocols)
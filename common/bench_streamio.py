@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Microbenchmark records/s of the Hadoop streaming mappers, combiners, and reducers.
+Compare the scripts in the working tree with the scripts at an earlier git revision,
+e.g. before the scripts used streamio.
+"""
+
+from __future__ import print_function, division
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import streamio
+
+# Stages in pipeline order: (job, script, input).
+# Input 'file_in' is the text input, 'mapped' is mapper output, 'sorted' is sorted mapper output.
+STAGES = [('wordcount', 'mapper', 'file_in'),
+          ('wordcount', 'combiner', 'mapped'),
+          ('wordcount', 'reducer', 'sorted'),
+          ('sort', 'mapper', 'file_in'),
+          ('sort', 'combiner', 'mapped'),
+          ('sort', 'reducer', 'sorted')]
+
+def count_records(fname):
+    """
+    Count lines in a file.
+    """
+    num_records = 0
+    with open(fname, 'rb') as f_in:
+        for block in streamio.read_blocks(f_in):
+            num_records += block.count(b'\n')
+    return num_records
+
+def checkout_scripts(repo_dir, rev, tmp_dir):
+    """
+    Write the streaming scripts and the common directory they import from at a git revision into tmp_dir,
+    keeping the repository layout. Return the directory.
+    """
+    rev_dir = os.path.join(tmp_dir, rev.replace('/', '_'))
+    for (job, script, _) in STAGES:
+        path = os.path.join(job, 'hadoop_streaming', script+'.py')
+        source = subprocess.check_output(['git', 'show', rev+':'+path], cwd=repo_dir)
+        fpath = os.path.join(rev_dir, path)
+        if not os.path.isdir(os.path.dirname(fpath)):
+            os.makedirs(os.path.dirname(fpath))
+        with open(fpath, 'wb') as f_out:
+            f_out.write(source)
+    # Scripts import modules of the common directory, e.g. streamio, spill, and runlength,
+    # so extract the revision's whole common directory. Older revisions may have none.
+    try:
+        archive = subprocess.check_output(['git', 'archive', '--format=tar', rev, 'common'], cwd=repo_dir,
+                                          stderr=open(os.devnull, 'w'))
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(rev_dir)
+    except subprocess.CalledProcessError:
+        pass
+    return rev_dir
+
+def run_script(fpath, file_in, file_out=os.devnull):
+    """
+    Run a streaming script with file_in as standard input. Return wall time in seconds.
+    """
+    with open(file_in, 'rb') as f_in, open(file_out, 'wb') as f_out:
+        time_start = time.time()
+        subprocess.check_call([sys.executable, fpath], stdin=f_in, stdout=f_out)
+        time_elapsed = time.time() - time_start
+    return time_elapsed
+
+def main(args):
+    """
+    Prepare the inputs of every stage, then time each stage for each version of the scripts.
+    """
+    repo_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    tmp_dir = tempfile.mkdtemp(dir=args.tmp_dir)
+    try:
+        versions = [('working tree', repo_dir)]
+        if args.before_rev is not None:
+            versions.insert(0, (args.before_rev, checkout_scripts(repo_dir, args.before_rev, tmp_dir)))
+        # Prepare stage inputs with the working tree mappers and the system sort.
+        inputs = {}
+        jobs = sorted(set(job for (job, _, _) in STAGES))
+        if args.jobs is not None:
+            jobs = [job for job in jobs if job in args.jobs]
+        for job in jobs:
+            inputs[(job, 'file_in')] = args.file_in
+            mapped = os.path.join(tmp_dir, job+'_mapped.txt')
+            run_script(os.path.join(repo_dir, job, 'hadoop_streaming', 'mapper.py'), args.file_in, mapped)
+            inputs[(job, 'mapped')] = mapped
+            sorted_ = os.path.join(tmp_dir, job+'_sorted.txt')
+            env = dict(os.environ, LC_ALL='C')
+            subprocess.check_call(['sort', '-T', tmp_dir, '-o', sorted_, mapped], env=env)
+            inputs[(job, 'sorted')] = sorted_
+        print(("{job:<10} {script:<9} {version:<16} {records:>12} {mbytes:>10} {seconds:>9} {rate:>12}").format(
+            job='job', script='script', version='version', records='records',
+            mbytes='MB', seconds='seconds', rate='records/s'))
+        for (job, script, input_name) in STAGES:
+            if job not in jobs:
+                continue
+            file_in = inputs[(job, input_name)]
+            num_records = count_records(file_in)
+            mbytes = os.path.getsize(file_in) / 10**6
+            for (version, version_dir) in versions:
+                fpath = os.path.join(version_dir, job, 'hadoop_streaming', script+'.py')
+                seconds = min(run_script(fpath, file_in) for _ in range(args.repeat))
+                print(("{job:<10} {script:<9} {version:<16} {records:>12d} {mbytes:>10.1f}"
+                       +" {seconds:>9.2f} {rate:>12.0f}").format(
+                           job=job, script=script, version=version[:16], records=num_records,
+                           mbytes=mbytes, seconds=seconds, rate=num_records/seconds))
+    finally:
+        shutil.rmtree(tmp_dir)
+    return None
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['before_rev'] = None
+    arg_default_map['jobs'] = None
+    arg_default_map['repeat'] = 1
+    arg_default_map['tmp_dir'] = None
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Microbenchmark records/s of the Hadoop streaming scripts.")
+    parser.add_argument('--file_in',
+                        required=True,
+                        help=("Text input file, e.g. a multi-GB data set.\n"
+                              +"Example: --file_in /tmp/1-00GB.txt"))
+    parser.add_argument('--before_rev',
+                        default=arg_default_map['before_rev'],
+                        help=(("Git revision of the scripts to compare against the working tree.\n"
+                               +"Example: --before_rev HEAD~1\n"
+                               +"Default: {default}").format(default=arg_default_map['before_rev'])))
+    parser.add_argument('--jobs',
+                        nargs='+',
+                        choices=['wordcount', 'sort'],
+                        default=arg_default_map['jobs'],
+                        help=(("Jobs to benchmark.\n"
+                               +"Default: {default} (all)").format(default=arg_default_map['jobs'])))
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=arg_default_map['repeat'],
+                        help=(("Repeat each run and keep the fastest.\n"
+                               +"Default: {default}").format(default=arg_default_map['repeat'])))
+    parser.add_argument('--tmp_dir',
+                        default=arg_default_map['tmp_dir'],
+                        help=(("Directory for intermediate files.\n"
+                               +"Default: {default} (system temporary directory)").format(default=arg_default_map['tmp_dir'])))
+    args = parser.parse_args()
+    print(args)
+
+    main(args)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Benchmark top-K word counting with Space-Saving sketches against exact counting.
+Input files are split into maps as by localdisco.py. Each map counts its words,
+exactly in a Counter or approximately in a sketch, then the maps are merged as by a reducer.
+Report time and peak RSS of each in a separate process, and the accuracy of the sketches:
+recall of the exact top K, relative error of the counts, and how many top words are guaranteed.
+"""
+
+from __future__ import print_function, division
+import argparse
+import collections
+import multiprocessing
+import os
+import resource
+import time
+import topk
+from localdisco import split_inputs, read_split
+
+def count_exact(splits, top_k, capacity):
+    """
+    Count all words of each map in a Counter, merge the Counters, and return the top words.
+    """
+    totals = collections.Counter()
+    for split in splits:
+        counter = collections.Counter()
+        for line in read_split(*split):
+            counter.update(line.split())
+        totals.update(counter)
+    return [(word, count, 0) for (word, count) in totals.most_common(top_k)]
+
+def count_sketch(splits, top_k, capacity):
+    """
+    Count the words of each map in a sketch, merge the sketches, and return the top words.
+    """
+    sketches = []
+    for split in splits:
+        sketch = topk.SpaceSaving(capacity=capacity)
+        for line in read_split(*split):
+            sketch.update(line.split())
+        sketches.append(sketch)
+    return topk.merge(sketches, capacity=capacity).top(top_k)
+
+def run(impl, splits, top_k, capacity, queue):
+    """
+    Run one implementation and put its top words, time, and peak RSS on the queue.
+    """
+    count_fn = count_exact if impl == 'exact' else count_sketch
+    time_start = time.time()
+    rows = count_fn(splits, top_k, capacity)
+    seconds = time.time() - time_start
+    # Linux reports ru_maxrss in KB.
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    queue.put((rows, seconds, peak_rss_mb))
+    return None
+
+def accuracy(rows, exact_rows, top_k):
+    """
+    Return the recall of the exact top K, the mean and max relative error of the counts,
+    and the number of the top K guaranteed to be in the true top K.
+    rows has one row more than the top K to test the guarantee.
+    """
+    exact = dict((word, count) for (word, count, _) in exact_rows[:top_k])
+    rel_errs = [abs(count - exact[word]) / exact[word] for (word, count, _) in rows[:top_k] if word in exact]
+    recall = len(rel_errs) / max(1, len(exact))
+    mean_err = sum(rel_errs) / max(1, len(rel_errs))
+    max_err = max(rel_errs) if len(rel_errs) > 0 else 0.0
+    return (recall, mean_err, max_err, topk.guaranteed(rows, top_k))
+
+def main(args):
+    """
+    Run exact counting and sketches of each capacity in their own process and print a comparison.
+    """
+    total_bytes = sum(os.path.getsize(fname) for fname in args.files_in)
+    splits = split_inputs(args.files_in, max(1, total_bytes // args.num_maps))
+    print(("{impl:<8} {capacity:>9} {seconds:>9} {rss:>12} {recall:>8} {mean_err:>10} {max_err:>10} {guaranteed:>10}").format(
+        impl='count', capacity='capacity', seconds='seconds', rss='peak RSS MB',
+        recall='recall', mean_err='mean_err', max_err='max_err', guaranteed='guaranteed'))
+    exact_rows = None
+    for (impl, capacity) in [('exact', 0)] + [('sketch', capacity) for capacity in args.capacities]:
+        queue = multiprocessing.Queue()
+        # Ask for one more row than K to check which of the top K are guaranteed.
+        proc = multiprocessing.Process(target=run, args=(impl, splits, args.top_k + 1, capacity, queue))
+        proc.start()
+        (rows, seconds, peak_rss_mb) = queue.get()
+        proc.join()
+        if exact_rows is None:
+            exact_rows = rows
+        (recall, mean_err, max_err, num_guaranteed) = accuracy(rows, exact_rows, args.top_k)
+        print(("{impl:<8} {capacity:>9d} {seconds:>9.2f} {rss:>12.1f} {recall:>8.4f} {mean_err:>10.2e} {max_err:>10.2e} {guaranteed:>10d}").format(
+            impl=impl, capacity=capacity, seconds=seconds, rss=peak_rss_mb,
+            recall=recall, mean_err=mean_err, max_err=max_err, guaranteed=num_guaranteed))
+    return None
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['top_k'] = 1000
+    arg_default_map['capacities'] = [2**12, 2**14, 2**16]
+    arg_default_map['num_maps'] = 8
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Benchmark top-K word counting with sketches against exact counting.")
+    parser.add_argument('--files_in',
+                        nargs='+',
+                        required=True,
+                        help=("Input text files.\n"
+                              +"Example: --files_in /path/to/files/*.txt"))
+    parser.add_argument('--top_k',
+                        type=int,
+                        default=arg_default_map['top_k'],
+                        help=(("Number of most frequent words.\n"
+                               +"Default: {default}").format(default=arg_default_map['top_k'])))
+    parser.add_argument('--capacities',
+                        nargs='+',
+                        type=int,
+                        default=arg_default_map['capacities'],
+                        help=(("Counters per sketch. One run per capacity.\n"
+                               +"Default: {default}").format(default=arg_default_map['capacities'])))
+    parser.add_argument('--num_maps',
+                        type=int,
+                        default=arg_default_map['num_maps'],
+                        help=(("Number of line-aligned input splits, one sketch per split.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_maps'])))
+    args = parser.parse_args()
+    print(args)
+
+    main(args)
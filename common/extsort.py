@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+External merge sort of lines within a memory budget.
+
+Collect lines in a list. Once the list's estimated size exceeds a memory budget,
+sort it and write it to a temporary file as a sorted run, then empty it.
+At end, merge the runs with the sorted remainder of the list with a heap.
+Lines are bytes and compare bytewise, as by 'LC_ALL=C sort'.
+"""
+
+from __future__ import print_function
+import heapq
+import marshal
+import sys
+import tempfile
+
+# Estimated bytes per line beyond its contents:
+# the bytes object header and the list slot.
+LINE_BYTES = sys.getsizeof(b'') + 8
+
+# Lines per marshal record in a run file.
+# Merging holds one record per run in memory.
+RUN_BATCH = 2**12
+
+# Bytes of lines read per batch by ExternalSort.read.
+READ_BYTES = 2**20
+
+def write_run(f_run, lines):
+    """
+    Write sorted lines to a run file in batches.
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= RUN_BATCH:
+            marshal.dump(batch, f_run)
+            batch = []
+    if len(batch) > 0:
+        marshal.dump(batch, f_run)
+    f_run.flush()
+    f_run.seek(0)
+    return None
+
+def read_run(f_run):
+    """
+    Yield lines from a run file.
+    """
+    while True:
+        try:
+            batch = marshal.load(f_run)
+        except EOFError:
+            break
+        for line in batch:
+            yield line
+    return
+
+class ExternalSort(object):
+    """
+    Sort lines within a memory budget, spilling sorted runs to disk.
+    Lines are kept exactly, including newlines, so a last line without a newline stays as is.
+    """
+
+    def __init__(self, max_bytes=2**30, max_runs=64, tmp_dir=None):
+        """
+        Initialize with a memory budget in bytes for the lines,
+        a maximum number of open run files, and a directory for run files.
+        """
+        self.max_bytes = max_bytes
+        self.max_runs = max_runs
+        self.tmp_dir = tmp_dir
+        self.num_spills = 0
+        self._lines = []
+        self._bytes = 0
+        self._runs = []
+        return None
+
+    def __enter__(self):
+        """
+        Enter context.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Close run files on exit from context.
+        """
+        self.close()
+        return False
+
+    def extend(self, lines):
+        """
+        Add a list of lines.
+        """
+        self._lines.extend(lines)
+        self._bytes += sum(map(len, lines)) + LINE_BYTES * len(lines)
+        if self._bytes >= self.max_bytes:
+            self.spill()
+        return None
+
+    def read(self, f_in):
+        """
+        Add all lines of a binary file.
+        """
+        while True:
+            lines = f_in.readlines(READ_BYTES)
+            if not lines:
+                break
+            self.extend(lines)
+        return None
+
+    def spill(self):
+        """
+        Sort the lines, write them to a run file, and empty the list.
+        Merge the run files into one if there are max_runs of them.
+        """
+        if len(self._runs) >= self.max_runs:
+            f_run = tempfile.TemporaryFile(dir=self.tmp_dir)
+            write_run(f_run, heapq.merge(*[read_run(f_old) for f_old in self._runs]))
+            for f_old in self._runs:
+                f_old.close()
+            self._runs = [f_run]
+        self._lines.sort()
+        f_run = tempfile.TemporaryFile(dir=self.tmp_dir)
+        write_run(f_run, self._lines)
+        self._runs.append(f_run)
+        self._lines = []
+        self._bytes = 0
+        self.num_spills += 1
+        return None
+
+    def lines(self):
+        """
+        Return an iterator over all lines in sorted order.
+        Consumes the sorter.
+        """
+        lines = self._lines
+        lines.sort()
+        self._lines = []
+        self._bytes = 0
+        if len(self._runs) == 0:
+            return iter(lines)
+        runs = [read_run(f_run) for f_run in self._runs]
+        runs.append(lines)
+        return heapq.merge(*runs)
+
+    def close(self):
+        """
+        Close and delete the run files.
+        """
+        for f_run in self._runs:
+            f_run.close()
+        self._runs = []
+        return None
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+"""
+Generate a synthetic text corpus with Zipf-distributed words
+as nested data sets, e.g. 1, 3, 10, 30, 100 GB, like load_bz2.py --sets_gb.
+
+The corpus is written as fixed-size shards. Shard i is generated from (seed, i) alone,
+so shards can be written in parallel and the same seed always gives the same corpus.
+A data set of S GB is the first round(S GB / shard size) shards, at least one,
+so smaller data sets are included in larger ones and the largest uses every shard.
+"""
+
+from __future__ import print_function, division
+import argparse
+import json
+import multiprocessing
+import os
+import numpy as np
+
+# Words are drawn in chunks to bound memory.
+CHUNK_WORDS = 2**20
+BYTES_PER_GB = 10**9
+MANIFEST = 'zipf_corpus.json'
+# Rounds of drawing words without a new word before the vocabulary is taken to be exhausted.
+MAX_VOCAB_ROUNDS = 100
+
+# Vocabularies made by this process, keyed by parameters, since every shard uses the same one.
+_vocab_cache = {}
+
+def make_vocab(seed, vocab_size, word_len_mean):
+    """
+    Make vocab_size distinct lowercase words with lengths 1 + Poisson(word_len_mean - 1).
+    Rank words by length so that the most frequent words are the shortest, as in natural text.
+    Return the words as a contiguous buffer of 'word ' entries with offsets and lengths.
+    Raise ValueError if MAX_VOCAB_ROUNDS rounds draw no new word, e.g. vocab_size > 26 with word_len_mean 1.
+    """
+    rng = np.random.RandomState(seed)
+    words = set()
+    vocab = []
+    stale_rounds = 0
+    while len(vocab) < vocab_size:
+        if stale_rounds >= MAX_VOCAB_ROUNDS:
+            raise ValueError(("Found only {num} distinct words of vocab_size = {vocab_size}"
+                              +" with word_len_mean = {word_len_mean}.").format(
+                                  num=len(vocab), vocab_size=vocab_size, word_len_mean=word_len_mean))
+        num_before = len(vocab)
+        num = vocab_size - len(vocab)
+        lens = 1 + rng.poisson(word_len_mean - 1, size=num)
+        letters = rng.randint(ord('a'), ord('z') + 1, size=lens.sum()).astype(np.uint8).tobytes()
+        ends = np.cumsum(lens)
+        for (start, end) in zip(ends - lens, ends):
+            word = letters[start:end]
+            if word not in words:
+                words.add(word)
+                vocab.append(word)
+        stale_rounds = stale_rounds + 1 if len(vocab) == num_before else 0
+    vocab.sort(key=len)
+    lens = np.array([len(word) + 1 for word in vocab], dtype=np.int64)
+    offsets = np.zeros(vocab_size, dtype=np.int64)
+    offsets[1:] = np.cumsum(lens)[:-1]
+    buf = np.frombuffer(b' '.join(vocab) + b' ', dtype=np.uint8)
+    return (buf, offsets, lens)
+
+def zipf_cdf(vocab_size, zipf_s):
+    """
+    Return the CDF of a Zipf distribution with exponent zipf_s over ranks 1..vocab_size.
+    """
+    weights = 1.0 / np.arange(1, vocab_size + 1, dtype=np.float64)**zipf_s
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    return cdf
+
+def line_ends(rng, num_words, words_per_line, line_dist):
+    """
+    Return a boolean array marking the words that end a line.
+    Line lengths in words are 'fixed', 1 + 'poisson'(mean - 1), or 'geometric' with the given mean.
+    """
+    # Draw more line lengths than needed, then keep those within num_words.
+    num_lines = num_words // max(1, int(words_per_line // 2)) + 2
+    if line_dist == 'fixed':
+        lens = np.full(num_lines, max(1, int(round(words_per_line))), dtype=np.int64)
+    elif line_dist == 'poisson':
+        lens = 1 + rng.poisson(words_per_line - 1, size=num_lines)
+    elif line_dist == 'geometric':
+        lens = rng.geometric(1.0 / words_per_line, size=num_lines)
+    else:
+        raise ValueError(("Unknown line length distribution: {dist}").format(dist=line_dist))
+    ends = np.cumsum(lens) - 1
+    is_end = np.zeros(num_words, dtype=bool)
+    is_end[ends[ends < num_words]] = True
+    is_end[-1] = True
+    return is_end
+
+def gen_chunk(rng, vocab, cdf, num_words, words_per_line, line_dist):
+    """
+    Generate num_words Zipf-distributed words in lines. Return the text as bytes.
+    """
+    (buf, offsets, lens) = vocab
+    # Searching the CDF with sorted uniforms is cache-friendly and over twice as fast.
+    # Shuffling the ranks afterward restores independent draws.
+    uniforms = rng.random_sample(num_words)
+    uniforms.sort()
+    ranks = np.searchsorted(cdf, uniforms, side='right')
+    np.minimum(ranks, len(cdf) - 1, out=ranks)
+    rng.shuffle(ranks)
+    word_lens = lens[ranks]
+    # Gather the bytes of each word and its trailing space without a Python loop:
+    # output byte j of word w comes from buf[offsets[w] + j].
+    out_ends = np.cumsum(word_lens)
+    out_starts = out_ends - word_lens
+    src = np.repeat(offsets[ranks] - out_starts, word_lens) + np.arange(out_ends[-1], dtype=np.int64)
+    text = buf[src]
+    # Replace the trailing space of the last word of each line with a newline.
+    text[out_ends[line_ends(rng, num_words, words_per_line, line_dist)] - 1] = ord('\n')
+    return text.tobytes()
+
+def gen_shard(args):
+    """
+    Write shard shard_id of about shard_bytes bytes, ending at a line boundary.
+    Return the shard file and its size.
+    """
+    (fshard, shard_id, seed, shard_bytes, vocab_size, zipf_s, word_len_mean,
+     words_per_line, line_dist) = args
+    key = (seed, vocab_size, word_len_mean)
+    if key not in _vocab_cache:
+        _vocab_cache.clear()
+        _vocab_cache[key] = make_vocab(seed, vocab_size, word_len_mean)
+    vocab = _vocab_cache[key]
+    cdf = zipf_cdf(vocab_size, zipf_s)
+    rng = np.random.RandomState([seed, shard_id])
+    size = 0
+    with open(fshard, 'wb') as f_out:
+        while size < shard_bytes:
+            text = gen_chunk(rng, vocab, cdf, CHUNK_WORDS, words_per_line, line_dist)
+            if size + len(text) > shard_bytes:
+                # Truncate the last chunk at the first line end past shard_bytes.
+                idx = text.find(b'\n', shard_bytes - size - 1)
+                text = text[:idx+1] if idx >= 0 else text
+            f_out.write(text)
+            size += len(text)
+    return (fshard, size)
+
+def set_shards(size_gb, shard_bytes):
+    """
+    Return the number of shards of a data set of size_gb GB: the nearest to its size, and at least one.
+    Shards end at the first line end past shard_bytes, so the data set is within half a shard of size_gb.
+    """
+    return max(1, int(np.floor(size_gb * BYTES_PER_GB / shard_bytes + 0.5)))
+
+def main(args):
+    """
+    Generate the shards in parallel, then link them into nested data set directories.
+    """
+    params = dict((key, getattr(args, key)) for key in
+                  ['seed', 'shard_mb', 'vocab_size', 'zipf_s', 'word_len_mean', 'words_per_line', 'line_dist'])
+    # Reuse shards of a previous run only if they were generated with the same parameters.
+    fmanifest = os.path.join(args.data_dir, MANIFEST)
+    manifest = {'params': params, 'shards': {}}
+    if os.path.isfile(fmanifest):
+        with open(fmanifest, 'r') as fp:
+            old_manifest = json.load(fp)
+        if old_manifest['params'] == params:
+            manifest = old_manifest
+        else:
+            raise IOError(("Data directory has shards generated with other parameters:\n"
+                           +" {fmanifest}\n {params}").format(fmanifest=fmanifest, params=old_manifest['params']))
+    shard_bytes = int(args.shard_mb * 10**6)
+    num_shards = max(set_shards(size_gb, shard_bytes) for size_gb in args.sets_gb)
+    gen_args = []
+    for shard_id in range(num_shards):
+        fshard = os.path.join(args.data_dir, ("shard_{shard_id:06d}.txt").format(shard_id=shard_id))
+        if ((os.path.basename(fshard) in manifest['shards']) and os.path.isfile(fshard)
+            and (os.path.getsize(fshard) == manifest['shards'][os.path.basename(fshard)])):
+            if args.verbose >= 2: print(("INFO: Skipping shard. File already exists:\n {fshard}").format(fshard=fshard))
+            continue
+        gen_args.append((fshard, shard_id, args.seed, shard_bytes, args.vocab_size, args.zipf_s,
+                         args.word_len_mean, args.words_per_line, args.line_dist))
+    if args.verbose >= 1: print(("INFO: Generating {num} shards in {data_dir}").format(num=len(gen_args),
+                                                                                      data_dir=args.data_dir))
+    pool = multiprocessing.Pool(processes=args.num_procs)
+    try:
+        for (fshard, size) in pool.imap_unordered(gen_shard, gen_args):
+            manifest['shards'][os.path.basename(fshard)] = size
+            if args.verbose >= 2: print(("INFO: Wrote shard:\n {fshard}").format(fshard=fshard))
+    finally:
+        pool.close()
+        pool.join()
+    with open(fmanifest, 'w') as fp:
+        json.dump(manifest, fp, sort_keys=True, indent=4)
+    # Nest the data sets: each data set is the first shards nearest its size.
+    fshards = sorted(manifest['shards'])
+    for size_gb in sorted(args.sets_gb):
+        shards = fshards[:set_shards(size_gb, shard_bytes)]
+        tot = sum(manifest['shards'][fshard] for fshard in shards)
+        # Label the dataset with the actual dataset size.
+        set_dir = os.path.join(args.data_dir, ("{tot:.2f}GB").format(tot=tot / BYTES_PER_GB).replace('.', '-'))
+        if not os.path.isdir(set_dir):
+            os.makedirs(set_dir)
+        for fshard in shards:
+            flink = os.path.join(set_dir, fshard)
+            if not os.path.lexists(flink):
+                os.symlink(os.path.join('..', fshard), flink)
+        if args.verbose >= 1: print(("INFO: Data set of {num} shards:\n {set_dir}").format(num=len(shards),
+                                                                                        set_dir=set_dir))
+    return None
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['data_dir'] = '/tmp'
+    arg_default_map['sets_gb'] = [1]
+    arg_default_map['seed'] = 0
+    arg_default_map['shard_mb'] = 64
+    arg_default_map['vocab_size'] = 10**6
+    arg_default_map['zipf_s'] = 1.0
+    arg_default_map['word_len_mean'] = 7.0
+    arg_default_map['words_per_line'] = 12.0
+    arg_default_map['line_dist'] = 'poisson'
+    arg_default_map['num_procs'] = multiprocessing.cpu_count()
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Generate nested data sets of Zipf-distributed words.")
+    parser.add_argument('--data_dir',
+                        default=arg_default_map['data_dir'],
+                        help=(("Directory for shards and data set directories.\n"
+                               +"Default: {default}").format(default=arg_default_map['data_dir'])))
+    parser.add_argument('--sets_gb',
+                        nargs='+',
+                        type=float,
+                        default=arg_default_map['sets_gb'],
+                        help=(("Sizes of data sets in GB.\n"
+                               +"Example: --sets_gb 1 3 10 30 100\n"
+                               +"Default: {default}").format(default=arg_default_map['sets_gb'])))
+    parser.add_argument('--seed',
+                        type=int,
+                        default=arg_default_map['seed'],
+                        help=(("Random seed. The same seed gives the same corpus.\n"
+                               +"Default: {default}").format(default=arg_default_map['seed'])))
+    parser.add_argument('--shard_mb',
+                        type=float,
+                        default=arg_default_map['shard_mb'],
+                        help=(("Size of each shard in MB. Changing it changes the corpus.\n"
+                               +"Default: {default}").format(default=arg_default_map['shard_mb'])))
+    parser.add_argument('--vocab_size',
+                        type=int,
+                        default=arg_default_map['vocab_size'],
+                        help=(("Number of distinct words.\n"
+                               +"Default: {default}").format(default=arg_default_map['vocab_size'])))
+    parser.add_argument('--zipf_s',
+                        type=float,
+                        default=arg_default_map['zipf_s'],
+                        help=(("Zipf exponent: frequency of the word of rank k is proportional to 1/k**zipf_s.\n"
+                               +"Default: {default}").format(default=arg_default_map['zipf_s'])))
+    parser.add_argument('--word_len_mean',
+                        type=float,
+                        default=arg_default_map['word_len_mean'],
+                        help=(("Mean length of vocabulary words in characters.\n"
+                               +"Default: {default}").format(default=arg_default_map['word_len_mean'])))
+    parser.add_argument('--words_per_line',
+                        type=float,
+                        default=arg_default_map['words_per_line'],
+                        help=(("Mean number of words per line.\n"
+                               +"Default: {default}").format(default=arg_default_map['words_per_line'])))
+    parser.add_argument('--line_dist',
+                        choices=['poisson', 'geometric', 'fixed'],
+                        default=arg_default_map['line_dist'],
+                        help=(("Distribution of words per line.\n"
+                               +"Default: {default}").format(default=arg_default_map['line_dist'])))
+    parser.add_argument('--num_procs',
+                        type=int,
+                        default=arg_default_map['num_procs'],
+                        help=(("Number of processes writing shards in parallel.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_procs'])))
+    parser.add_argument('--verbose',
+                        '-v',
+                        action='count',
+                        default=0,
+                        help=("Print 'INFO:' messages to stdout. -vv for more verbosity."))
+    args = parser.parse_args()
+    if args.verbose >= 1:
+        print("INFO: Arguments:")
+        for arg in args.__dict__:
+            print('', arg, args.__dict__[arg])
+    if not os.path.isdir(args.data_dir):
+        raise IOError(("Directory does not exist: data_dir = {data_dir}").format(data_dir=args.data_dir))
+    main(args)
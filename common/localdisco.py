@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+"""
+Run Disco Job classes locally on a process pool, without a Disco master or DDFS.
+
+The job's map, combiner, and reduce methods run unchanged:
+- Map: Input text files are split at line boundaries, and map tasks read
+  the lines of each split as chain_reader reads the lines of a chunked DDFS tag.
+  Map output is partitioned and written to local disk, through the job's combiner if any.
+- Shuffle: The map outputs of each partition are gathered into one file.
+- Reduce: Each partition is reduced by a separate task.
+Per-phase and per-task timings are returned in the same shape as
+plot/utils.disco_events_to_dict returns for a Disco job.
+"""
+
+from __future__ import print_function, division
+import argparse
+import datetime as dt
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from partition import hash_partition
+
+# Files of (key, value) records end with RECORDS_EXT. Records are pickled in batches.
+RECORDS_EXT = '.records'
+RECORDS_BATCH = 2**12
+
+def split_inputs(files_in, split_bytes):
+    """
+    Split input files into map inputs.
+    Text files are split into line-aligned (fname, start, stop) byte ranges of about split_bytes.
+    Records files, e.g. results of a previous job, are not split: (fname, 0, None).
+    """
+    splits = []
+    for fname in files_in:
+        if fname.endswith(RECORDS_EXT):
+            splits.append((fname, 0, None))
+            continue
+        size = os.path.getsize(fname)
+        with open(fname, 'rb') as f_in:
+            start = 0
+            while start < size:
+                # Seek to the approximate end then advance to the next line.
+                f_in.seek(min(start + split_bytes, size))
+                f_in.readline()
+                stop = min(f_in.tell(), size)
+                splits.append((fname, start, stop))
+                start = stop
+    return splits
+
+def read_split(fname, start, stop):
+    """
+    Yield the entries of a map input:
+    lines, including newlines, of a text file byte range, or records of a records file.
+    """
+    if stop is None:
+        for record in read_records(fname):
+            yield record
+        return
+    with open(fname, 'rb') as f_in:
+        f_in.seek(start)
+        pos = start
+        for line in f_in:
+            yield line
+            pos += len(line)
+            if pos >= stop:
+                break
+    return
+
+def read_records(fname):
+    """
+    Yield (key, value) records from a records file.
+    """
+    with open(fname, 'rb') as f_in:
+        while True:
+            try:
+                batch = pickle.load(f_in)
+            except EOFError:
+                break
+            for record in batch:
+                yield record
+    return
+
+def result_iterator(results):
+    """
+    Yield (key, value) records from a list of records files,
+    as disco.core.result_iterator does for the results of a Disco job.
+    """
+    for fname in results:
+        for record in read_records(fname):
+            yield record
+    return
+
+class RecordWriter(object):
+    """
+    Write (key, value) records to a records file in pickled batches.
+    Has the add() method of Disco task outputs.
+    """
+
+    def __init__(self, fname):
+        """
+        Initialize.
+        """
+        self.fname = fname
+        self.num_records = 0
+        self._file = open(fname, 'wb')
+        self._batch = []
+        return None
+
+    def add(self, key, value):
+        """
+        Add a record.
+        """
+        self._batch.append((key, value))
+        self.num_records += 1
+        if len(self._batch) >= RECORDS_BATCH:
+            pickle.dump(self._batch, self._file, pickle.HIGHEST_PROTOCOL)
+            self._batch = []
+        return None
+
+    def close(self):
+        """
+        Write the last batch and close the file.
+        """
+        if len(self._batch) > 0:
+            pickle.dump(self._batch, self._file, pickle.HIGHEST_PROTOCOL)
+            self._batch = []
+        self._file.close()
+        return None
+
+def task_event(time_start, time_finish, num_entries=None):
+    """
+    Return the event dict of a task.
+    """
+    event = {}
+    event['node_id'] = socket.gethostname()
+    event['time_start'] = time_start
+    event['time_finish'] = time_finish
+    event['time_elapsed'] = time_finish - time_start
+    if num_entries is not None:
+        event['num_entries'] = num_entries
+    return event
+
+def map_task(args):
+    """
+    Map one input split, partition the output, and combine it if the job has a combiner.
+    Return the partition files and the task's event dict.
+    """
+    (job_class, split, map_id, partitions, partition, params, tmp_dir) = args
+    time_start = dt.datetime.now()
+    job = job_class()
+    combiner = getattr(job_class, 'combiner', None)
+    outs = [RecordWriter(os.path.join(tmp_dir, "map_{map_id}-part_{part}{ext}").format(
+        map_id=map_id, part=part, ext=RECORDS_EXT)) for part in range(partitions)]
+    bufs = [{} for _ in range(partitions)]
+    num_entries = 0
+    for entry in read_split(*split):
+        num_entries += 1
+        for (key, value) in job.map(entry, params):
+            part = partition(key, partitions, params)
+            if combiner is None:
+                outs[part].add(key, value)
+            else:
+                ret = job.combiner(key, value, bufs[part], False, params)
+                if ret:
+                    for (ckey, cvalue) in ret:
+                        outs[part].add(ckey, cvalue)
+    if combiner is not None:
+        for part in range(partitions):
+            ret = job.combiner(None, None, bufs[part], True, params)
+            if ret:
+                for (ckey, cvalue) in ret:
+                    outs[part].add(ckey, cvalue)
+    for out in outs:
+        out.close()
+    time_finish = dt.datetime.now()
+    return ([out.fname for out in outs], task_event(time_start, time_finish, num_entries))
+
+def shuffle_task(args):
+    """
+    Gather the map outputs of a partition into one file. Return the file.
+    """
+    (fnames, fout) = args
+    with open(fout, 'wb') as f_out:
+        for fname in fnames:
+            with open(fname, 'rb') as f_in:
+                shutil.copyfileobj(f_in, f_out, 2**20)
+            os.remove(fname)
+    return fout
+
+def count_iter(rows_iter, counter):
+    """
+    Yield rows and count them in counter[0].
+    """
+    for row in rows_iter:
+        counter[0] += 1
+        yield row
+    return
+
+def reduce_task(args):
+    """
+    Reduce one partition. Return the result file and the task's event dict.
+    """
+    (job_class, fin, fout, params) = args
+    time_start = dt.datetime.now()
+    job = job_class()
+    out = RecordWriter(fout)
+    counter = [0]
+    job.reduce(count_iter(read_records(fin), counter), out, params)
+    out.close()
+    os.remove(fin)
+    time_finish = dt.datetime.now()
+    return (fout, task_event(time_start, time_finish, counter[0]))
+
+def phase_event(phase, time_start, time_finish, task_events):
+    """
+    Return the event dict of a phase with task events keyed by e.g. 'map_0' and tallies over tasks.
+    """
+    event = {}
+    event['node_id'] = 'master'
+    event['time_start'] = time_start
+    event['time_finish'] = time_finish
+    event['time_elapsed'] = time_finish - time_start
+    event['num_entries'] = 0
+    list_nodes = []
+    for (task_id, task_event_) in enumerate(task_events):
+        event[("{phase}_{task_id}").format(phase=phase, task_id=task_id)] = task_event_
+        event['num_entries'] += task_event_['num_entries']
+        if task_event_['node_id'] not in list_nodes:
+            list_nodes.append(task_event_['node_id'])
+    event[("num_{phase}s").format(phase=phase)] = len(task_events)
+    event['num_nodes'] = len(list_nodes)
+    return event
+
+def run(job_class, files_in, results_dir, params=None, partitions=None, partition=None,
+        num_procs=None, split_mb=64):
+    """
+    Run a Disco Job class on local files with a process pool.
+    partitions defaults to the job class's attribute, else 1.
+    Return the list of result files, one per partition, and the events dict.
+    """
+    if partitions is None:
+        partitions = getattr(job_class, 'partitions', None) or 1
+    if partition is None:
+        partition = hash_partition
+    if num_procs is None:
+        num_procs = multiprocessing.cpu_count()
+    if not os.path.isdir(results_dir):
+        os.makedirs(results_dir)
+    tmp_dir = tempfile.mkdtemp(dir=results_dir)
+    pool = multiprocessing.Pool(processes=num_procs)
+    events = {}
+    try:
+        events['node_id'] = 'master'
+        events['time_start'] = dt.datetime.now()
+        # Map
+        time_start = dt.datetime.now()
+        splits = split_inputs(files_in, int(split_mb*2**20))
+        map_args = [(job_class, split, map_id, partitions, partition, params, tmp_dir)
+                    for (map_id, split) in enumerate(splits)]
+        map_outs = pool.map(map_task, map_args, chunksize=1)
+        # Shuffle within map phase: gather map outputs by partition.
+        shuffle_start = dt.datetime.now()
+        shuffle_args = [([fnames[part] for (fnames, _) in map_outs],
+                         os.path.join(tmp_dir, ("part_{part}{ext}").format(part=part, ext=RECORDS_EXT)))
+                        for part in range(partitions)]
+        part_files = pool.map(shuffle_task, shuffle_args, chunksize=1)
+        time_finish = dt.datetime.now()
+        events['map'] = phase_event('map', time_start, time_finish, [event for (_, event) in map_outs])
+        events['map']['shuffle'] = task_event(shuffle_start, time_finish)
+        events['map']['shuffle']['node_id'] = 'master'
+        # Reduce
+        time_start = dt.datetime.now()
+        reduce_args = [(job_class, part_files[part],
+                        os.path.join(results_dir, ("reduce_{part}{ext}").format(part=part, ext=RECORDS_EXT)),
+                        params)
+                       for part in range(partitions)]
+        reduce_outs = pool.map(reduce_task, reduce_args, chunksize=1)
+        # Shuffle within reduce phase: collect result files.
+        shuffle_start = dt.datetime.now()
+        results = [fout for (fout, _) in reduce_outs]
+        time_finish = dt.datetime.now()
+        events['reduce'] = phase_event('reduce', time_start, time_finish, [event for (_, event) in reduce_outs])
+        events['reduce']['shuffle'] = task_event(shuffle_start, time_finish)
+        events['reduce']['shuffle']['node_id'] = 'master'
+        events['time_finish'] = dt.datetime.now()
+        events['time_elapsed'] = events['time_finish'] - events['time_start']
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(tmp_dir)
+    return (results, events)
+
+def load_job_class(fjob, job_class_name):
+    """
+    Import a job class from a Python file, with the file's directory on the path.
+    """
+    job_dir = os.path.dirname(os.path.abspath(fjob))
+    if job_dir not in sys.path:
+        sys.path.insert(0, job_dir)
+    module_name = os.path.splitext(os.path.basename(fjob))[0]
+    # Import by name so that worker processes can unpickle the class.
+    module = __import__(module_name)
+    return getattr(module, job_class_name)
+
+def to_bytes(obj):
+    """
+    Return bytes as is, text as UTF-8, and other objects as the UTF-8 of their str().
+    """
+    if isinstance(obj, bytes):
+        return obj
+    if not isinstance(obj, type(u'')):
+        obj = str(obj)
+    return obj if isinstance(obj, bytes) else obj.encode('utf_8')
+
+def main(args):
+    """
+    Run a job on local files, write the results as tab-separated text,
+    and print the phase timings.
+    """
+    job_class = load_job_class(args.fjob, args.job_class)
+    params = json.loads(args.params)
+    (results, events) = run(job_class=job_class, files_in=args.files_in, results_dir=args.results_dir,
+                            params=params, partitions=args.partitions,
+                            num_procs=args.num_procs, split_mb=args.split_mb)
+    if args.file_out is not None:
+        # Write bytes keys and values unchanged rather than as their repr under Python 3.
+        with open(args.file_out, 'wb') as f_out:
+            for (key, value) in result_iterator(results):
+                f_out.write(to_bytes(key) + b'\t' + to_bytes(value) + b'\n')
+    for phase in ['map', 'reduce']:
+        print(("INFO: {phase}: {num} tasks, {num_entries} entries,"
+               +" elapsed {elapsed}, shuffle {shuffle}").format(
+                   phase=phase, num=events[phase]['num_'+phase+'s'],
+                   num_entries=events[phase]['num_entries'],
+                   elapsed=events[phase]['time_elapsed'],
+                   shuffle=events[phase]['shuffle']['time_elapsed']))
+    print(("INFO: job: elapsed {elapsed}").format(elapsed=events['time_elapsed']))
+    return None
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['params'] = '{}'
+    arg_default_map['partitions'] = None
+    arg_default_map['num_procs'] = multiprocessing.cpu_count()
+    arg_default_map['split_mb'] = 64
+    arg_default_map['results_dir'] = 'results'
+    arg_default_map['file_out'] = None
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Run a Disco Job class on local files without a Disco cluster.")
+    parser.add_argument('--fjob',
+                        required=True,
+                        help=("Python file defining the job class.\n"
+                              +"Example: --fjob wordcount/disco/count_words_mapr.py"))
+    parser.add_argument('--job_class',
+                        required=True,
+                        help=("Name of the job class.\n"
+                              +"Example: --job_class CountWords"))
+    parser.add_argument('--files_in',
+                        nargs='+',
+                        required=True,
+                        help=("Input text files, or .records files from a previous run.\n"
+                              +"Example: --files_in /path/to/files/*.txt"))
+    parser.add_argument('--params',
+                        default=arg_default_map['params'],
+                        help=(("Job params as JSON.\n"
+                               +"Example: --params '{{\"reduce_max_mb\": 256, \"combine_max_keys\": 1048576}}'\n"
+                               +"Default: {default}").format(default=arg_default_map['params'])))
+    parser.add_argument('--partitions',
+                        type=int,
+                        default=arg_default_map['partitions'],
+                        help=(("Number of reduce partitions.\n"
+                               +"Default: {default} (job class attribute, else 1)").format(default=arg_default_map['partitions'])))
+    parser.add_argument('--num_procs',
+                        type=int,
+                        default=arg_default_map['num_procs'],
+                        help=(("Number of worker processes.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_procs'])))
+    parser.add_argument('--split_mb',
+                        type=float,
+                        default=arg_default_map['split_mb'],
+                        help=(("Size in MB of the line-aligned input split of each map task.\n"
+                               +"Default: {default}").format(default=arg_default_map['split_mb'])))
+    parser.add_argument('--results_dir',
+                        default=arg_default_map['results_dir'],
+                        help=(("Directory for result .records files, one per partition. Ignored by git.\n"
+                               +"Default: {default}").format(default=arg_default_map['results_dir'])))
+    parser.add_argument('--file_out',
+                        default=arg_default_map['file_out'],
+                        help=(("Write results as tab-separated text to this file.\n"
+                               +"Default: {default}").format(default=arg_default_map['file_out'])))
+    args = parser.parse_args()
+    print(args)
+
+    main(args)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+"""
+Run Hadoop streaming mapper, combiner, and reducer scripts locally in parallel.
+
+- Map: Input files are split at line boundaries. Each split is piped through
+  the mapper, sorted, piped through the combiner if any, and partitioned
+  by the key (text before the first tab) into sorted partition files.
+  Keys are partitioned by hash, or by range between split points sampled
+  from the mapper's output on sampled input lines, as in TeraSort.
+- Shuffle: The map outputs of each partition are merged into one sorted file.
+- Reduce: Each partition is piped through the reducer.
+- Merge: The sorted reducer outputs are merged into the output file,
+  or concatenated in order if range partitioned.
+Lines are sorted bytewise, as by 'LC_ALL=C sort', so that the output is
+byte-identical to 'cat files_in | mapper | LC_ALL=C sort | reducer'.
+Records, bytes, and wall time are reported for each stage.
+"""
+
+from __future__ import print_function, division
+import argparse
+import hashlib
+import heapq
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+try:
+    # Python 3
+    from shlex import quote
+except ImportError:
+    # Python 2
+    from pipes import quote
+import streamio
+from localdisco import split_inputs
+from partition import hash_partition, range_partition, sample_lines, split_points
+
+def iter_lines(fname):
+    """
+    Yield the lines of a file without newlines.
+    """
+    with open(fname, 'rb') as f_in:
+        for lines in streamio.read_lines(f_in):
+            for line in lines:
+                yield line
+    return
+
+def file_stats(fnames):
+    """
+    Return the total number of lines and bytes of files.
+    """
+    (num_records, num_bytes) = (0, 0)
+    for fname in fnames:
+        with open(fname, 'rb') as f_in:
+            for block in streamio.read_blocks(f_in):
+                num_records += block.count(b'\n')
+                num_bytes += len(block)
+                if not block.endswith(b'\n'):
+                    num_records += 1
+    return (num_records, num_bytes)
+
+def pipe(cmd, fin, fout, start=0, stop=None):
+    """
+    Run a shell command with a byte range of file fin as standard input
+    and file fout as standard output.
+    """
+    with open(fin, 'rb') as f_in, open(fout, 'wb') as f_out:
+        proc = subprocess.Popen(cmd, shell=True, stdin=subprocess.PIPE, stdout=f_out)
+        f_in.seek(start)
+        remaining = stop - start if stop is not None else None
+        while True:
+            size = streamio.BLOCK_SIZE if remaining is None else min(streamio.BLOCK_SIZE, remaining)
+            data = f_in.read(size)
+            if not data:
+                break
+            proc.stdin.write(data)
+            if remaining is not None:
+                remaining -= len(data)
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return None
+
+def sort_file(fin, fout):
+    """
+    Sort the lines of a file bytewise.
+    """
+    with open(fout, 'wb') as f_out:
+        with streamio.BatchWriter(f_out) as writer:
+            writer.write_lines(sorted(iter_lines(fin)))
+    return None
+
+def key_of(line):
+    """
+    Return the key of a streaming record: the text before the first tab, or the whole line.
+    """
+    idx = line.find(b'\t')
+    return line if idx < 0 else line[:idx]
+
+def map_task(args):
+    """
+    Pipe a split through the mapper, sort, pipe through the combiner, and partition.
+    Return the partition files and the stage files for tallies.
+    """
+    (mapper, combiner, split, map_id, num_reduces, params, tmp_dir) = args
+    (fname, start, stop) = split
+    prefix = os.path.join(tmp_dir, ("map_{map_id}").format(map_id=map_id))
+    stage_files = {}
+    time_start = time.time()
+    pipe(mapper, fname, prefix+'.mapped', start, stop)
+    sort_file(prefix+'.mapped', prefix+'.sorted')
+    stage_files['map'] = (prefix+'.mapped', time.time() - time_start)
+    fsorted = prefix+'.sorted'
+    if combiner is not None:
+        time_start = time.time()
+        pipe(combiner, prefix+'.sorted', prefix+'.combined')
+        sort_file(prefix+'.combined', prefix+'.combined_sorted')
+        stage_files['combine'] = (prefix+'.combined', time.time() - time_start)
+        fsorted = prefix+'.combined_sorted'
+    # Partition sorted lines by key. Each partition file stays sorted.
+    fparts = [("{prefix}-part_{part}").format(prefix=prefix, part=part) for part in range(num_reduces)]
+    f_parts = [open(fpart, 'wb') for fpart in fparts]
+    writers = [streamio.BatchWriter(f_part) for f_part in f_parts]
+    partition = hash_partition if params is None else range_partition
+    for line in iter_lines(fsorted):
+        writers[partition(key_of(line), num_reduces, params)].write(line + b'\n')
+    for (writer, f_part) in zip(writers, f_parts):
+        writer.flush()
+        f_part.close()
+    return (fparts, stage_files)
+
+def shuffle_task(args):
+    """
+    Merge the sorted map outputs of a partition into one sorted file.
+    """
+    (fnames, fout) = args
+    with open(fout, 'wb') as f_out:
+        with streamio.BatchWriter(f_out) as writer:
+            for line in heapq.merge(*[iter_lines(fname) for fname in fnames]):
+                writer.write(line + b'\n')
+    return fout
+
+def concat_task(args):
+    """
+    Concatenate files in order into one file.
+    """
+    (fnames, fout) = args
+    with open(fout, 'wb') as f_out:
+        for fname in fnames:
+            with open(fname, 'rb') as f_in:
+                shutil.copyfileobj(f_in, f_out, streamio.BLOCK_SIZE)
+    return fout
+
+def sample_split_points(mapper, files_in, num_samples, num_reduces, tmp_dir):
+    """
+    Pipe sampled input lines through the mapper and return split points of the mapped keys.
+    """
+    fsamples = os.path.join(tmp_dir, 'samples')
+    with open(fsamples, 'wb') as f_out:
+        for line in sample_lines(files_in, num_samples):
+            f_out.write(line + b'\n')
+    pipe(mapper, fsamples, fsamples+'.mapped')
+    return split_points([key_of(line) for line in iter_lines(fsamples+'.mapped')], num_reduces)
+
+def reduce_task(args):
+    """
+    Pipe a partition through the reducer.
+    Return the output file and the task's time.
+    """
+    (reducer, fin, fout) = args
+    time_start = time.time()
+    pipe(reducer, fin, fout)
+    return (fout, time.time() - time_start)
+
+def report(stage, fins, fouts, seconds):
+    """
+    Print records and bytes in and out and wall time of a stage.
+    """
+    (records_in, bytes_in) = file_stats(fins)
+    (records_out, bytes_out) = file_stats(fouts)
+    print(("{stage:<10} {records_in:>12d} {bytes_in:>14d} {records_out:>12d} {bytes_out:>14d} {seconds:>9.2f}").format(
+        stage=stage, records_in=records_in, bytes_in=bytes_in,
+        records_out=records_out, bytes_out=bytes_out, seconds=seconds))
+    return None
+
+def md5sum(fname):
+    """
+    Return the MD5 hex digest of a file.
+    """
+    md5 = hashlib.md5()
+    with open(fname, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(streamio.BLOCK_SIZE), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def check(args, tmp_dir):
+    """
+    Run the single-process pipe and compare its output with file_out.
+    Return True if the outputs are byte-identical.
+    """
+    fcheck = os.path.join(tmp_dir, 'check.out')
+    # Quote the file names for the shell. The mapper and reducer are shell commands as given.
+    cmd = ("cat {files_in} | {mapper} | LC_ALL=C sort | {reducer} > {fcheck}").format(
+        files_in=' '.join(quote(fname) for fname in args.files_in), mapper=args.mapper, reducer=args.reducer,
+        fcheck=quote(fcheck))
+    subprocess.check_call(cmd, shell=True)
+    is_same = (md5sum(fcheck) == md5sum(args.file_out))
+    print(("INFO: Output is {same} to single-process pipe:\n {cmd}").format(
+        same='byte-identical' if is_same else 'NOT identical', cmd=cmd))
+    return is_same
+
+def main(args):
+    """
+    Run the map, shuffle, reduce, and merge stages and report each stage.
+    """
+    tmp_dir = tempfile.mkdtemp(dir=args.tmp_dir)
+    pool = multiprocessing.Pool(processes=args.num_procs)
+    try:
+        total_bytes = sum(os.path.getsize(fname) for fname in args.files_in)
+        splits = split_inputs(args.files_in, max(1, total_bytes // args.num_maps))
+        params = None
+        if args.partitioner == 'range':
+            time_start = time.time()
+            params = {'split_points': sample_split_points(args.mapper, args.files_in, args.num_samples,
+                                                          args.num_reduces, tmp_dir)}
+            print(("INFO: Sampled {num} split points in {seconds:.2f} seconds").format(
+                num=len(params['split_points']), seconds=time.time() - time_start))
+        print(("{stage:<10} {records_in:>12} {bytes_in:>14} {records_out:>12} {bytes_out:>14} {seconds:>9}").format(
+            stage='stage', records_in='records_in', bytes_in='bytes_in',
+            records_out='records_out', bytes_out='bytes_out', seconds='seconds'))
+        # Map and combine
+        time_start = time.time()
+        map_args = [(args.mapper, args.combiner, split, map_id, args.num_reduces, params, tmp_dir)
+                    for (map_id, split) in enumerate(splits)]
+        map_outs = pool.map(map_task, map_args, chunksize=1)
+        seconds = time.time() - time_start
+        # Stage times are the slowest task, since tasks run in parallel.
+        fmapped = [stage_files['map'][0] for (_, stage_files) in map_outs]
+        report('map', args.files_in, fmapped,
+               max(stage_files['map'][1] for (_, stage_files) in map_outs))
+        if args.combiner is not None:
+            fcombined = [stage_files['combine'][0] for (_, stage_files) in map_outs]
+            report('combine', fmapped, fcombined,
+                   max(stage_files['combine'][1] for (_, stage_files) in map_outs))
+        fparts = [fname for (fnames, _) in map_outs for fname in fnames]
+        report('map_all', args.files_in, fparts, seconds)
+        # Shuffle
+        time_start = time.time()
+        shuffle_args = [([fnames[part] for (fnames, _) in map_outs],
+                         os.path.join(tmp_dir, ("part_{part}").format(part=part)))
+                        for part in range(args.num_reduces)]
+        fshuffled = pool.map(shuffle_task, shuffle_args, chunksize=1)
+        report('shuffle', fparts, fshuffled, time.time() - time_start)
+        # Reduce
+        time_start = time.time()
+        reduce_args = [(args.reducer, fin, fin+'.reduced') for fin in fshuffled]
+        reduce_outs = pool.map(reduce_task, reduce_args, chunksize=1)
+        seconds = time.time() - time_start
+        freduced = [fout for (fout, _) in reduce_outs]
+        report('reduce', fshuffled, freduced, max(task_seconds for (_, task_seconds) in reduce_outs))
+        report('reduce_all', fshuffled, freduced, seconds)
+        # Merge
+        time_start = time.time()
+        if args.partitioner == 'range':
+            concat_task((freduced, args.file_out))
+        else:
+            shuffle_task((freduced, args.file_out))
+        report('merge', freduced, [args.file_out], time.time() - time_start)
+        if args.check:
+            check(args, tmp_dir)
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(tmp_dir)
+    return None
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['combiner'] = None
+    arg_default_map['num_maps'] = multiprocessing.cpu_count()
+    arg_default_map['num_reduces'] = 1
+    arg_default_map['partitioner'] = 'hash'
+    arg_default_map['num_samples'] = 10**5
+    arg_default_map['num_procs'] = multiprocessing.cpu_count()
+    arg_default_map['file_out'] = 'output.txt'
+    arg_default_map['tmp_dir'] = None
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Run Hadoop streaming scripts locally in parallel and time each stage.")
+    parser.add_argument('--mapper',
+                        required=True,
+                        help=("Mapper command.\n"
+                              +"Example: --mapper 'python wordcount/hadoop_streaming/mapper.py'"))
+    parser.add_argument('--combiner',
+                        default=arg_default_map['combiner'],
+                        help=(("Combiner command.\n"
+                               +"Default: {default}").format(default=arg_default_map['combiner'])))
+    parser.add_argument('--reducer',
+                        required=True,
+                        help=("Reducer command.\n"
+                              +"Example: --reducer 'python wordcount/hadoop_streaming/reducer.py'"))
+    parser.add_argument('--files_in',
+                        nargs='+',
+                        required=True,
+                        help=("Input text files.\n"
+                              +"Example: --files_in /path/to/files/*.txt"))
+    parser.add_argument('--file_out',
+                        default=arg_default_map['file_out'],
+                        help=(("Output file.\n"
+                               +"Default: {default}").format(default=arg_default_map['file_out'])))
+    parser.add_argument('--num_maps',
+                        type=int,
+                        default=arg_default_map['num_maps'],
+                        help=(("Number of line-aligned input splits, one per map task.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_maps'])))
+    parser.add_argument('--num_reduces',
+                        type=int,
+                        default=arg_default_map['num_reduces'],
+                        help=(("Number of reduce partitions.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_reduces'])))
+    parser.add_argument('--partitioner',
+                        choices=['hash', 'range'],
+                        default=arg_default_map['partitioner'],
+                        help=(("Assign keys to reduce partitions by 'hash', then merge the reducer outputs,\n"
+                               +"or by 'range' between sampled split points, then concatenate the reducer outputs.\n"
+                               +"Default: {default}").format(default=arg_default_map['partitioner'])))
+    parser.add_argument('--num_samples',
+                        type=int,
+                        default=arg_default_map['num_samples'],
+                        help=(("Number of input lines to sample for split points with --partitioner range.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_samples'])))
+    parser.add_argument('--num_procs',
+                        type=int,
+                        default=arg_default_map['num_procs'],
+                        help=(("Number of worker processes.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_procs'])))
+    parser.add_argument('--tmp_dir',
+                        default=arg_default_map['tmp_dir'],
+                        help=(("Directory for intermediate files.\n"
+                               +"Default: {default} (system temporary directory)").format(default=arg_default_map['tmp_dir'])))
+    parser.add_argument('--check',
+                        action='store_true',
+                        help=("Check that the output is byte-identical to the single-process pipe:\n"
+                              +" cat files_in | mapper | LC_ALL=C sort | reducer"))
+    args = parser.parse_args()
+    print(args)
+
+    main(args)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Protocols for mrjob jobs that count keys, selected by name with PROTOCOLS:
+- 'json': mrjob's defaults. Keys and counts are JSON-encoded between steps.
+- 'raw': Lines are read as text. Between steps, a key is written as UTF-8 with tabs and backslashes
+  escaped, then a tab and the count in decimal.
+- 'binary': Lines are read as bytes and never decoded. Between steps, a key is written as its bytes,
+  escaped, then a tab and the count in base-128 digits with the high bit set.
+With 'raw' and 'binary', output is 'key<TAB>count' with the key unescaped, as common/runlength.py reads.
+
+mrjob and Hadoop sort and group lines by the bytes before the first tab, so keys are escaped
+so that lines with tabs, e.g. by sort, are still one key. Escaped counts have no tab or newline.
+Ship with the job, e.g. --py-files common/mrprotocol.py.
+"""
+
+from mrjob.protocol import BytesValueProtocol, JSONProtocol, TextValueProtocol
+
+def escape(key):
+    """
+    Escape backslashes and tabs in a bytes key.
+    """
+    return key.replace(b'\\', b'\\\\').replace(b'\t', b'\\t')
+
+def unescape(key):
+    """
+    Invert escape.
+    """
+    if b'\\' not in key:
+        return key
+    return b'\\'.join(part.replace(b'\\t', b'\t') for part in key.split(b'\\\\'))
+
+# One-byte encodings of the counts below 0x80, the most common.
+SMALL_COUNTS = [bytes(bytearray([0x80 | count])) for count in range(0x80)]
+
+def encode_count(count):
+    """
+    Encode a non-negative count as big-endian base-128 digits, each with the high bit set.
+    """
+    if count < 0x80:
+        return SMALL_COUNTS[count]
+    digits = bytearray()
+    while count > 0:
+        digits.append(0x80 | (count & 0x7f))
+        count >>= 7
+    digits.reverse()
+    return bytes(digits)
+
+def decode_count(data):
+    """
+    Invert encode_count.
+    """
+    count = 0
+    for digit in bytearray(data):
+        count = (count << 7) | (digit & 0x7f)
+    return count
+
+class TextCountProtocol(object):
+    """
+    (key, count) with a text key, as escaped UTF-8, a tab, and the count in decimal.
+    """
+
+    def read(self, line):
+        """
+        Decode a line to (key, count).
+        """
+        (key, count) = line.split(b'\t', 1)
+        return (unescape(key).decode('utf_8'), int(count))
+
+    def write(self, key, count):
+        """
+        Encode (key, count) as a line.
+        """
+        return escape(key.encode('utf_8')) + b'\t' + str(count).encode('ascii')
+
+class BytesCountProtocol(object):
+    """
+    (key, count) with a bytes key, as the escaped key, a tab, and the count from encode_count.
+    """
+
+    def read(self, line):
+        """
+        Decode a line to (key, count).
+        """
+        (key, count) = line.split(b'\t', 1)
+        return (unescape(key), decode_count(count))
+
+    def write(self, key, count):
+        """
+        Encode (key, count) as a line.
+        """
+        return escape(key) + b'\t' + encode_count(count)
+
+class CountOutputProtocol(object):
+    """
+    (key, count) with a text or bytes key, as the key, a tab, and the count in decimal.
+    Read keys as bytes. Keys may contain tabs, so the count follows the last tab.
+    """
+
+    def read(self, line):
+        """
+        Decode a line to (key, count).
+        """
+        (key, _, count) = line.rpartition(b'\t')
+        return (key, int(count))
+
+    def write(self, key, count):
+        """
+        Encode (key, count) as a line.
+        """
+        if not isinstance(key, bytes):
+            key = key.encode('utf_8')
+        return key + b'\t' + str(count).encode('ascii')
+
+# Protocol name: (input, internal, output) protocol classes.
+PROTOCOLS = {'json': (TextValueProtocol, JSONProtocol, JSONProtocol),
+             'raw': (TextValueProtocol, TextCountProtocol, CountOutputProtocol),
+             'binary': (BytesValueProtocol, BytesCountProtocol, CountOutputProtocol)}
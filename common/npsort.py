@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Sort lines held in one contiguous bytes buffer with NumPy, without a Python object per line.
+
+Lines are located by an array of start offsets and an array of lengths.
+Each pass sorts by a 64-bit big-endian key: the next KEY_BYTES bytes of the line,
+zero-padded, followed by one byte with the number of bytes left, capped at KEY_BYTES + 1.
+Lines whose keys are equal and that continue past the key are tied; only tied groups
+are sorted again, by the next KEY_BYTES bytes, until no ties are left.
+The result is the bytewise order of sorted() on the lines.
+"""
+
+from __future__ import print_function, division
+import os
+import numpy as np
+
+# Bytes of a line per key. The eighth byte of the 64-bit key holds the bytes left.
+KEY_BYTES = 7
+
+# Lines per batch when gathering keys and writing output, to bound temporary arrays.
+BATCH_LINES = 2**20
+
+# Bytes per write of sorted output.
+WRITE_BYTES = 2**24
+
+# Zero bytes after the data so that an 8-byte word can be read at any offset.
+PAD_BYTES = 8
+
+def read_ranges(ranges):
+    """
+    Read (fname, start, stop) byte ranges, concatenated, into a uint8 array followed by
+    PAD_BYTES zero bytes. stop of None is the end of the file. Return the array and the data size.
+    """
+    ranges = [(fname, start, os.path.getsize(fname) if stop is None else stop) for (fname, start, stop) in ranges]
+    size = sum(stop - start for (_, start, stop) in ranges)
+    buf = np.zeros(size + PAD_BYTES, dtype=np.uint8)
+    pos = 0
+    for (fname, start, stop) in ranges:
+        with open(fname, 'rb') as f_in:
+            f_in.seek(start)
+            f_in.readinto(memoryview(buf)[pos:pos+stop-start])
+        pos += stop - start
+    return (buf, size)
+
+def read_buffer(file_in):
+    """
+    Read a file into a uint8 array followed by PAD_BYTES zero bytes.
+    Return the array and the file size.
+    """
+    return read_ranges([(file_in, 0, None)])
+
+def words(buf):
+    """
+    Return a view of a padded uint8 buffer as the little-endian 8-byte words starting at every offset.
+    Gathering words moves 8 bytes per index instead of 1.
+    """
+    return np.ndarray(shape=(len(buf) - PAD_BYTES + 1,), dtype='<u8', buffer=buf, strides=(1,))
+
+def line_offsets(buf, size, keep_newlines=True):
+    """
+    Return the start offsets and lengths of the lines in the first size bytes of a uint8 buffer.
+    If keep_newlines, lengths include the newline, as for the lines of file.readlines().
+    Otherwise lengths exclude it, as for 'LC_ALL=C sort'.
+    A last line without a newline is included.
+    """
+    # Find newlines by block to bound the temporary boolean array.
+    ends = np.concatenate([np.zeros(0, dtype=np.int64)]
+                          + [np.flatnonzero(buf[idx:min(idx+WRITE_BYTES, size)] == ord('\n')) + (idx + 1)
+                             for idx in range(0, size, WRITE_BYTES)])
+    if (size > 0) and (buf[size-1] != ord('\n')):
+        ends = np.append(ends, size)
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1]
+    lens = ends - starts
+    if not keep_newlines:
+        # Every line but possibly the last ends with a newline.
+        lens -= (buf[ends - 1] == ord('\n'))
+    return (starts, lens)
+
+def line_keys(buf, starts, lens, depth):
+    """
+    Return the 64-bit keys of lines at byte depth: bytes depth to depth+KEY_BYTES,
+    zero-padded, then the number of bytes left capped at KEY_BYTES + 1.
+    """
+    keys = np.empty(len(starts), dtype=np.uint64)
+    buf_words = words(buf)
+    for idx in range(0, len(starts), BATCH_LINES):
+        left = np.clip(lens[idx:idx+BATCH_LINES] - depth, 0, KEY_BYTES + 1)
+        # Lines ended before depth read no bytes.
+        pos = np.where(left > 0, starts[idx:idx+BATCH_LINES] + depth, 0)
+        # Byte-swap so that the line's first byte is the most significant.
+        key = buf_words[pos].byteswap()
+        # Keep the first min(left, KEY_BYTES) bytes, then put the bytes left in the lowest byte.
+        num_kept = np.minimum(left, KEY_BYTES).astype(np.uint64)
+        mask = ~(np.uint64(2**64 - 1) >> (num_kept * np.uint64(8)))
+        mask[num_kept == 0] = 0
+        keys[idx:idx+BATCH_LINES] = (key & mask) | left.astype(np.uint64)
+    return keys
+
+def argsort_lines(buf, starts, lens):
+    """
+    Return the permutation that sorts the lines bytewise.
+    """
+    keys = line_keys(buf, starts, lens, 0)
+    order = np.argsort(keys, kind='quicksort')
+    # Positions in order of the tied lines and the id of each one's tied group.
+    (tied, group) = ties(keys[order], np.zeros(len(keys), dtype=np.int64))
+    pos = np.flatnonzero(tied)
+    depth = KEY_BYTES
+    while len(pos) > 0:
+        idx = order[pos]
+        keys = line_keys(buf, starts[idx], lens[idx], depth)
+        # Groups are contiguous and increasing, so sorting by (group, key) reorders within groups.
+        perm = np.lexsort((keys, group))
+        order[pos] = idx[perm]
+        (tied, group) = ties(keys[perm], group[perm])
+        pos = pos[tied]
+        depth += KEY_BYTES
+    return order
+
+def ties(keys, group):
+    """
+    Given sorted keys within groups, return a mask of the lines tied with a neighbor
+    and continuing past the key, and the new group ids of those lines.
+    """
+    continues = (keys & 0xff) > KEY_BYTES
+    same = (keys[1:] == keys[:-1]) & (group[1:] == group[:-1]) & continues[1:]
+    tied = np.zeros(len(keys), dtype=bool)
+    tied[1:] |= same
+    tied[:-1] |= same
+    new_group = np.cumsum(np.concatenate([[True], ~same]))
+    return (tied, new_group[tied])
+
+def write_lines(f_out, buf, starts, lens, order, newline=False):
+    """
+    Write the lines in order. If newline, add a newline after each line.
+    Gather a batch of lines into an output buffer by 8-byte words: words are copied in order,
+    so the zero-padded tail of a line's last word is overwritten by the next line.
+    """
+    buf_words = words(buf)
+    for idx in range(0, len(order), BATCH_LINES):
+        batch = order[idx:idx+BATCH_LINES]
+        (batch_starts, batch_lens) = (starts[batch], lens[batch] + (1 if newline else 0))
+        out_ends = np.cumsum(batch_lens)
+        for (lo, hi) in batch_ranges(out_ends, WRITE_BYTES):
+            out_lens = batch_lens[lo:hi]
+            out_starts = out_ends[lo:hi] - out_lens - (out_ends[lo] - out_lens[0])
+            total = out_ends[hi-1] - (out_ends[lo] - out_lens[0])
+            num_words = (out_lens + 7) // 8
+            word_ends = np.cumsum(num_words)
+            offsets = 8 * (np.arange(word_ends[-1], dtype=np.int64) - np.repeat(word_ends - num_words, num_words))
+            out = np.zeros(total + PAD_BYTES, dtype=np.uint8)
+            words(out)[np.repeat(out_starts, num_words) + offsets] = buf_words[np.repeat(batch_starts[lo:hi], num_words) + offsets]
+            if newline:
+                out[out_starts + out_lens - 1] = ord('\n')
+            f_out.write(out[:total].tobytes())
+    return None
+
+def batch_ranges(out_ends, max_bytes):
+    """
+    Split lines with cumulative output ends into (lo, hi) ranges of about max_bytes.
+    """
+    bounds = np.searchsorted(out_ends, np.arange(max_bytes, out_ends[-1], max_bytes), side='left') + 1
+    bounds = np.unique(np.concatenate([[0], bounds, [len(out_ends)]]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def sort_file(file_in, file_out, keep_newlines=True):
+    """
+    Sort the lines of file_in bytewise into file_out.
+    If keep_newlines, lines are compared with their newlines and the output is byte-identical
+    to writing sorted(f_in.readlines()). Otherwise lines are compared without newlines
+    and each is written with one, as by 'LC_ALL=C sort'.
+    """
+    (buf, size) = read_buffer(file_in)
+    (starts, lens) = line_offsets(buf, size, keep_newlines=keep_newlines)
+    order = argsort_lines(buf, starts, lens)
+    with open(file_out, 'wb') as f_out:
+        if len(order) > 0:
+            write_lines(f_out, buf, starts, lens, order, newline=not keep_newlines)
+    return None
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Sort the lines of a file on several cores.
+
+- Sample: Split points for one bucket per process are sampled from the input, as in TeraSort.
+- Partition: Line-aligned splits of the input are read in parallel in one pass, and each
+  line is written to the piece file of its bucket, found by a vectorized search of its prefix key.
+- Sort: Buckets are sorted in parallel, each from its pieces, and written straight to
+  their offsets in the output file, so the buckets are concatenated in order without a copy.
+The output is byte-identical to writing sorted(f_in.readlines()).
+"""
+
+from __future__ import print_function, division
+import bisect
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import npsort
+from localdisco import split_inputs
+from partition import sample_lines, split_points
+
+def bucket_ids(buf, starts, lens, points):
+    """
+    Return the bucket of each line: the number of split points less than or equal to the line.
+    Lines are compared by prefix key. Only lines whose key equals a split point's key
+    and that continue past it are compared in full.
+    """
+    point_buf = np.zeros(sum(map(len, points)) + npsort.PAD_BYTES, dtype=np.uint8)
+    point_buf[:point_buf.size - npsort.PAD_BYTES] = np.frombuffer(b''.join(points), dtype=np.uint8)
+    point_lens = np.array([len(point) for point in points], dtype=np.int64)
+    point_starts = np.cumsum(point_lens) - point_lens
+    point_keys = npsort.line_keys(point_buf, point_starts, point_lens, 0)
+    keys = npsort.line_keys(buf, starts, lens, 0)
+    buckets = np.searchsorted(point_keys, keys, side='right')
+    continues = (point_keys & 0xff) > npsort.KEY_BYTES
+    for idx in np.flatnonzero(np.isin(keys, point_keys[continues])):
+        line = buf[starts[idx]:starts[idx]+lens[idx]].tobytes()
+        buckets[idx] = bisect.bisect_right(points, line)
+    return buckets
+
+def partition_task(args):
+    """
+    Write the lines of a split to one piece file per bucket.
+    Return the piece files and their sizes.
+    """
+    (split, points, num_buckets, split_id, tmp_dir) = args
+    (buf, size) = npsort.read_ranges([split])
+    (starts, lens) = npsort.line_offsets(buf, size)
+    buckets = bucket_ids(buf, starts, lens, points)
+    order = np.argsort(buckets, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(buckets, minlength=num_buckets))])
+    pieces = []
+    for bucket in range(num_buckets):
+        fpiece = os.path.join(tmp_dir, ("bucket_{bucket}-split_{split_id}").format(bucket=bucket, split_id=split_id))
+        with open(fpiece, 'wb') as f_out:
+            if bounds[bucket+1] > bounds[bucket]:
+                npsort.write_lines(f_out, buf, starts, lens, order[bounds[bucket]:bounds[bucket+1]])
+        pieces.append((fpiece, os.path.getsize(fpiece)))
+    return pieces
+
+def sort_task(args):
+    """
+    Sort the pieces of a bucket and write the sorted lines at offset in file_out.
+    Return the time taken.
+    """
+    (fpieces, file_out, offset, sorter) = args
+    time_start = time.time()
+    with open(file_out, 'r+b') as f_out:
+        f_out.seek(offset)
+        if sorter == 'numpy':
+            (buf, size) = npsort.read_ranges([(fpiece, 0, None) for fpiece in fpieces])
+            (starts, lens) = npsort.line_offsets(buf, size)
+            if len(starts) > 0:
+                npsort.write_lines(f_out, buf, starts, lens, npsort.argsort_lines(buf, starts, lens))
+        else:
+            lines = []
+            for fpiece in fpieces:
+                with open(fpiece, 'rb') as f_in:
+                    lines.extend(f_in.readlines())
+            lines.sort()
+            f_out.writelines(lines)
+    for fpiece in fpieces:
+        os.remove(fpiece)
+    return time.time() - time_start
+
+def sort_file(file_in, file_out, num_procs, sorter='numpy', num_samples=10**5, tmp_dir=None):
+    """
+    Sort the lines of file_in into file_out with num_procs processes and one bucket per process.
+    Return the seconds taken by each phase.
+    """
+    seconds = {}
+    tmp_dir = tempfile.mkdtemp(dir=tmp_dir)
+    pool = multiprocessing.Pool(processes=num_procs)
+    try:
+        time_start = time.time()
+        points = split_points(sample_lines([file_in], num_samples), num_procs)
+        seconds['sample'] = time.time() - time_start
+        time_start = time.time()
+        splits = split_inputs([file_in], max(1, os.path.getsize(file_in) // num_procs))
+        split_pieces = pool.map(partition_task, [(split, points, num_procs, split_id, tmp_dir)
+                                                 for (split_id, split) in enumerate(splits)], chunksize=1)
+        seconds['partition'] = time.time() - time_start
+        time_start = time.time()
+        # Each bucket's offset in the output is the total size of the buckets before it.
+        bucket_sizes = [sum(pieces[bucket][1] for pieces in split_pieces) for bucket in range(num_procs)]
+        offsets = np.concatenate([[0], np.cumsum(bucket_sizes)]).tolist()
+        with open(file_out, 'wb') as f_out:
+            f_out.truncate(offsets[-1])
+        sort_args = [([pieces[bucket][0] for pieces in split_pieces], file_out, offsets[bucket], sorter)
+                     for bucket in range(num_procs)]
+        bucket_seconds = pool.map(sort_task, sort_args, chunksize=1)
+        seconds['sort'] = time.time() - time_start
+        seconds['sort_max_bucket'] = max(bucket_seconds)
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(tmp_dir)
+    return seconds
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Partitioners for map-reduce jobs.
+
+hash_partition spreads keys evenly but each partition's keys are interleaved with the others',
+so sorted partitions must be merged. range_partition assigns keys by split points sampled
+from the input, as in TeraSort, so sorted partitions concatenated in order are sorted.
+"""
+
+from __future__ import print_function, division
+import bisect
+import os
+import zlib
+
+# Input blocks sampled per file by sample_lines, evenly spaced as in TeraSort.
+SAMPLE_BLOCKS = 10
+
+def hash_partition(key, nr_partitions, params):
+    """
+    Assign a key to one of nr_partitions by the CRC32 of its string form.
+    Unlike hash(), CRC32 is the same on every node and Python version.
+    Signature follows Disco's partition functions.
+    """
+    if isinstance(key, type(u'')):
+        key = key.encode('utf-8')
+    elif not isinstance(key, bytes):
+        key = str(key).encode('utf-8')
+    return (zlib.crc32(key) & 0xffffffff) % nr_partitions
+
+def sample_lines(files_in, num_samples, num_blocks=SAMPLE_BLOCKS):
+    """
+    Sample about num_samples lines from num_blocks evenly spaced blocks of each file.
+    Return the lines without newlines.
+    """
+    samples = []
+    per_block = max(1, num_samples // (len(files_in) * num_blocks))
+    for fname in files_in:
+        size = os.path.getsize(fname)
+        with open(fname, 'rb') as f_in:
+            for block in range(num_blocks):
+                start = size * block // num_blocks
+                f_in.seek(start)
+                # Skip the partial line at start unless at the start of the file.
+                if start > 0:
+                    f_in.readline()
+                for _ in range(per_block):
+                    line = f_in.readline()
+                    if not line:
+                        break
+                    samples.append(line.rstrip(b'\r\n'))
+    return samples
+
+def split_points(samples, nr_partitions):
+    """
+    Return nr_partitions - 1 split points at evenly spaced quantiles of the sampled keys.
+    """
+    samples = sorted(samples)
+    if len(samples) == 0:
+        return []
+    return [samples[len(samples) * part // nr_partitions] for part in range(1, nr_partitions)]
+
+def range_partition(key, nr_partitions, params):
+    """
+    Assign a key to the partition of its range between params['split_points'].
+    Keys equal to a split point go to the partition above it.
+    Signature follows Disco's partition functions.
+    """
+    return bisect.bisect_right(params['split_points'], key)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Run-length format for sorted lines with duplicates: one 'line<TAB>count' record per distinct line.
+The count follows the last tab, so lines may contain tabs.
+
+Write duplicates in chunks of about DUP_BYTES so that a line repeated many times
+is neither held in memory as a list nor written one copy at a time.
+Expand a run-length file to the duplicated lines with:
+    python runlength.py --file_in output.rle --file_out output.txt
+or as a filter with '-' for standard input or output.
+"""
+
+from __future__ import print_function
+import argparse
+import sys
+import streamio
+
+# Bytes of duplicate lines per write.
+DUP_BYTES = 2**20
+
+def write_repeated(f_out, line, count):
+    """
+    Write line count times to f_out in chunks of about DUP_BYTES.
+    """
+    per_chunk = max(1, DUP_BYTES // max(1, len(line)))
+    while count > 0:
+        num = min(count, per_chunk)
+        f_out.write(line * num)
+        count -= num
+    return None
+
+def format_run(line, count):
+    """
+    Return the single 'line<TAB>count' record, with a newline, of a line that occurs count times.
+    line may be given with or without its newline.
+    """
+    return line.rstrip(b'\n') + b'\t' + str(count).encode('ascii') + b'\n'
+
+def parse_run(record):
+    """
+    Return (line, count) from a run-length record without its newline.
+    """
+    (line, _, count) = record.rpartition(b'\t')
+    return (line, int(count))
+
+def expand(f_in, f_out):
+    """
+    Stream run-length records from f_in and write each line count times, with newlines, to f_out.
+    """
+    with streamio.BatchWriter(f_out) as writer:
+        for records in streamio.read_lines(f_in):
+            for record in records:
+                (line, count) = parse_run(record)
+                write_repeated(writer, line + b'\n', count)
+    return None
+
+def main(file_in, file_out):
+    """
+    Expand a run-length file. '-' is standard input or output.
+    """
+    f_in = sys.stdin if file_in == '-' else open(file_in, 'rb')
+    f_out = sys.stdout if file_out == '-' else open(file_out, 'wb')
+    try:
+        expand(f_in, streamio.binary(f_out))
+    finally:
+        for (fname, fp) in [(file_in, f_in), (file_out, f_out)]:
+            if fname != '-':
+                fp.close()
+    return None
+
+if __name__ == '__main__':
+
+    file_in_default = "output.rle"
+    file_out_default = "output.txt"
+
+    parser = argparse.ArgumentParser(description="Expand a run-length file of 'line<TAB>count' records to duplicated lines.")
+    parser.add_argument("--file_in",
+                        default=file_in_default,
+                        help="Input run-length file. Default: {default}".format(default=file_in_default))
+    parser.add_argument("--file_out",
+                        default=file_out_default,
+                        help="Output file. Default: {default}".format(default=file_out_default))
+    args = parser.parse_args()
+    print(args, file=sys.stderr)
+
+    main(file_in=args.file_in, file_out=args.file_out)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Sparse block index for sorted output files, as for the blocks of an SSTable.
+
+The writer records the key and byte offset of every Nth record to 'file.idx'.
+The reader memory-maps the file, loads the index, and finds the block of a key by binary search,
+then scans at most N records of the block, so a point or range lookup costs O(log n) plus one block.
+Records are lines. The key of a record depends on the file's format:
+- 'lines': the line, with its newline, as sorted by sort_mapr.py and sort_nomapr.py.
+- 'runs': the line of a 'line<TAB>count' run-length record, with a newline, as by sort_mapr.py --run_length.
+- 'csv': the first field of a CSV row, as the word of count_words_mapr.py output.
+Index a sorted file, or look up keys or a key range:
+    python sparseindex.py --file_in output.txt --format lines --build
+    python sparseindex.py --file_in output.csv --format csv --keys the of --start a --stop b
+"""
+
+from __future__ import print_function
+import argparse
+import bisect
+import csv
+import marshal
+import mmap
+import os
+import sys
+
+# Records per indexed block.
+INDEX_EVERY = 1024
+
+# Index file suffix and marshal format version, which Python 2 and 3 both read.
+INDEX_EXT = '.idx'
+MARSHAL_VERSION = 2
+
+def to_bytes(key):
+    """
+    Return a text key as UTF-8 bytes, which sort as the text does. Bytes are returned as is.
+    """
+    return key if isinstance(key, bytes) else key.encode('utf_8')
+
+def csv_key(record):
+    """
+    Return the first field of a CSV row as bytes.
+    Under Python 3, the row is decoded and the field encoded as Latin-1, which maps each byte to one character,
+    so that rows of any bytes, e.g. words of Latin-1 text, round-trip unchanged.
+    """
+    if bytes is str:
+        return next(csv.reader([record]))[0]
+    return next(csv.reader([record.decode('latin_1')]))[0].encode('latin_1')
+
+# Format: (key of a record without its newline, key of a lookup).
+KEY_FORMATS = {'lines': (lambda record: record + b'\n', lambda key: to_bytes(key) + b'\n'),
+               'runs': (lambda record: record.rpartition(b'\t')[0] + b'\n', lambda key: to_bytes(key) + b'\n'),
+               'csv': (csv_key, to_bytes)}
+
+def index_path(fname):
+    """
+    Return the index file of a data file.
+    """
+    return fname + INDEX_EXT
+
+class IndexWriter(object):
+    """
+    Record the key and offset of every Nth record written to a file, and write the index on close.
+    Call mark with each record's key before writing the record.
+    """
+
+    def __init__(self, f_out, fname_index, every=INDEX_EVERY):
+        """
+        Initialize with the data file, open for writing, the index file, and the records per block.
+        """
+        self.f_out = f_out
+        self.fname_index = fname_index
+        self.every = every
+        self.num_records = 0
+        self._keys = []
+        self._offsets = []
+        return None
+
+    def __enter__(self):
+        """
+        Enter context.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Write the index on exit from context without an exception.
+        """
+        if exc_type is None:
+            self.close()
+        return False
+
+    def mark(self, key, offset=None):
+        """
+        Count a record about to be written at offset, by default the file's position.
+        Record the key and offset of every Nth record.
+        Raise ValueError if keys are out of order.
+        """
+        if self.num_records % self.every == 0:
+            key = to_bytes(key)
+            if (len(self._keys) > 0) and (key < self._keys[-1]):
+                raise ValueError(("Keys are not sorted: {key!r} after {prev!r}").format(key=key, prev=self._keys[-1]))
+            self._keys.append(key)
+            self._offsets.append(self.f_out.tell() if offset is None else offset)
+        self.num_records += 1
+        return None
+
+    def close(self):
+        """
+        Write the index with the data size, so that readers can detect a changed data file.
+        """
+        self.f_out.flush()
+        index = {'every': self.every, 'size': self.f_out.tell(), 'keys': self._keys, 'offsets': self._offsets}
+        with open(self.fname_index, 'wb') as f_index:
+            marshal.dump(index, f_index, MARSHAL_VERSION)
+        return None
+
+def build(fname, key_format, every=INDEX_EVERY):
+    """
+    Index an existing sorted file.
+    """
+    record_key = KEY_FORMATS[key_format][0]
+    with open(fname, 'rb') as f_in:
+        with IndexWriter(f_in, index_path(fname), every=every) as index:
+            pos = 0
+            # Read with readline so that the file's position is exact for the index's size.
+            for line in iter(f_in.readline, b''):
+                index.mark(record_key(line.rstrip(b'\n')), offset=pos)
+                pos += len(line)
+    return None
+
+class IndexReader(object):
+    """
+    Look up keys and key ranges in a sorted file through its sparse index.
+    """
+
+    def __init__(self, fname, key_format):
+        """
+        Memory-map the data file and load its index.
+        Raise ValueError if the data file's size differs from the size indexed.
+        """
+        (self.record_key, self.query_key) = KEY_FORMATS[key_format]
+        with open(index_path(fname), 'rb') as f_index:
+            index = marshal.load(f_index)
+        (self._keys, self._offsets) = (index['keys'], index['offsets'])
+        self.size = os.path.getsize(fname)
+        if self.size != index['size']:
+            raise ValueError(("Data file changed since it was indexed: {size} bytes, indexed {indexed} bytes").format(
+                size=self.size, indexed=index['size']))
+        self._mm = None
+        if self.size > 0:
+            with open(fname, 'rb') as f_in:
+                self._mm = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+        return None
+
+    def __enter__(self):
+        """
+        Enter context.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Unmap the file on exit from context.
+        """
+        self.close()
+        return False
+
+    def close(self):
+        """
+        Unmap the data file.
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        return None
+
+    def _records(self, key):
+        """
+        Yield (key, record) from the block that may hold the first record with a key of at least key.
+        The block before the first indexed key at least key is the first that may hold it.
+        """
+        if self._mm is None:
+            return
+        block = max(0, bisect.bisect_left(self._keys, key) - 1)
+        pos = self._offsets[block] if len(self._offsets) > 0 else 0
+        while pos < self.size:
+            end = self._mm.find(b'\n', pos)
+            if end < 0:
+                end = self.size
+            record = self._mm[pos:end]
+            yield (self.record_key(record), record)
+            pos = end + 1
+        return
+
+    def get(self, key):
+        """
+        Return the records with key, without newlines.
+        """
+        key = self.query_key(key)
+        records = []
+        for (record_key, record) in self._records(key):
+            if record_key > key:
+                break
+            if record_key == key:
+                records.append(record)
+        return records
+
+    def range(self, start, stop):
+        """
+        Yield the records with keys from start up to, not including, stop, without newlines.
+        """
+        (start, stop) = (self.query_key(start), self.query_key(stop))
+        for (record_key, record) in self._records(start):
+            if record_key >= stop:
+                break
+            if record_key >= start:
+                yield record
+        return
+
+def main(file_in, key_format, build_index=False, every=INDEX_EVERY, keys=None, start=None, stop=None):
+    """
+    Index file_in, then print the records of each key and of the range from start to stop.
+    """
+    if build_index:
+        build(file_in, key_format, every=every)
+    out = getattr(sys.stdout, 'buffer', sys.stdout)
+    # Look up the bytes given on the command line, which Python 3 decodes as os.fsencode reverses.
+    fsencode = getattr(os, 'fsencode', lambda key: key)
+    keys = [fsencode(key) for key in (keys or [])]
+    if (start is not None) and (stop is not None):
+        (start, stop) = (fsencode(start), fsencode(stop))
+    with IndexReader(file_in, key_format) as reader:
+        for key in keys:
+            for record in reader.get(key):
+                out.write(record + b'\n')
+        if (start is not None) and (stop is not None):
+            for record in reader.range(start, stop):
+                out.write(record + b'\n')
+    out.flush()
+    return None
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['key_format'] = 'lines'
+    arg_default_map['every'] = INDEX_EVERY
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Index a sorted file sparsely and look up keys and key ranges.")
+    parser.add_argument('--file_in',
+                        required=True,
+                        help=("Sorted data file. Its index is file_in + '{ext}'.").format(ext=INDEX_EXT))
+    parser.add_argument('--format',
+                        dest='key_format',
+                        choices=sorted(KEY_FORMATS),
+                        default=arg_default_map['key_format'],
+                        help=(("Record format, which gives the key of a record.\n"
+                               +"Default: {default}").format(default=arg_default_map['key_format'])))
+    parser.add_argument('--build',
+                        action='store_true',
+                        help="Index file_in before lookups.")
+    parser.add_argument('--every',
+                        type=int,
+                        default=arg_default_map['every'],
+                        help=(("Records per indexed block with --build.\n"
+                               +"Default: {default}").format(default=arg_default_map['every'])))
+    parser.add_argument('--keys',
+                        nargs='+',
+                        help="Keys to look up.")
+    parser.add_argument('--start',
+                        help="First key of a range to look up, with --stop.")
+    parser.add_argument('--stop',
+                        help="Key after the range to look up, with --start.")
+    args = parser.parse_args()
+    print(args, file=sys.stderr)
+
+    main(file_in=args.file_in, key_format=args.key_format, build_index=args.build, every=args.every,
+         keys=args.keys, start=args.start, stop=args.stop)
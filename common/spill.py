@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Memory-bounded counting that spills sorted runs to disk.
+
+Tally counts by key in a hash table. Once the table's estimated size exceeds
+a memory budget, write it to a temporary file as a sorted run and empty it.
+At end, merge the runs with the remainder of the table to yield totals sorted by key.
+"""
+
+from __future__ import print_function
+import heapq
+import marshal
+import sys
+import tempfile
+
+# Estimated bytes per table entry beyond the key itself:
+# the hash table slot and the count object.
+ENTRY_BYTES = 96
+
+# Pairs per marshal record in a run file.
+# Merging holds one record per run in memory.
+RUN_BATCH = 2**9
+
+def write_run(f_run, items):
+    """
+    Write sorted (key, count) pairs to a run file in batches.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= RUN_BATCH:
+            marshal.dump(batch, f_run)
+            batch = []
+    if len(batch) > 0:
+        marshal.dump(batch, f_run)
+    f_run.flush()
+    f_run.seek(0)
+    return None
+
+def read_run(f_run):
+    """
+    Yield (key, count) pairs from a run file.
+    """
+    while True:
+        try:
+            batch = marshal.load(f_run)
+        except EOFError:
+            break
+        for (key, count) in batch:
+            yield (key, count)
+    return
+
+def merge(runs):
+    """
+    Merge sorted runs of (key, count) pairs and yield totals sorted by key.
+    A key can occur once in every run so continue the tally across runs.
+    """
+    (key, count) = (None, 0)
+    is_first = True
+    for (new_key, new_count) in heapq.merge(*runs):
+        # If we've seen this key before, continue tally,...
+        if (not is_first) and (new_key == key):
+            count += new_count
+        # ...otherwise yield the current tally if not at start and reset the tally.
+        else:
+            if not is_first:
+                yield (key, count)
+            count = new_count
+            is_first = False
+        # Track the last key seen.
+        key = new_key
+    # At end, yield the last tally.
+    if not is_first:
+        yield (key, count)
+    return
+
+class SpillCounter(object):
+    """
+    Count keys in a hash table within a memory budget, spilling sorted runs to disk.
+    Keys must be sortable and serializable with marshal, e.g. str, unicode, int, tuple.
+    """
+
+    def __init__(self, max_bytes=2**28, max_runs=64, tmp_dir=None):
+        """
+        Initialize with a memory budget in bytes for the table,
+        a maximum number of open run files, and a directory for run files.
+        """
+        self.max_bytes = max_bytes
+        self.max_runs = max_runs
+        self.tmp_dir = tmp_dir
+        self.num_spills = 0
+        self._table = {}
+        self._bytes = 0
+        self._runs = []
+        return None
+
+    def __enter__(self):
+        """
+        Enter context.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Close run files on exit from context.
+        """
+        self.close()
+        return False
+
+    def add(self, key, count=1):
+        """
+        Add count to the tally of key.
+        """
+        table = self._table
+        if key in table:
+            table[key] += count
+        else:
+            table[key] = count
+            self._bytes += sys.getsizeof(key) + ENTRY_BYTES
+            if self._bytes >= self.max_bytes:
+                self.spill()
+        return None
+
+    def update(self, pairs):
+        """
+        Add counts from an iterable of (key, count) pairs.
+        """
+        table = self._table
+        for (key, count) in pairs:
+            # Inline add() for keys already in the table.
+            if key in table:
+                table[key] += count
+            else:
+                self.add(key, count)
+        return None
+
+    def spill(self):
+        """
+        Write the table to a sorted run file and empty the table.
+        Merge the run files into one if there are max_runs of them.
+        """
+        if len(self._runs) >= self.max_runs:
+            f_run = tempfile.TemporaryFile(dir=self.tmp_dir)
+            write_run(f_run, merge([read_run(f_old) for f_old in self._runs]))
+            for f_old in self._runs:
+                f_old.close()
+            self._runs = [f_run]
+        f_run = tempfile.TemporaryFile(dir=self.tmp_dir)
+        write_run(f_run, sorted(self._table.items()))
+        self._runs.append(f_run)
+        self._table.clear()
+        self._bytes = 0
+        self.num_spills += 1
+        return None
+
+    def items(self):
+        """
+        Yield (key, total) pairs sorted by key.
+        Consumes the counter.
+        """
+        table_items = sorted(self._table.items())
+        self._table.clear()
+        self._bytes = 0
+        if len(self._runs) == 0:
+            return iter(table_items)
+        runs = [read_run(f_run) for f_run in self._runs]
+        runs.append(table_items)
+        return merge(runs)
+
+    def close(self):
+        """
+        Close and delete the run files.
+        """
+        for f_run in self._runs:
+            f_run.close()
+        self._runs = []
+        return None
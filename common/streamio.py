@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Buffered bytes I/O for Hadoop streaming mappers, combiners, and reducers.
+
+Read standard input in large binary blocks that end at line boundaries
+and write standard output in batches, so that per-record work is done by
+bytes methods over whole blocks rather than by Python code per line.
+Ship with the streaming scripts, e.g. '-file common/streamio.py'.
+"""
+
+from __future__ import print_function
+try:
+    # Python 2: pair up columns without building a list of tuples.
+    from itertools import izip as zip
+except ImportError:
+    pass
+
+# Read 1 MB blocks and write 1 MB batches.
+BLOCK_SIZE = 2**20
+FLUSH_SIZE = 2**20
+
+def binary(stream):
+    """
+    Return the binary buffer underlying a text stream if it has one.
+    Python 2 file objects are already binary.
+    """
+    return getattr(stream, 'buffer', stream)
+
+def read_blocks(stream, block_size=BLOCK_SIZE):
+    """
+    Read a stream in binary blocks of about block_size bytes.
+    Yield blocks that end at a newline, except possibly the last block.
+    """
+    stream = binary(stream)
+    tail = []
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        idx = block.rfind(b'\n')
+        # A line longer than a block: keep reading.
+        if idx < 0:
+            tail.append(block)
+            continue
+        tail.append(block[:idx+1])
+        yield b''.join(tail)
+        tail = [block[idx+1:]]
+    last = b''.join(tail)
+    if last:
+        yield last
+    return
+
+def read_lines(stream, block_size=BLOCK_SIZE):
+    """
+    Yield lists of lines, without newlines, one list per block.
+    """
+    for block in read_blocks(stream, block_size=block_size):
+        lines = block.split(b'\n')
+        # Drop the empty string after the block's final newline.
+        if lines[-1] == b'':
+            lines.pop()
+        yield lines
+    return
+
+def read_columns(stream, num_fields=2, block_size=BLOCK_SIZE):
+    """
+    Yield a tuple of lists of whitespace-separated fields, one list per column,
+    one tuple per block. E.g. for 'key\\tvalue' lines, yield (keys, values).
+    Raise ValueError if a line does not have exactly num_fields fields.
+    """
+    for block in read_blocks(stream, block_size=block_size):
+        # Split the whole block at once, then take every num_fields-th field as a column.
+        fields = block.split()
+        num_lines = block.count(b'\n')
+        if not block.endswith(b'\n'):
+            num_lines += 1
+        if len(fields) != num_fields*num_lines:
+            for line in block.splitlines():
+                num_found = len(line.split())
+                if num_found != num_fields:
+                    raise ValueError(("Expected {num_fields} fields, found {num_found}: {line!r}").format(
+                        num_fields=num_fields, num_found=num_found, line=line))
+        yield tuple(fields[idx::num_fields] for idx in range(num_fields))
+    return
+
+class BatchWriter(object):
+    """
+    Buffer writes to a stream and flush them as a single write
+    once about flush_size bytes are buffered. Use as a context manager
+    to flush at exit.
+    """
+
+    def __init__(self, stream, flush_size=FLUSH_SIZE):
+        """
+        Initialize.
+        """
+        self._stream = binary(stream)
+        self._flush_size = flush_size
+        self._parts = []
+        self._size = 0
+        return None
+
+    def __enter__(self):
+        """
+        Enter context.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Flush on exit from context.
+        """
+        self.flush()
+        return False
+
+    def write(self, data):
+        """
+        Buffer bytes.
+        """
+        self._parts.append(data)
+        self._size += len(data)
+        if self._size >= self._flush_size:
+            self.flush()
+        return None
+
+    def write_lines(self, lines):
+        """
+        Buffer a list of lines, without newlines.
+        """
+        if len(lines) > 0:
+            self.write(b'\n'.join(lines) + b'\n')
+        return None
+
+    def write_columns(self, keys, values, sep=b'\t'):
+        """
+        Buffer lists of keys and values as 'key\\tvalue' lines.
+        """
+        if len(keys) > 0:
+            self.write(b'\n'.join(map(sep.join, zip(keys, values))) + b'\n')
+        return None
+
+    def flush(self):
+        """
+        Write buffered bytes to the stream.
+        """
+        if len(self._parts) > 0:
+            self._stream.write(b''.join(self._parts))
+            self._parts = []
+            self._size = 0
+        self._stream.flush()
+        return None
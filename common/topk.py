@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Approximate top-K counting in bounded memory with the Space-Saving sketch.
+
+Space-Saving keeps at most `capacity` counters. A new key evicts the key with
+the smallest count and inherits that count as its error, so a key's count
+overestimates its true count by at most its error:
+    count - error <= true count <= count
+and any key with true count > N / capacity, for N keys counted, has a counter.
+Sketches from different maps merge into a sketch of the same capacity with the same bounds.
+Metwally, Agrawal, El Abbadi, "Efficient computation of frequent and top-k elements
+in data streams", ICDT 2005; Agarwal et al., "Mergeable summaries", PODS 2012.
+"""
+
+from __future__ import print_function
+import collections
+import heapq
+
+class SpaceSaving(object):
+    """
+    Space-Saving sketch of the most frequent keys.
+    Keys must be hashable and orderable among themselves, e.g. str, unicode, int.
+    Updates are tallied exactly in a buffer of at most buffer_keys keys, then merged into
+    the counters as a sketch without error, which is faster than evicting key by key
+    and at least as accurate. Memory is O(capacity + buffer_keys).
+    """
+
+    def __init__(self, capacity=2**14, buffer_keys=None):
+        """
+        Initialize with the maximum number of counters and of buffered keys.
+        buffer_keys defaults to capacity.
+        """
+        self.capacity = capacity
+        self.buffer_keys = capacity if buffer_keys is None else buffer_keys
+        self.total = 0
+        self._counts = {}
+        # Errors are stored only if nonzero.
+        self._errors = {}
+        self._buffer = collections.Counter()
+        return None
+
+    def __len__(self):
+        """
+        Return the number of counters in use.
+        """
+        self.flush()
+        return len(self._counts)
+
+    def add(self, key, count=1):
+        """
+        Add count to the counter of key.
+        """
+        self._buffer[key] += count
+        self.total += count
+        if len(self._buffer) >= self.buffer_keys:
+            self.flush()
+        return None
+
+    def update(self, keys):
+        """
+        Add 1 for every key in an iterable.
+        """
+        if not isinstance(keys, list):
+            keys = list(keys)
+        self.total += len(keys)
+        self._buffer.update(keys)
+        if len(self._buffer) >= self.buffer_keys:
+            self.flush()
+        return None
+
+    def flush(self):
+        """
+        Merge the buffered tallies into the counters.
+        A buffered key without a counter may have occurred up to min_count() times before,
+        so it starts from min_count() with min_count() as its error.
+        Keep the capacity largest counters.
+        """
+        buffer = self._buffer
+        if len(buffer) == 0:
+            return None
+        (counts, errors) = (self._counts, self._errors)
+        min_count = self._min_count()
+        # Set and dict operations run in C, unlike a loop with a branch per key.
+        if min_count > 0:
+            errors.update(dict.fromkeys(set(buffer).difference(counts), min_count))
+        counts_get = counts.get
+        counts.update({key: counts_get(key, min_count) + count for (key, count) in buffer.items()})
+        buffer.clear()
+        if len(counts) > self.capacity:
+            # Keep counters above the capacity-th largest count, then fill with ties.
+            threshold = sorted(counts.values())[-self.capacity]
+            kept = {key: count for (key, count) in counts.items() if count > threshold}
+            ties = [key for (key, count) in counts.items() if count == threshold]
+            kept.update(dict.fromkeys(ties[:self.capacity - len(kept)], threshold))
+            self._counts = kept
+            self._errors = {key: error for (key, error) in errors.items() if key in kept}
+        return None
+
+    def _min_count(self):
+        """
+        Return the smallest counter if the counters are full, otherwise 0.
+        """
+        if len(self._counts) < self.capacity:
+            return 0
+        return min(self._counts.values())
+
+    def min_count(self):
+        """
+        Return the smallest count if the sketch is full, otherwise 0.
+        A key without a counter has a true count of at most min_count().
+        """
+        self.flush()
+        return self._min_count()
+
+    def rows(self):
+        """
+        Return all counters as (key, count, error) tuples by descending count.
+        Rows are plain tuples so they serialize with pickle, marshal, or JSON.
+        """
+        self.flush()
+        errors_get = self._errors.get
+        rows = [(key, count, errors_get(key, 0)) for (key, count) in self._counts.items()]
+        rows.sort(key=lambda row: (-row[1], row[0]))
+        return rows
+
+    def top(self, k):
+        """
+        Return the k keys with the largest counts as (key, count, error) tuples by descending count.
+        """
+        return self.rows()[:k]
+
+    @classmethod
+    def from_rows(cls, rows, capacity, total=0):
+        """
+        Make a sketch from (key, count, error) rows of at most capacity keys.
+        """
+        sketch = cls(capacity=capacity)
+        sketch.total = total
+        for (key, count, error) in rows:
+            sketch._counts[key] = count
+            if error > 0:
+                sketch._errors[key] = error
+        return sketch
+
+def merge(sketches, capacity):
+    """
+    Merge Space-Saving sketches into one of the given capacity.
+    A key missing from a full sketch may have occurred up to that sketch's min_count() times,
+    so add min_count() to the key's count and error. Keep the capacity largest counters.
+    """
+    sketches = list(sketches)
+    min_counts = [sketch.min_count() for sketch in sketches]
+    sum_min = sum(min_counts)
+    (counts, errors) = ({}, {})
+    for (sketch, min_count) in zip(sketches, min_counts):
+        for (key, count, error) in sketch.rows():
+            if key in counts:
+                # Replace this sketch's assumed min_count with the key's actual counter.
+                counts[key] += count - min_count
+                errors[key] += error - min_count
+            else:
+                counts[key] = count + sum_min - min_count
+                errors[key] = error + sum_min - min_count
+    rows = heapq.nsmallest(capacity, ((key, count, errors[key]) for (key, count) in counts.items()),
+                           key=lambda row: (-row[1], row[0]))
+    return SpaceSaving.from_rows(rows, capacity=capacity, total=sum(sketch.total for sketch in sketches))
+
+def guaranteed(rows, k):
+    """
+    Return the number of the first k rows, by descending count, that are certainly among the true top k:
+    those whose lower bound, count - error, is at least the count of row k+1.
+    """
+    if len(rows) <= k:
+        return len(rows)
+    threshold = rows[k][1]
+    return sum(1 for (key, count, error) in rows[:k] if count - error >= threshold)
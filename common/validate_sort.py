@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Validate the output of a sort in one streaming pass, as TeraValidate does, without sorting again.
+
+- Order: Lines of each output split are checked to be in bytewise order, and the last line
+  of each split is checked against the first line of the next, so boundaries between splits
+  and between partitioned output parts, given in order, are checked too.
+- Contents: The line count and an order-independent checksum, the sum of the CRC-32 of each line
+  without its newline modulo 2**64, of the output are compared with those of the input.
+Input and output files are split at line boundaries and the splits are read in parallel.
+"""
+
+from __future__ import print_function, division
+import argparse
+import multiprocessing
+import operator
+import sys
+import zlib
+from localdisco import split_inputs
+import runlength
+import streamio
+
+# Checksums are summed modulo 2**64.
+# Python 2's zlib.crc32 is signed, so its sums differ from Python 3's but are compared the same way.
+CHECKSUM_MOD = 2**64
+
+def read_lines(fname, start, stop, block_size=streamio.BLOCK_SIZE):
+    """
+    Yield lists of lines, without newlines, of a line-aligned byte range of a file, one list per block.
+    """
+    with open(fname, 'rb') as f_in:
+        f_in.seek(start)
+        left = stop - start
+        tail = b''
+        while left > 0:
+            block = f_in.read(min(block_size, left))
+            if not block:
+                break
+            left -= len(block)
+            lines = (tail + block).split(b'\n')
+            # The part after the last newline continues in the next block.
+            tail = lines.pop()
+            yield lines
+        if tail:
+            yield [tail]
+    return
+
+def summarize_task(args):
+    """
+    Summarize a split: the number of lines read and of records, the checksum of the records,
+    the first and last keys, and the first misorder within the split as (line index, previous key, key).
+    Records are lines, or 'line<TAB>count' runs of count lines if record_format is 'counts'.
+    If strip, strip trailing whitespace from lines and skip empty lines, as the streaming mapper does.
+    Order is checked only if check_order; keys are lines with newlines if keep_newlines.
+    """
+    ((fname, start, stop), record_format, strip, check_order, keep_newlines) = args
+    summary = {'lines': 0, 'records': 0, 'checksum': 0, 'first': None, 'last': None, 'misorder': None}
+    for lines in read_lines(fname, start, stop):
+        num_lines = len(lines)
+        if strip:
+            lines = [line for line in map(bytes.rstrip, lines) if line]
+        if record_format == 'counts':
+            runs = [runlength.parse_run(line) for line in lines]
+            lines = [line for (line, _) in runs]
+            summary['records'] += sum(count for (_, count) in runs)
+            summary['checksum'] += sum(zlib.crc32(line) * count for (line, count) in runs)
+        else:
+            summary['records'] += len(lines)
+            summary['checksum'] += sum(map(zlib.crc32, lines))
+        summary['checksum'] %= CHECKSUM_MOD
+        if check_order and (len(lines) > 0):
+            keys = [line + b'\n' for line in lines] if keep_newlines else lines
+            if summary['first'] is None:
+                summary['first'] = keys[0]
+            elif summary['misorder'] is None and keys[0] < summary['last']:
+                summary['misorder'] = (summary['lines'], summary['last'], keys[0])
+            # Compare neighbors in C and look for the position only if some pair is out of order.
+            if (summary['misorder'] is None) and not all(map(operator.le, keys[:-1], keys[1:])):
+                idx = next(idx for idx in range(1, len(keys)) if keys[idx-1] > keys[idx])
+                summary['misorder'] = (summary['lines'] + idx, keys[idx-1], keys[idx])
+            summary['last'] = keys[-1]
+        summary['lines'] += num_lines
+    return summary
+
+def boundary_errors(splits, summaries):
+    """
+    Return a message for each misorder within or between output splits, in output order.
+    Lines are numbered from 1 within each file.
+    """
+    errors = []
+    # Lines in the file before each split.
+    line_offsets = []
+    (prev_fname, line_offset) = (None, 0)
+    for ((fname, _, _), summary) in zip(splits, summaries):
+        if fname != prev_fname:
+            (prev_fname, line_offset) = (fname, 0)
+        line_offsets.append(line_offset)
+        line_offset += summary['lines']
+    prev = None
+    for ((fname, _, _), summary, line_offset) in zip(splits, summaries, line_offsets):
+        if summary['misorder'] is not None:
+            (idx, key_prev, key) = summary['misorder']
+            errors.append(("Misorder at line {num} of {fname}: {key_prev!r} > {key!r}").format(
+                num=line_offset + idx + 1, fname=fname, key_prev=key_prev, key=key))
+        if summary['first'] is None:
+            continue
+        if (prev is not None) and (prev[1]['last'] > summary['first']):
+            if prev[0] == fname:
+                where = ("at line {num} of {fname}").format(num=line_offset + 1, fname=fname)
+            else:
+                where = ("between {fprev} and {fname}").format(fprev=prev[0], fname=fname)
+            errors.append(("Misorder {where}: {key_prev!r} > {key!r}").format(
+                where=where, key_prev=prev[1]['last'], key=summary['first']))
+        prev = (fname, summary)
+    return errors
+
+def main(files_in, files_out, record_format='lines', strip=False, keep_newlines=False,
+         num_procs=1, split_mb=64, max_errors=10):
+    """
+    Validate that files_out, concatenated in order, are the lines of files_in in sorted order.
+    Print a report and return True if valid.
+    """
+    split_bytes = split_mb * 2**20
+    splits_in = split_inputs(files_in, split_bytes)
+    splits_out = split_inputs(files_out, split_bytes)
+    # Input and output splits are summarized in one pool map to keep all processes busy.
+    task_args = ([(split, 'lines', strip, False, False) for split in splits_in]
+                 + [(split, record_format, False, True, keep_newlines) for split in splits_out])
+    pool = multiprocessing.Pool(processes=num_procs)
+    try:
+        summaries = pool.map(summarize_task, task_args, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    (summaries_in, summaries_out) = (summaries[:len(splits_in)], summaries[len(splits_in):])
+    errors = boundary_errors(splits_out, summaries_out)
+    print(("{files:<8} {splits:>8} {records:>14} {checksum:>18}").format(
+        files='files', splits='splits', records='records', checksum='checksum'))
+    totals = {}
+    for (name, splits, summaries) in [('input', splits_in, summaries_in), ('output', splits_out, summaries_out)]:
+        totals[name] = (sum(summary['records'] for summary in summaries),
+                        sum(summary['checksum'] for summary in summaries) % CHECKSUM_MOD)
+        print(("{files:<8} {splits:>8d} {records:>14d} {checksum:>18x}").format(
+            files=name, splits=len(splits), records=totals[name][0], checksum=totals[name][1]))
+    if totals['input'][0] != totals['output'][0]:
+        errors.append(("Output has {num_out} lines, input has {num_in} lines").format(
+            num_out=totals['output'][0], num_in=totals['input'][0]))
+    elif totals['input'][1] != totals['output'][1]:
+        errors.append("Output checksum differs from input checksum")
+    for error in errors[:max_errors]:
+        print(("ERROR: {error}").format(error=error))
+    if len(errors) > max_errors:
+        print(("ERROR: {num} more errors not shown").format(num=len(errors) - max_errors))
+    print(("INFO: Output is {valid}").format(valid='valid' if len(errors) == 0 else 'NOT valid'))
+    return len(errors) == 0
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['record_format'] = 'lines'
+    arg_default_map['num_procs'] = multiprocessing.cpu_count()
+    arg_default_map['split_mb'] = 64
+    arg_default_map['max_errors'] = 10
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Validate sort output against its input in one pass, as TeraValidate does.")
+    parser.add_argument('--files_in',
+                        nargs='+',
+                        required=True,
+                        help=("Input text files.\n"
+                              +"Example: --files_in /path/to/files/*.txt"))
+    parser.add_argument('--files_out',
+                        nargs='+',
+                        required=True,
+                        help=("Output files, in order. Partitioned outputs are checked across part boundaries.\n"
+                              +"Example: --files_out results/part-*"))
+    parser.add_argument('--record_format',
+                        choices=['lines', 'counts'],
+                        default=arg_default_map['record_format'],
+                        help=(("Output records: 'lines', or 'counts' for 'line<TAB>count' records as written\n"
+                               +"by the Hadoop streaming reducer and by sort_mapr.py --run_length.\n"
+                               +"Default: {default}").format(default=arg_default_map['record_format'])))
+    parser.add_argument('--strip',
+                        action='store_true',
+                        help=("Strip trailing whitespace from input lines and skip empty lines,\n"
+                              +"as the Hadoop streaming mapper does."))
+    parser.add_argument('--keep_newlines',
+                        action='store_true',
+                        help=("Compare lines with their newlines, as sort_nomapr.py orders them.\n"
+                              +"Otherwise compare lines without newlines, as 'LC_ALL=C sort' does."))
+    parser.add_argument('--num_procs',
+                        type=int,
+                        default=arg_default_map['num_procs'],
+                        help=(("Number of worker processes.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_procs'])))
+    parser.add_argument('--split_mb',
+                        type=int,
+                        default=arg_default_map['split_mb'],
+                        help=(("Size of line-aligned file splits read by each task, in MB.\n"
+                               +"Default: {default}").format(default=arg_default_map['split_mb'])))
+    parser.add_argument('--max_errors',
+                        type=int,
+                        default=arg_default_map['max_errors'],
+                        help=(("Maximum number of errors to print.\n"
+                               +"Default: {default}").format(default=arg_default_map['max_errors'])))
+    args = parser.parse_args()
+    print(args)
+
+    # Exit with status 1 if the output is not valid, for use in scripts.
+    valid = main(files_in=args.files_in, files_out=args.files_out, record_format=args.record_format,
+                 strip=args.strip, keep_newlines=args.keep_newlines, num_procs=args.num_procs,
+                 split_mb=args.split_mb, max_errors=args.max_errors)
+    sys.exit(0 if valid else 1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Benchmark initializations of streaming Lloyd k-means: the first points of the file, points sampled at random,
+and k-means||. Points are drawn from a Gaussian mixture by gen_mixture.py and written as binary points files,
+so that a pass costs as little to read as it does with map-reduce on loaded data.
+Each pass over the points is one map-reduce job with kmeans_mapr.py, so report the passes of the initialization
+and of the Lloyd iterations to convergence, the time of each, and the final inertia relative to the best run.
+"""
+
+from __future__ import print_function, division
+import argparse
+import shutil
+import tempfile
+import time
+import gen_mixture
+import kmeans_nomapr
+
+def main(num_points, n_dims, n_clusters, inits, seeds, n_rounds, max_iter, tol, tmp_dir=None):
+    """
+    Write points, then run Lloyd k-means from each initialization and seed and print a comparison.
+    """
+    rows_out = []
+    dir_tmp = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        gen_mixture.main(dir_tmp, num_points, n_dims=n_dims, n_clusters=n_clusters, file_format='points')
+        for seed in seeds:
+            for init in inits:
+                time_start = time.time()
+                (centers, init_passes) = kmeans_nomapr.init_centers(dir_tmp, n_clusters, init=init,
+                                                                    n_rounds=n_rounds, seed=seed)
+                init_seconds = time.time() - time_start
+                (centers, iterations, inertia) = kmeans_nomapr.lloyd_kmeans(dir_tmp, centers, max_iter=max_iter,
+                                                                            tol=tol)
+                seconds = time.time() - time_start
+                rows_out.append((init, seed, init_passes, iterations, init_seconds, seconds, inertia))
+    finally:
+        shutil.rmtree(dir_tmp)
+    best = min(row[-1] for row in rows_out)
+    print(("{init:<10} {seed:>5} {init_passes:>11} {iterations:>10} {passes:>7} {init_seconds:>12} {seconds:>9} {ratio:>8}").format(
+        init='init', seed='seed', init_passes='init passes', iterations='iterations', passes='passes',
+        init_seconds='init seconds', seconds='seconds', ratio='inertia'))
+    for (init, seed, init_passes, iterations, init_seconds, seconds, inertia) in rows_out:
+        print(("{init:<10} {seed:>5d} {init_passes:>11d} {iterations:>10d} {passes:>7d} {init_seconds:>12.2f} {seconds:>9.2f} {ratio:>8.4f}").format(
+            init=init, seed=seed, init_passes=init_passes, iterations=iterations, passes=init_passes + iterations,
+            init_seconds=init_seconds, seconds=seconds, ratio=inertia / best))
+    return None
+
+if __name__ == '__main__':
+
+    num_points_default = 10**6
+    n_dims_default = 8
+    n_clusters_default = 20
+    inits_default = ['first', 'random', 'k-means||']
+    seeds_default = [0, 1, 2]
+    n_rounds_default = 5
+    max_iter_default = 300
+    tol_default = 1e-4
+    tmp_dir_default = None
+
+    parser = argparse.ArgumentParser(description="Benchmark initializations of streaming Lloyd k-means.")
+    parser.add_argument("--num_points",
+                        default=num_points_default,
+                        type=int,
+                        help="Number of points. Default: {default}".format(default=num_points_default))
+    parser.add_argument("--n_dims",
+                        default=n_dims_default,
+                        type=int,
+                        help="Dimensions per point. Default: {default}".format(default=n_dims_default))
+    parser.add_argument("--n_clusters",
+                        default=n_clusters_default,
+                        type=int,
+                        help="Clusters generated and found. Default: {default}".format(default=n_clusters_default))
+    parser.add_argument("--inits",
+                        default=inits_default,
+                        nargs='+',
+                        choices=['k-means++', 'first', 'random', 'k-means||'],
+                        help="Initializations to compare. Default: {default}".format(default=inits_default))
+    parser.add_argument("--seeds",
+                        default=seeds_default,
+                        nargs='+',
+                        type=int,
+                        help="Seeds of the initializations, one run each. Default: {default}".format(default=seeds_default))
+    parser.add_argument("--n_rounds",
+                        default=n_rounds_default,
+                        type=int,
+                        help="k-means|| sampling rounds. Default: {default}".format(default=n_rounds_default))
+    parser.add_argument("--max_iter",
+                        default=max_iter_default,
+                        type=int,
+                        help="Maximum number of Lloyd iterations. Default: {default}".format(default=max_iter_default))
+    parser.add_argument("--tol",
+                        default=tol_default,
+                        type=float,
+                        help=("Stop when the sum of squared center shifts of an iteration is at most tol."
+                              +" Default: {default}").format(default=tol_default))
+    parser.add_argument("--tmp_dir",
+                        default=tmp_dir_default,
+                        help="Directory for the generated points. Default: system temporary directory")
+    args = parser.parse_args()
+    print(args)
+
+    main(num_points=args.num_points, n_dims=args.n_dims, n_clusters=args.n_clusters, inits=args.inits,
+         seeds=args.seeds, n_rounds=args.n_rounds, max_iter=args.max_iter, tol=args.tol, tmp_dir=args.tmp_dir)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Benchmark streaming mini-batch k-means against full-batch scikit-learn KMeans at increasing data sizes.
+Points are drawn from a Gaussian mixture by gen_mixture.py and written to a .csv per size.
+Report time, peak RSS, and inertia of each in a separate process, and the inertia relative to KMeans.
+"""
+
+from __future__ import print_function, division
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+import gen_mixture
+import kmeans_nomapr
+from utils import CHUNK_ROWS
+
+def run(mode, file_in, file_out, n_clusters, kwargs, queue):
+    """
+    Run one mode and put its inertia, time, and peak RSS on the queue.
+    """
+    time_start = time.time()
+    (_, inertia) = kmeans_nomapr.main(file_in, file_out, n_clusters, mode=mode, **kwargs)
+    seconds = time.time() - time_start
+    # Linux reports ru_maxrss in KB.
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    queue.put((inertia, seconds, peak_rss_mb))
+    return None
+
+def main(sizes, n_dims, n_clusters, batch_rows, chunk_rows, n_epochs, tmp_dir=None):
+    """
+    For each size, write points, then run each mode in its own process and print a comparison.
+    """
+    kwargs = {'batch_rows': batch_rows, 'chunk_rows': chunk_rows, 'n_epochs': n_epochs}
+    rows_out = []
+    dir_tmp = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        for num_points in sizes:
+            file_in = gen_mixture.main(os.path.join(dir_tmp, str(num_points)), num_points, n_dims=n_dims,
+                                       n_clusters=n_clusters)[0]
+            batch_inertia = None
+            for mode in ['batch', 'minibatch']:
+                queue = multiprocessing.Queue()
+                proc = multiprocessing.Process(target=run, args=(mode, file_in, os.path.join(dir_tmp, "centers.csv"),
+                                                                 n_clusters, kwargs, queue))
+                proc.start()
+                (inertia, seconds, peak_rss_mb) = queue.get()
+                proc.join()
+                if batch_inertia is None:
+                    batch_inertia = inertia
+                rows_out.append((mode, num_points, seconds, peak_rss_mb, inertia, inertia / batch_inertia))
+    finally:
+        shutil.rmtree(dir_tmp)
+    print(("{mode:<10} {points:>10} {seconds:>9} {rss:>12} {inertia:>12} {ratio:>8}").format(
+        mode='mode', points='points', seconds='seconds', rss='peak RSS MB', inertia='inertia', ratio='ratio'))
+    for (mode, num_points, seconds, peak_rss_mb, inertia, ratio) in rows_out:
+        print(("{mode:<10} {points:>10d} {seconds:>9.2f} {rss:>12.1f} {inertia:>12.6g} {ratio:>8.4f}").format(
+            mode=mode, points=num_points, seconds=seconds, rss=peak_rss_mb, inertia=inertia, ratio=ratio))
+    return None
+
+if __name__ == '__main__':
+
+    sizes_default = [10**4, 10**5, 10**6]
+    n_dims_default = 8
+    n_clusters_default = 8
+    batch_rows_default = 1024
+    chunk_rows_default = CHUNK_ROWS
+    n_epochs_default = 3
+    tmp_dir_default = None
+
+    parser = argparse.ArgumentParser(description="Benchmark mini-batch k-means against scikit-learn's KMeans.")
+    parser.add_argument("--sizes",
+                        default=sizes_default,
+                        nargs='+',
+                        type=int,
+                        help="Numbers of points, one data set per size. Default: {default}".format(default=sizes_default))
+    parser.add_argument("--n_dims",
+                        default=n_dims_default,
+                        type=int,
+                        help="Dimensions per point. Default: {default}".format(default=n_dims_default))
+    parser.add_argument("--n_clusters",
+                        default=n_clusters_default,
+                        type=int,
+                        help="Clusters generated and found. Default: {default}".format(default=n_clusters_default))
+    parser.add_argument("--batch_rows",
+                        default=batch_rows_default,
+                        type=int,
+                        help="Points per mini-batch center update. Default: {default}".format(default=batch_rows_default))
+    parser.add_argument("--chunk_rows",
+                        default=chunk_rows_default,
+                        type=int,
+                        help="Points read and parsed at once. Default: {default}".format(default=chunk_rows_default))
+    parser.add_argument("--n_epochs",
+                        default=n_epochs_default,
+                        type=int,
+                        help="Mini-batch passes over the file. Default: {default}".format(default=n_epochs_default))
+    parser.add_argument("--tmp_dir",
+                        default=tmp_dir_default,
+                        help="Directory for the generated points. Default: system temporary directory")
+    args = parser.parse_args()
+    print(args)
+
+    main(sizes=args.sizes, n_dims=args.n_dims, n_clusters=args.n_clusters, batch_rows=args.batch_rows,
+         chunk_rows=args.chunk_rows, n_epochs=args.n_epochs, tmp_dir=args.tmp_dir)
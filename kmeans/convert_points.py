@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Convert a .csv file of points to a directory of binary points files, as chunks of up to chunk_rows rows.
+k-means passes memory-map points files instead of parsing text. See utils.py for the format.
+"""
+
+from __future__ import print_function
+import argparse
+from utils import CHUNK_ROWS, POINTS_DTYPES, convert_csv
+
+def main(file_in, dir_out, dtype, chunk_rows):
+    """
+    Convert file_in to points files in dir_out.
+    """
+
+    files_out = convert_csv(file_in, dir_out, dtype=dtype, chunk_rows=chunk_rows)
+    print(("INFO: Wrote {num} points files to {dir_out}").format(num=len(files_out), dir_out=dir_out))
+    return None
+
+if __name__ == '__main__':
+
+    file_in_default = "iris.csv"
+    dir_out_default = "iris_points"
+    dtype_default = 'float64'
+    chunk_rows_default = CHUNK_ROWS
+
+    parser = argparse.ArgumentParser(description="Convert .csv points to binary points files.")
+    parser.add_argument("--file_in",
+                        default=file_in_default,
+                        help="Input file in csv format. Default: {default}".format(default=file_in_default))
+    parser.add_argument("--dir_out",
+                        default=dir_out_default,
+                        help="Output directory of points files. Default: {default}".format(default=dir_out_default))
+    parser.add_argument("--dtype",
+                        default=dtype_default,
+                        choices=sorted(POINTS_DTYPES),
+                        help="Data type of the points. Default: {default}".format(default=dtype_default))
+    parser.add_argument("--chunk_rows",
+                        default=chunk_rows_default,
+                        type=int,
+                        help=("Points per file, which is one Disco blob when loaded with load.py."
+                              +" Default: {default}").format(default=chunk_rows_default))
+    args = parser.parse_args()
+    print(args)
+
+    main(file_in=args.file_in, dir_out=args.dir_out, dtype=args.dtype, chunk_rows=args.chunk_rows)
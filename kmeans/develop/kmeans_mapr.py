@@ -1,63 +1,316 @@
 #!/usr/bin/env python
 """
-Do k-means clusting with map-reduce.
+Do k-means clustering with map-reduce from a Disco tag of .csv points and output centers to a .csv.
 Adapted from disco/examples/datamining/kclustering.py
+
+Each iteration is one map-reduce job with the current centers as params:
+- Map: Each line is parsed in blocks of points. The combiner of each map task assigns a whole block
+  to the nearest centers with one NumPy distance computation and accumulates per-cluster partial sums
+  and counts, then outputs one partial sum per cluster when the task is done.
+- Reduce: Partial sums and counts of each cluster are added, and the new center is their mean.
+Iterations stop when the sum of squared center shifts is at most tol, or after max_iter.
+Load points with kmeans/load.py.
+With --input_format points, the tag holds binary points files from kmeans/convert_points.py.
+The map reader then yields blocks of points as array views of each blob, which the combiner assigns without parsing.
+
+Initial centers are the first n_clusters points of the tag, or with --init k-means|| are chosen in n_rounds + 1 jobs.
+Each KCandidates job is a round that samples candidates with probability proportional to their squared distance
+to the candidates so far: combiners keep a superset of each task's sample by the cost so far, and the reduce selects
+the sample by the total cost. A KCluster job with the candidates as centers counts their nearest points,
+and the master clusters the candidates weighted by the counts. See kmeans/utils.py.
 """
 
+from __future__ import print_function, division
 import argparse
+import itertools
 import os
+import sys
 import numpy as np
-from disco.ddfs import DDFS
 from disco.core import Job, result_iterator
-from disco.util import kvgroup
+from disco.ddfs import DDFS
 from disco.func import chain_reader
+from disco.util import kvgroup
+# Disco ships modules imported by the job module to the slave nodes.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils import parse_lines, partial_sums, points_reader, sample_candidates, select_candidates, weighted_kmeans
 
-def main(file_in="iris.csv", file_out="centers.csv", n_clusters=3):
-    # TODO: Rename tag data:kcluster1 if tag exists.
-    # Disco v0.4.4 requires that ./ prefix the file to idendify as local file.
-    # http://disco.readthedocs.org/en/0.4.4/howto/chunk.html#chunking
-    tag = "data:sort"
-    DDFS().chunk(tag=tag, urls=['./'+file_in])
-    try:
-        # Import since slave nodes do not have same namespace as master
-        from kcluster_map_reduce import KCluster
-        job = KCluster().run(input=[tag], map_reader=chain_reader)
-        with open(file_out, 'w') as f_out:
-            writer = csv.writer(f_out, quoting=csv.QUOTE_NONNUMERIC)
-            for center in result _iterator(job.wait(show=True)):
-                writer.writerow([center])
-    finally:
-        DDFS().delete(tag=tag)
-    return None
+def next_block(buf, entry, done, block_rows):
+    """
+    Return the next block of points of a combiner: a block of points from points_reader,
+    or block_rows buffered lines, or the lines left when done, parsed. Otherwise buffer the line and return None.
+    """
+    if done:
+        points = parse_lines(buf['lines']) if len(buf['lines']) > 0 else None
+        buf['lines'] = []
+        return points
+    if isinstance(entry, np.ndarray):
+        return entry
+    buf['lines'].append(entry)
+    if len(buf['lines']) < block_rows:
+        return None
+    points = parse_lines(buf['lines'])
+    buf['lines'] = []
+    return points
 
 class KCluster(Job):
+    """
+    Map each point to the combiner.
+    Combine points in blocks into partial sums per cluster.
+    Reduce partial sums to new centers.
+    """
+
+    def map(self, entry, params):
+        """
+        Map:
+        Pass each non-empty line, or block of points from points_reader, to the combiner,
+        which parses lines in blocks: (0, line) or (0, points)
+        """
+
+        if isinstance(entry, np.ndarray) or entry.strip():
+            yield (0, entry)
+
+    def combiner(self, key, entry, buf, done, params):
+        """
+        Combine:
+        Buffer lines up to params['block_rows'] and parse them, then assign the block, or a block of points,
+        to the nearest centers and add the block's points to per-cluster sums. When done, output
+        (cluster, (sum, count, inertia)) for each cluster.
+        """
+
+        if 'centers' not in buf:
+            centers = np.asarray(params['centers'], dtype=np.float64)
+            buf['centers'] = centers
+            buf['lines'] = []
+            buf['sums'] = np.zeros_like(centers)
+            buf['counts'] = np.zeros(len(centers), dtype=np.int64)
+            buf['inertia'] = np.zeros(len(centers), dtype=np.float64)
+        points = next_block(buf, entry, done, params['block_rows'])
+        if points is not None:
+            (sums, counts, inertia) = partial_sums(points, buf['centers'])
+            buf['sums'] += sums
+            buf['counts'] += counts
+            buf['inertia'] += inertia
+        if not done:
+            return None
+        return [(cluster, (buf['sums'][cluster].tolist(), int(buf['counts'][cluster]), float(buf['inertia'][cluster])))
+                for cluster in range(len(buf['centers']))]
+
+    def reduce(self, rows_iter, out, params):
+        """
+        Reduce:
+        Add the partial sums and counts of each cluster and output (cluster, (center, count, inertia)).
+        A cluster without points keeps its center.
+        """
+
+        for (cluster, partials) in kvgroup(sorted(rows_iter)):
+            (total, count, inertia) = (None, 0, 0.0)
+            for (psum, pcount, pinertia) in partials:
+                total = np.asarray(psum) if total is None else total + psum
+                count += pcount
+                inertia += pinertia
+            center = total / count if count > 0 else np.asarray(params['centers'][cluster])
+            out.add(cluster, (center.tolist(), count, inertia))
+        return None
+
+class KCandidates(Job):
+    """
+    Map each point to the combiner.
+    Combine points in blocks into the task's cost and candidates for a k-means|| round.
+    Reduce the costs and candidates to the round's sample.
+    """
 
-    # TODO: Fastest way forward is to update versions to most dev branch and use built-in map-reduce
-    # Simplest, dumbest way.
-    # One node per cluster
-    # Assign a cluster center to first 3 data data points.
-    # Compute distance of all points to each center.
-    # Each point is assigned to cluster with minimum distance.
-    # With new point assignments, each cluster center is recomputed.
-    # new center - old center = diff
-    # repeat distance calc.
-    # repeat assignment
-    # repeat center determination
-    # repeat diff
-    # if diff old - diff new / diff old > 0.05, repeat again
-
-    def random_init_map(element, params):
-        """Assign data element randomply to one of k clusters."""
-        yield
-    pass
+    def map(self, entry, params):
+        """
+        Map:
+        Pass each non-empty line, or block of points, to the combiner as KCluster does: (0, line) or (0, points)
+        """
+
+        if isinstance(entry, np.ndarray) or entry.strip():
+            yield (0, entry)
+
+    def combiner(self, key, entry, buf, done, params):
+        """
+        Combine:
+        Buffer and parse lines in blocks as KCluster does, then add each block's cost of the candidates so far
+        and keep the points that may be sampled, with their scores. When done, output
+        (0, (cost, points, scores)).
+        """
+
+        if 'centers' not in buf:
+            buf['centers'] = np.asarray(params['centers'], dtype=np.float64)
+            buf['lines'] = []
+            buf['cost'] = 0.0
+            buf['points'] = []
+            buf['scores'] = []
+        points = next_block(buf, entry, done, params['block_rows'])
+        if points is not None:
+            (cost, kept, scores) = sample_candidates(points, buf['centers'], params['oversampling'], buf['cost'],
+                                                     params['seed'], params['round_idx'])
+            buf['cost'] += cost
+            buf['points'].extend(kept.tolist())
+            buf['scores'].extend(scores.tolist())
+        if not done:
+            return None
+        return [(0, (float(buf['cost']), buf['points'], buf['scores']))]
+
+    def reduce(self, rows_iter, out, params):
+        """
+        Reduce:
+        Add the costs of the tasks and select the sampled candidates by the total cost: (0, (cost, candidates))
+        """
+
+        (cost, points, scores) = (0.0, [], [])
+        for (_, (task_cost, task_points, task_scores)) in rows_iter:
+            cost += task_cost
+            points.extend(task_points)
+            scores.extend(task_scores)
+        candidates = select_candidates(np.array(points, dtype=np.float64).reshape(len(points), len(params['centers'][0])),
+                                       np.array(scores, dtype=np.float64), cost, params['oversampling'])
+        out.add(0, (cost, candidates.tolist()))
+        return None
+
+def first_points(tag, n_points, input_format='csv'):
+    """
+    Return up to the first n_points points of the tag's first blob, as initial centers.
+    """
+    blob = next(iter(DDFS().blobs(tag)))
+    if input_format == 'points':
+        block = next(iter(result_iterator([blob], reader=points_reader)))
+        return np.array(block[:n_points], dtype=np.float64)
+    lines = [line for line in itertools.islice(result_iterator([blob], reader=chain_reader), 10*n_points)
+             if line.strip()][:n_points]
+    return parse_lines(lines)
+
+def kmeans_parallel(tag, n_clusters, oversampling=None, n_rounds=5, block_rows=2**14, input_format='csv', seed=0):
+    """
+    Choose initial centers by k-means||, oversampling 2*n_clusters candidates per round by default.
+    The first candidate is chosen uniformly from the first points of the tag.
+    Return the centers and the number of jobs.
+    """
+
+    # Import since slave nodes do not have same namespace as master.
+    from kmeans_mapr import KCandidates, KCluster
+    oversampling = 2*n_clusters if oversampling is None else oversampling
+    map_reader = points_reader if input_format == 'points' else chain_reader
+    points = first_points(tag, 1000, input_format=input_format)
+    candidates = points[np.random.RandomState(seed).randint(len(points))][np.newaxis]
+    jobs = 0
+    for round_idx in range(n_rounds):
+        job = KCandidates().run(input=[tag], map_reader=map_reader,
+                                params={'centers': candidates.tolist(), 'oversampling': oversampling, 'seed': seed,
+                                        'round_idx': round_idx, 'block_rows': block_rows})
+        [(_, (cost, new))] = list(result_iterator(job.wait(show=False)))
+        jobs += 1
+        print(("INFO: k-means|| round {round_idx}: cost {cost:.6g}, {num} new candidates").format(
+            round_idx=round_idx + 1, cost=cost, num=len(new)))
+        if cost == 0:
+            break
+        if len(new) > 0:
+            candidates = np.concatenate([candidates, np.array(new, dtype=np.float64)])
+    job = KCluster().run(input=[tag], map_reader=map_reader,
+                         params={'centers': candidates.tolist(), 'block_rows': block_rows})
+    counts = np.zeros(len(candidates))
+    for (cluster, (_, count, _)) in result_iterator(job.wait(show=False)):
+        counts[cluster] = count
+    jobs += 1
+    return (weighted_kmeans(candidates, counts, n_clusters, seed=seed), jobs)
+
+def main(tag, file_out, n_clusters=3, max_iter=300, tol=1e-4, block_rows=2**14, input_format='csv',
+         init='first', oversampling=None, n_rounds=5, seed=0):
+    """
+    Run KCluster map-reduce jobs from initial centers until the centers converge,
+    then write the centers to file_out. Return the centers, the number of iterations, and the inertia.
+    Initial centers are the first n_clusters points if init is 'first', or chosen by k-means|| if 'k-means||'.
+    """
+
+    # Import since slave nodes do not have same namespace as master.
+    from kmeans_mapr import KCluster
+    map_reader = points_reader if input_format == 'points' else chain_reader
+    if init == 'k-means||':
+        (centers, jobs) = kmeans_parallel(tag, n_clusters, oversampling=oversampling, n_rounds=n_rounds,
+                                          block_rows=block_rows, input_format=input_format, seed=seed)
+        print(("INFO: Initialization by k-means||: {jobs} jobs").format(jobs=jobs))
+    else:
+        centers = first_points(tag, n_clusters, input_format=input_format)
+    for iteration in range(1, max_iter + 1):
+        job = KCluster().run(input=[tag], map_reader=map_reader,
+                             params={'centers': centers.tolist(), 'block_rows': block_rows})
+        rows = sorted(result_iterator(job.wait(show=False)))
+        new_centers = np.array([center for (_, (center, _, _)) in rows], dtype=np.float64)
+        inertia = sum(cluster_inertia for (_, (_, _, cluster_inertia)) in rows)
+        shift = np.sum((new_centers - centers)**2)
+        centers = new_centers
+        print(("INFO: Iteration {iteration}: inertia {inertia:.6g}, center shift {shift:.3g}").format(
+            iteration=iteration, inertia=inertia, shift=shift))
+        if shift <= tol:
+            break
+    np.savetxt(file_out, centers, delimiter=",")
+    return (centers, iteration, inertia)
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="Do k-means clustering on file with map-reduce.")
-    parser.add_argument("--file_in", default="iris.csv", help="Input file in CSV format. Default: iris.csv")
-    parser.add_argument("--file_out", default="centers.csv", help="Output file. Default: centers.csv")
-    parser.add_argument("--n_clusters", default=3, type=int, help="Number of clusters. Default: 3")
+
+    tag_default = "data:kmeans"
+    file_out_default = "centers.csv"
+    n_clusters_default = 3
+    max_iter_default = 300
+    tol_default = 1e-4
+    block_rows_default = 2**14
+    input_format_default = 'csv'
+    init_default = 'first'
+    oversampling_default = None
+    n_rounds_default = 5
+    seed_default = 0
+
+    parser = argparse.ArgumentParser(description="Do k-means clustering on a tagged Disco data set with map-reduce.")
+    parser.add_argument("--tag",
+                        default=tag_default,
+                        help="Input tag of points in csv format. Default: {default}".format(default=tag_default))
+    parser.add_argument("--file_out",
+                        default=file_out_default,
+                        help="Output file with cluster centers. Default: {default}".format(default=file_out_default))
+    parser.add_argument("--n_clusters",
+                        default=n_clusters_default,
+                        type=int,
+                        help="Number of cluster centers to find. Default: {default}".format(default=n_clusters_default))
+    parser.add_argument("--max_iter",
+                        default=max_iter_default,
+                        type=int,
+                        help="Maximum number of iterations. Default: {default}".format(default=max_iter_default))
+    parser.add_argument("--tol",
+                        default=tol_default,
+                        type=float,
+                        help=("Stop when the sum of squared center shifts of an iteration is at most tol."
+                              +" Default: {default}").format(default=tol_default))
+    parser.add_argument("--block_rows",
+                        default=block_rows_default,
+                        type=int,
+                        help=("Points per block assigned with one NumPy distance computation."
+                              +" Default: {default}").format(default=block_rows_default))
+    parser.add_argument("--input_format",
+                        default=input_format_default,
+                        choices=['csv', 'points'],
+                        help=("Tag of .csv chunks, or of binary points files from kmeans/convert_points.py."
+                              +" Default: {default}").format(default=input_format_default))
+    parser.add_argument("--init",
+                        default=init_default,
+                        choices=['first', 'k-means||'],
+                        help=("Initial centers: the first points of the tag, or k-means|| in n_rounds + 1 jobs."
+                              +" Default: {default}").format(default=init_default))
+    parser.add_argument("--oversampling",
+                        default=oversampling_default,
+                        type=int,
+                        help="Expected candidates sampled per k-means|| round. Default: 2 * n_clusters")
+    parser.add_argument("--n_rounds",
+                        default=n_rounds_default,
+                        type=int,
+                        help="k-means|| sampling rounds, one job each. Default: {default}".format(default=n_rounds_default))
+    parser.add_argument("--seed",
+                        default=seed_default,
+                        type=int,
+                        help="Seed of k-means||. Default: {default}".format(default=seed_default))
     args = parser.parse_args()
-    print args
-    if not os.path.isfile(args.file_in):
-        create_iris_csv
-    main(file_in=args.file_in, file_out=args.file_out, n_clusters=args.n_clusters)
+    print(args)
+
+    main(tag=args.tag, file_out=args.file_out, n_clusters=args.n_clusters, max_iter=args.max_iter,
+         tol=args.tol, block_rows=args.block_rows, input_format=args.input_format, init=args.init,
+         oversampling=args.oversampling, n_rounds=args.n_rounds, seed=args.seed)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Generate points of a Gaussian mixture for k-means, to scale beyond iris.csv.
+
+The mixture has n_clusters components of equal weight with centers drawn uniformly from [-center_box, center_box]
+in each of n_dims dimensions, and spherical standard deviation cluster_std.
+The true centers are written to centers_true.csv in the output directory to check the centers found.
+Points of chunk c of CHUNK_ROWS rows are drawn from (seed, c) alone, so files are written in parallel
+and the same seed gives the same points for any --num_files and --num_procs.
+Memory is bounded by a chunk per process, not by the number of points.
+Points are written as part_NNNNN.csv, or as binary part_NNNNN.pts points files as by convert_points.py.
+"""
+
+from __future__ import print_function, division
+import argparse
+import multiprocessing
+import os
+import numpy as np
+from utils import CHUNK_ROWS, POINTS_DTYPES, POINTS_EXT, pack_header
+
+# Output file of the true centers.
+CENTERS_FILE = 'centers_true.csv'
+
+def gen_centers(seed, n_dims, n_clusters, center_box=10.0):
+    """
+    Return the true centers of the mixture of a seed.
+    """
+    rng = np.random.RandomState(seed)
+    return rng.uniform(-center_box, center_box, size=(n_clusters, n_dims))
+
+def gen_points(seed, centers, cluster_std, start, stop):
+    """
+    Return points start to stop as an array of shape (stop - start, n_dims).
+    """
+    points = np.empty((stop - start, centers.shape[1]), dtype=np.float64)
+    for chunk in range(start // CHUNK_ROWS, (stop - 1) // CHUNK_ROWS + 1):
+        rng = np.random.RandomState([seed, chunk])
+        labels = rng.randint(len(centers), size=CHUNK_ROWS)
+        noise = rng.normal(scale=cluster_std, size=(CHUNK_ROWS, centers.shape[1]))
+        lo = max(start, chunk * CHUNK_ROWS)
+        hi = min(stop, (chunk + 1) * CHUNK_ROWS)
+        rows = slice(lo - chunk*CHUNK_ROWS, hi - chunk*CHUNK_ROWS)
+        points[lo-start:hi-start] = centers[labels[rows]] + noise[rows]
+    return points
+
+def format_csv(points):
+    """
+    Return points as .csv text with 6 decimals, formatted with one string operation per chunk
+    rather than one per row as by np.savetxt.
+    """
+    (rows, dims) = points.shape
+    row_fmt = ','.join(['%.6f'] * dims) + '\n'
+    return ((row_fmt * rows) % tuple(points.ravel())).encode('ascii')
+
+def gen_file(args):
+    """
+    Write points start to stop to a file in chunks. Return the file and its number of points.
+    """
+    (fname, seed, centers, cluster_std, start, stop, file_format, dtype) = args
+    # Write whole chunks, so that each chunk's points are drawn once.
+    bounds = [start] + list(range((start // CHUNK_ROWS + 1) * CHUNK_ROWS, stop, CHUNK_ROWS)) + [stop]
+    with open(fname, 'wb') as f_out:
+        if file_format == 'points':
+            f_out.write(pack_header(dtype, stop - start, centers.shape[1]))
+        for (lo, hi) in zip(bounds[:-1], bounds[1:]):
+            if hi > lo:
+                points = gen_points(seed, centers, cluster_std, lo, hi)
+                if file_format == 'points':
+                    f_out.write(points.astype(POINTS_DTYPES[dtype][1]).tobytes())
+                else:
+                    f_out.write(format_csv(points))
+    return (fname, stop - start)
+
+def main(dir_out, num_points, n_dims=4, n_clusters=3, cluster_std=1.0, center_box=10.0, num_files=1,
+         file_format='csv', dtype='float64', seed=0, num_procs=1):
+    """
+    Write num_points points to num_files files in dir_out, in parallel, and the true centers to centers_true.csv.
+    File i has points i*num_points//num_files to (i+1)*num_points//num_files.
+    Return the files.
+    """
+    if not os.path.isdir(dir_out):
+        os.makedirs(dir_out)
+    centers = gen_centers(seed, n_dims, n_clusters, center_box=center_box)
+    np.savetxt(os.path.join(dir_out, CENTERS_FILE), centers, delimiter=",")
+    ext = POINTS_EXT if file_format == 'points' else '.csv'
+    bounds = [idx * num_points // num_files for idx in range(num_files + 1)]
+    gen_args = [(os.path.join(dir_out, ("part_{idx:05d}{ext}").format(idx=idx, ext=ext)), seed, centers, cluster_std,
+                 bounds[idx], bounds[idx+1], file_format, dtype)
+                for idx in range(num_files)]
+    pool = multiprocessing.Pool(processes=num_procs)
+    try:
+        fnames = [fname for (fname, _) in pool.map(gen_file, gen_args, chunksize=1)]
+    finally:
+        pool.close()
+        pool.join()
+    print(("INFO: Wrote {num} points of {n_dims} dimensions from {n_clusters} clusters to {num_files} files in {dir_out}").format(
+        num=num_points, n_dims=n_dims, n_clusters=n_clusters, num_files=num_files, dir_out=dir_out))
+    return fnames
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['dir_out'] = 'mixture'
+    arg_default_map['num_points'] = 10**6
+    arg_default_map['n_dims'] = 4
+    arg_default_map['n_clusters'] = 3
+    arg_default_map['cluster_std'] = 1.0
+    arg_default_map['center_box'] = 10.0
+    arg_default_map['num_files'] = multiprocessing.cpu_count()
+    arg_default_map['file_format'] = 'csv'
+    arg_default_map['dtype'] = 'float64'
+    arg_default_map['seed'] = 0
+    arg_default_map['num_procs'] = multiprocessing.cpu_count()
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Generate points of a Gaussian mixture for k-means.")
+    parser.add_argument('--dir_out',
+                        default=arg_default_map['dir_out'],
+                        help=(("Output directory for part_NNNNN files and {centers_file}.\n"
+                               +"Default: {default}").format(centers_file=CENTERS_FILE, default=arg_default_map['dir_out'])))
+    parser.add_argument('--num_points',
+                        type=int,
+                        default=arg_default_map['num_points'],
+                        help=(("Number of points.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_points'])))
+    parser.add_argument('--n_dims',
+                        type=int,
+                        default=arg_default_map['n_dims'],
+                        help=(("Dimensions per point.\n"
+                               +"Default: {default}").format(default=arg_default_map['n_dims'])))
+    parser.add_argument('--n_clusters',
+                        type=int,
+                        default=arg_default_map['n_clusters'],
+                        help=(("Number of mixture components.\n"
+                               +"Default: {default}").format(default=arg_default_map['n_clusters'])))
+    parser.add_argument('--cluster_std',
+                        type=float,
+                        default=arg_default_map['cluster_std'],
+                        help=(("Standard deviation of each component in each dimension.\n"
+                               +"Default: {default}").format(default=arg_default_map['cluster_std'])))
+    parser.add_argument('--center_box',
+                        type=float,
+                        default=arg_default_map['center_box'],
+                        help=(("Centers are drawn uniformly from [-center_box, center_box] in each dimension.\n"
+                               +"Default: {default}").format(default=arg_default_map['center_box'])))
+    parser.add_argument('--num_files',
+                        type=int,
+                        default=arg_default_map['num_files'],
+                        help=(("Number of output files.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_files'])))
+    parser.add_argument('--format',
+                        dest='file_format',
+                        choices=['csv', 'points'],
+                        default=arg_default_map['file_format'],
+                        help=(("Write .csv text, or binary points files.\n"
+                               +"Default: {default}").format(default=arg_default_map['file_format'])))
+    parser.add_argument('--dtype',
+                        choices=sorted(POINTS_DTYPES),
+                        default=arg_default_map['dtype'],
+                        help=(("Data type of binary points files.\n"
+                               +"Default: {default}").format(default=arg_default_map['dtype'])))
+    parser.add_argument('--seed',
+                        type=int,
+                        default=arg_default_map['seed'],
+                        help=(("Random seed.\n"
+                               +"Default: {default}").format(default=arg_default_map['seed'])))
+    parser.add_argument('--num_procs',
+                        type=int,
+                        default=arg_default_map['num_procs'],
+                        help=(("Number of worker processes.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_procs'])))
+    args = parser.parse_args()
+    print(args)
+
+    main(dir_out=args.dir_out, num_points=args.num_points, n_dims=args.n_dims, n_clusters=args.n_clusters,
+         cluster_std=args.cluster_std, center_box=args.center_box, num_files=args.num_files,
+         file_format=args.file_format, dtype=args.dtype, seed=args.seed, num_procs=args.num_procs)
@@ -6,39 +6,228 @@ as a check for map-reduce implentation.
 Adapted from
 http://scikit-learn.org/stable/
 auto_examples/cluster/plot_cluster_iris.html
+
+With --mode minibatch, the file is streamed in chunks of rows instead of read in whole,
+and the centers are updated after each mini-batch of a chunk as in Sculley, "Web-scale k-means clustering" (2010):
+each center moves to the mean of all points assigned to it so far, so its learning rate decays as 1/count.
+Memory is bounded by the chunk, not the file. Rows are shuffled within each chunk,
+so rows ordered by cluster within a chunk do not bias the updates; rows should not be ordered across chunks.
+
+With --mode lloyd, the file is streamed once per Lloyd iteration, as kmeans_mapr.py runs one job per iteration.
+
+file_in may also be a binary points file or a directory of them from convert_points.py,
+which are memory-mapped instead of parsed.
+
+Initial centers (--init) are chosen without a pass over the file from the first chunk, by k-means++ or as its first
+points, or by a pass that samples points uniformly at random, or by k-means|| in n_rounds + 1 passes:
+each round samples about oversampling candidates with probability proportional to their squared distance
+to the candidates so far, a last pass weights the candidates by their number of nearest points,
+and the weighted candidates are clustered in memory.
+With --mode batch and --init k-means++, scikit-learn's KMeans chooses its own initial centers from all points.
 """
 
-from __future__ import print_function
+from __future__ import print_function, division
 import argparse
 import os
 import numpy as np
 from sklearn.cluster import KMeans
+from utils import (CHUNK_ROWS, data_files, is_points_file, iter_points, map_points, partial_sums,
+                   greedy_kmeans_pp, sample_candidates, select_candidates, weighted_kmeans)
+
+def first_chunk(file_in, n_rows, chunk_rows=CHUNK_ROWS):
+    """
+    Return the first chunk of points of file_in.
+    Raise ValueError if it has fewer than n_rows rows.
+    """
+    chunk = next(iter_points(file_in, chunk_rows=chunk_rows), np.zeros((0, 0)))
+    if len(chunk) < n_rows:
+        raise ValueError(("First chunk has {rows} rows, fewer than {n_rows}.").format(rows=len(chunk), n_rows=n_rows))
+    return chunk
+
+def random_points(file_in, n_points, chunk_rows=CHUNK_ROWS, seed=0):
+    """
+    Return n_points points of file_in sampled uniformly at random without replacement in one pass,
+    by keeping the points with the smallest random keys.
+    """
+    rng = np.random.RandomState(seed)
+    (points, keys) = (None, None)
+    for chunk in iter_points(file_in, chunk_rows=chunk_rows):
+        chunk_keys = rng.random_sample(len(chunk))
+        if points is None:
+            (points, keys) = (np.zeros((0, chunk.shape[1])), np.zeros(0))
+        points = np.concatenate([points, chunk])
+        keys = np.concatenate([keys, chunk_keys])
+        if len(keys) > n_points:
+            smallest = np.argpartition(keys, n_points)[:n_points]
+            (points, keys) = (points[smallest], keys[smallest])
+    if (points is None) or (len(points) < n_points):
+        raise ValueError(("Fewer than {n_points} points in {file_in}.").format(n_points=n_points, file_in=file_in))
+    return points
+
+def kmeans_parallel(file_in, n_clusters, oversampling=None, n_rounds=5, chunk_rows=CHUNK_ROWS, seed=0):
+    """
+    Choose initial centers by k-means||, oversampling 2*n_clusters candidates per round by default.
+    The first candidate is chosen uniformly from the first chunk.
+    Return the centers and the number of passes over the file.
+    """
+    oversampling = 2*n_clusters if oversampling is None else oversampling
+    rng = np.random.RandomState(seed)
+    chunk = first_chunk(file_in, 1, chunk_rows=chunk_rows)
+    candidates = np.array(chunk[rng.randint(len(chunk))][np.newaxis], dtype=np.float64)
+    passes = 0
+    for round_idx in range(n_rounds):
+        (cost, kept, scores) = (0.0, [], [])
+        for chunk in iter_points(file_in, chunk_rows=chunk_rows):
+            (chunk_cost, chunk_kept, chunk_scores) = sample_candidates(chunk, candidates, oversampling, cost,
+                                                                       seed, round_idx)
+            cost += chunk_cost
+            kept.append(chunk_kept)
+            scores.append(chunk_scores)
+        passes += 1
+        new = select_candidates(np.concatenate(kept), np.concatenate(scores), cost, oversampling)
+        print(("INFO: k-means|| round {round_idx}: cost {cost:.6g}, {num} new candidates").format(
+            round_idx=round_idx + 1, cost=cost, num=len(new)))
+        if cost == 0:
+            break
+        candidates = np.concatenate([candidates, new])
+    counts = np.zeros(len(candidates), dtype=np.int64)
+    for chunk in iter_points(file_in, chunk_rows=chunk_rows):
+        counts += partial_sums(chunk, candidates)[1]
+    passes += 1
+    return (weighted_kmeans(candidates, counts, n_clusters, seed=seed), passes)
+
+def init_centers(file_in, n_clusters, init='k-means++', chunk_rows=CHUNK_ROWS, oversampling=None, n_rounds=5, seed=0):
+    """
+    Choose initial centers by init: 'k-means++' or 'first' from the first chunk, 'random', or 'k-means||'.
+    k-means++ uses scikit-learn's kmeans_plusplus if available (scikit-learn >= 0.24), else greedy_kmeans_pp.
+    Return the centers and the number of passes over the file.
+    """
+    if init == 'k-means||':
+        return kmeans_parallel(file_in, n_clusters, oversampling=oversampling, n_rounds=n_rounds,
+                               chunk_rows=chunk_rows, seed=seed)
+    if init == 'random':
+        return (random_points(file_in, n_clusters, chunk_rows=chunk_rows, seed=seed), 1)
+    chunk = first_chunk(file_in, n_clusters, chunk_rows=chunk_rows)
+    if init == 'first':
+        return (np.array(chunk[:n_clusters], dtype=np.float64), 0)
+    try:
+        # Import here since kmeans_plusplus is new in scikit-learn 0.24 and only this init uses it.
+        from sklearn.cluster import kmeans_plusplus
+    except ImportError:
+        return (greedy_kmeans_pp(chunk, n_clusters, np.random.RandomState(seed)), 0)
+    return (kmeans_plusplus(chunk, n_clusters, random_state=seed)[0].astype(np.float64), 0)
 
-def main(file_in, file_out, n_clusters):
+def lloyd_kmeans(file_in, centers, max_iter=300, tol=1e-4, chunk_rows=CHUNK_ROWS):
+    """
+    Stream the points of file_in once per Lloyd iteration from the initial centers,
+    until the sum of squared center shifts is at most tol, or for max_iter iterations.
+    A cluster without points keeps its center.
+    Return the centers, the number of iterations, and the inertia of the last iteration.
+    """
+    for iteration in range(1, max_iter + 1):
+        (sums, counts, inertia) = (np.zeros_like(centers), np.zeros(len(centers), dtype=np.int64), 0.0)
+        for chunk in iter_points(file_in, chunk_rows=chunk_rows):
+            (chunk_sums, chunk_counts, chunk_inertia) = partial_sums(chunk, centers)
+            sums += chunk_sums
+            counts += chunk_counts
+            inertia += chunk_inertia.sum()
+        new_centers = centers.copy()
+        new_centers[counts > 0] = sums[counts > 0] / counts[counts > 0, np.newaxis]
+        shift = np.sum((new_centers - centers)**2)
+        centers = new_centers
+        print(("INFO: Iteration {iteration}: inertia {inertia:.6g}, center shift {shift:.3g}").format(
+            iteration=iteration, inertia=inertia, shift=shift))
+        if shift <= tol:
+            break
+    return (centers, iteration, inertia)
+
+def minibatch_kmeans(file_in, centers, batch_rows=1024, chunk_rows=CHUNK_ROWS, n_epochs=3, seed=0):
+    """
+    Stream the points of file_in n_epochs times and update the initial centers after each mini-batch.
+    Return the centers.
+    """
+    rng = np.random.RandomState(seed)
+    centers = centers.copy()
+    counts = np.zeros(len(centers), dtype=np.int64)
+    for epoch in range(1, n_epochs + 1):
+        for chunk in iter_points(file_in, chunk_rows=chunk_rows):
+            # Gather each mini-batch in shuffled order, so that only the mini-batch is copied from the chunk.
+            order = rng.permutation(len(chunk))
+            for start in range(0, len(chunk), batch_rows):
+                (sums, batch_counts, _) = partial_sums(chunk[order[start:start+batch_rows]], centers)
+                counts += batch_counts
+                moved = batch_counts > 0
+                # c' = (c*n + sum)/(n + m) = c + (sum - m*c)/(n + m) for m new points with the given sum.
+                centers[moved] += ((sums[moved] - batch_counts[moved, np.newaxis]*centers[moved])
+                                   / counts[moved, np.newaxis])
+        print(("INFO: Epoch {epoch}: {points} points assigned").format(epoch=epoch, points=counts.sum()))
+    return centers
+
+def stream_inertia(file_in, centers, chunk_rows=CHUNK_ROWS):
+    """
+    Stream the points of file_in and return the sum of squared distances to their nearest centers.
+    """
+    inertia = 0.0
+    for chunk in iter_points(file_in, chunk_rows=chunk_rows):
+        inertia += partial_sums(chunk, centers)[2].sum()
+    return inertia
+
+def main(file_in, file_out, n_clusters, mode='batch', init='k-means++', batch_rows=1024, chunk_rows=CHUNK_ROWS,
+         n_epochs=3, max_iter=300, tol=1e-4, oversampling=None, n_rounds=5, seed=0):
     """
     Read in csv, compute centers, output centers to csv.
+    If mode is 'minibatch', stream the csv in chunks and update centers by mini-batches.
+    If mode is 'lloyd', stream the csv once per Lloyd iteration.
+    Return the centers and the inertia over all points.
     """
-    data = np.genfromtxt(file_in, delimiter=",")
+    if (mode != 'batch') or (init != 'k-means++'):
+        (centers, passes) = init_centers(file_in, n_clusters, init=init, chunk_rows=chunk_rows,
+                                         oversampling=oversampling, n_rounds=n_rounds, seed=seed)
+        print(("INFO: Initialization by {init}: {passes} passes").format(init=init, passes=passes))
+    if mode == 'minibatch':
+        centers = minibatch_kmeans(file_in, centers, batch_rows=batch_rows, chunk_rows=chunk_rows,
+                                   n_epochs=n_epochs, seed=seed)
+        inertia = stream_inertia(file_in, centers, chunk_rows=chunk_rows)
+    elif mode == 'lloyd':
+        (centers, _, inertia) = lloyd_kmeans(file_in, centers, max_iter=max_iter, tol=tol, chunk_rows=chunk_rows)
+    else:
+        data = np.concatenate([map_points(fname) if is_points_file(fname) else np.genfromtxt(fname, delimiter=",")
+                               for fname in data_files(file_in)])
 
-    estimator = KMeans(n_clusters=n_clusters)
-    print(estimator)
-    estimator.fit(data)
-    centers = estimator.cluster_centers_
+        if init == 'k-means++':
+            estimator = KMeans(n_clusters=n_clusters, max_iter=max_iter, tol=tol, random_state=seed)
+        else:
+            estimator = KMeans(n_clusters=n_clusters, init=centers, n_init=1, max_iter=max_iter, tol=tol)
+        print(estimator)
+        estimator.fit(data)
+        centers = estimator.cluster_centers_
+        inertia = estimator.inertia_
+    print(("INFO: Inertia: {inertia:.6g}").format(inertia=inertia))
 
     np.savetxt(file_out, centers, delimiter=",")
 
-    return None
+    return (centers, inertia)
 
 if __name__ == '__main__':
 
     file_in_default="iris.csv"
     file_out_default="centers.csv"
     n_clusters_default=3
+    mode_default='batch'
+    init_default='k-means++'
+    batch_rows_default=1024
+    chunk_rows_default=CHUNK_ROWS
+    n_epochs_default=3
+    max_iter_default=300
+    tol_default=1e-4
+    oversampling_default=None
+    n_rounds_default=5
+    seed_default=0
 
     parser = argparse.ArgumentParser(description="Do k-means clustering on file without map-reduce.")
     parser.add_argument("--file_in",
                         default=file_in_default,
-                        help="Input file in csv format. "
+                        help="Input file in csv format, or points file or directory from convert_points.py. "
                         +"Default: {default}".format(default=file_in_default))
     parser.add_argument("--file_out",
                         default=file_out_default,
@@ -49,7 +238,63 @@ if __name__ == '__main__':
                         type=int,
                         help="Number of cluster centers to find. "
                         +"Default: {default}".format(default=n_clusters_default))
+    parser.add_argument("--mode",
+                        default=mode_default,
+                        choices=['batch', 'minibatch', 'lloyd'],
+                        help="Fit all points in memory with scikit-learn's KMeans, "
+                        +"or stream the file and update centers by mini-batches, "
+                        +"or stream the file once per Lloyd iteration. "
+                        +"Default: {default}".format(default=mode_default))
+    parser.add_argument("--init",
+                        default=init_default,
+                        choices=['k-means++', 'first', 'random', 'k-means||'],
+                        help="Initial centers: k-means++ or the first points of the first chunk, "
+                        +"points sampled at random in one pass, or k-means|| in n_rounds + 1 passes. "
+                        +"Default: {default}".format(default=init_default))
+    parser.add_argument("--batch_rows",
+                        default=batch_rows_default,
+                        type=int,
+                        help="Points per center update with --mode minibatch. "
+                        +"Default: {default}".format(default=batch_rows_default))
+    parser.add_argument("--chunk_rows",
+                        default=chunk_rows_default,
+                        type=int,
+                        help="Points read and parsed at once by each streaming pass: --mode minibatch or lloyd and the --init passes. "
+                        +"Default: {default}".format(default=chunk_rows_default))
+    parser.add_argument("--n_epochs",
+                        default=n_epochs_default,
+                        type=int,
+                        help="Passes over the file with --mode minibatch. "
+                        +"Default: {default}".format(default=n_epochs_default))
+    parser.add_argument("--max_iter",
+                        default=max_iter_default,
+                        type=int,
+                        help="Maximum number of Lloyd iterations with --mode batch or lloyd. "
+                        +"Default: {default}".format(default=max_iter_default))
+    parser.add_argument("--tol",
+                        default=tol_default,
+                        type=float,
+                        help="With --mode lloyd, stop when the sum of squared center shifts of an iteration "
+                        +"is at most tol. Passed to KMeans with --mode batch. "
+                        +"Default: {default}".format(default=tol_default))
+    parser.add_argument("--oversampling",
+                        default=oversampling_default,
+                        type=int,
+                        help="Expected candidates sampled per k-means|| round. "
+                        +"Default: 2 * n_clusters")
+    parser.add_argument("--n_rounds",
+                        default=n_rounds_default,
+                        type=int,
+                        help="k-means|| sampling rounds, one pass each. "
+                        +"Default: {default}".format(default=n_rounds_default))
+    parser.add_argument("--seed",
+                        default=seed_default,
+                        type=int,
+                        help="Seed of the initial centers and of the shuffles. "
+                        +"Default: {default}".format(default=seed_default))
     args = parser.parse_args()
     print(args)
 
-    main(file_in=args.file_in, file_out=args.file_out, n_clusters=args.n_clusters)
+    main(file_in=args.file_in, file_out=args.file_out, n_clusters=args.n_clusters, mode=args.mode, init=args.init,
+         batch_rows=args.batch_rows, chunk_rows=args.chunk_rows, n_epochs=args.n_epochs, max_iter=args.max_iter,
+         tol=args.tol, oversampling=args.oversampling, n_rounds=args.n_rounds, seed=args.seed)
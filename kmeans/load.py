@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 """
 Load data from a file to Disco.
+A directory of part_* files, e.g. from convert_points.py or gen_mixture.py, is loaded part by part.
+Binary points files are pushed with one blob per file, since chunking would split the binary data at arbitrary bytes.
+.csv files are chunked at line boundaries.
 """
 
 from __future__ import print_function
@@ -8,6 +11,7 @@ import sys
 import os
 import argparse
 from disco.ddfs import DDFS
+from utils import data_files, is_points_file
 
 def load(file_in, tag):
     """
@@ -22,8 +26,15 @@ def load(file_in, tag):
 
     # Load data into Disco Distributed File System.
     print("Loading into Disco:\n{file_in}\nunder tag\n{tag}".format(file_in=file_in, tag=tag))
+    fnames = [os.path.join('./', fname) for fname in data_files(file_in)]
+    points_fnames = [fname for fname in fnames if is_points_file(fname)]
+    csv_fnames = [fname for fname in fnames if fname not in points_fnames]
+    if len(points_fnames) > 0:
+        DDFS().push(tag, points_fnames)
+    if len(csv_fnames) == 0:
+        return None
     try:
-        DDFS().chunk(tag=tag, urls=[os.path.join('./', file_in)])
+        DDFS().chunk(tag=tag, urls=csv_fnames)
     except ValueError as err:
         print("ValueError: "+err.message, file=sys.stderr)
         print("File: {file_in}".format(file_in=file_in), file=sys.stderr)
@@ -46,7 +57,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Load data from a file into Disco and tag.")
     parser.add_argument("--file_in",
                         default=file_in_default,
-                        help="Input file. Default: {default}".format(default=file_in_default))
+                        help="Input file, or directory of points files. Default: {default}".format(default=file_in_default))
     parser.add_argument("--tag",
                         default=tag_default,
                         help="Disco tag for input file. Default: {default}".format(default=tag_default))
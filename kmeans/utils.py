@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+Utilities for k-means: read points in chunks, assign them to centers in blocks,
+and sample initial centers with k-means||.
+
+Points are .csv text, or binary points files that need no parsing. A points file is a 64-byte header
+followed by the points as a little-endian row-major array:
+- header: magic b'KMPOINTS', dtype code b'f' (float32) or b'd' (float64), 3 pad bytes,
+  dimensions as uint32, rows as uint64, then zeros to 64 bytes so that rows are aligned.
+Readers memory-map the file and return array views of it, so a pass over the points does not copy or parse them.
+A data set is one .csv or points file, or a directory of part_* files as chunks, e.g. from convert_points.py
+or gen_mixture.py. Each part is a .csv or points file. Other files of the directory, e.g. centers_true.csv, are not data.
+"""
+
+from __future__ import division
+import glob
+import itertools
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+
+# Rows of points read per chunk. Memory is bounded by the chunk, not the file.
+CHUNK_ROWS = 2**16
+
+# Binary points file format.
+POINTS_MAGIC = b'KMPOINTS'
+POINTS_HEADER = struct.Struct('<8sc3xIQ')
+POINTS_HEADER_BYTES = 64
+POINTS_EXT = '.pts'
+# dtype: (header code, little-endian NumPy dtype).
+POINTS_DTYPES = {'float32': (b'f', '<f4'), 'float64': (b'd', '<f8')}
+
+def parse_lines(lines):
+    """
+    Parse lines of comma-separated numbers into a 2D array, one row per line.
+    """
+    sep = b',' if isinstance(lines[0], bytes) else ','
+    values = sep.join(line.strip() for line in lines).split(sep)
+    return np.array(values, dtype=np.float64).reshape(len(lines), -1)
+
+def iter_csv(file_in, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the points of a .csv file as arrays of up to chunk_rows rows. Empty lines are skipped.
+    """
+    with open(file_in, 'rb') as f_in:
+        while True:
+            lines = list(itertools.islice(f_in, chunk_rows))
+            if len(lines) == 0:
+                break
+            lines = [line for line in lines if line.strip()]
+            if len(lines) > 0:
+                yield parse_lines(lines)
+    return
+
+def pack_header(dtype, rows, dims):
+    """
+    Return the header of a points file of rows points of dims dimensions of dtype 'float32' or 'float64'.
+    """
+    header = POINTS_HEADER.pack(POINTS_MAGIC, POINTS_DTYPES[dtype][0], dims, rows)
+    return header + b'\0'*(POINTS_HEADER_BYTES - len(header))
+
+def unpack_header(header):
+    """
+    Return the NumPy dtype, rows, and dimensions from the header of a points file.
+    Raise ValueError if it is not a points file header.
+    """
+    if len(header) < POINTS_HEADER.size:
+        raise ValueError("Too short for a points file header.")
+    (magic, code, dims, rows) = POINTS_HEADER.unpack(header[:POINTS_HEADER.size])
+    dtypes = dict(POINTS_DTYPES.values())
+    if (magic != POINTS_MAGIC) or (code not in dtypes):
+        raise ValueError(("Not a points file header: {header!r}").format(header=header[:POINTS_HEADER.size]))
+    return (np.dtype(dtypes[code]), rows, dims)
+
+def is_points_file(fname):
+    """
+    Return True if fname starts with a points file header.
+    """
+    with open(fname, 'rb') as f_in:
+        try:
+            unpack_header(f_in.read(POINTS_HEADER.size))
+        except ValueError:
+            return False
+    return True
+
+def write_points(file_out, points, dtype='float64'):
+    """
+    Write a 2D array of points to a points file of dtype 'float32' or 'float64'.
+    """
+    (rows, dims) = points.shape
+    with open(file_out, 'wb') as f_out:
+        f_out.write(pack_header(dtype, rows, dims))
+        f_out.write(np.ascontiguousarray(points, dtype=POINTS_DTYPES[dtype][1]).tobytes())
+    return None
+
+def convert_csv(file_in, dir_out, dtype='float64', chunk_rows=CHUNK_ROWS):
+    """
+    Convert a .csv file of points to a directory of points files of up to chunk_rows rows each.
+    Return the file names.
+    """
+    if not os.path.exists(dir_out):
+        os.makedirs(dir_out)
+    files_out = []
+    for (idx, chunk) in enumerate(iter_csv(file_in, chunk_rows=chunk_rows)):
+        file_out = os.path.join(dir_out, ("part_{idx:05d}{ext}").format(idx=idx, ext=POINTS_EXT))
+        write_points(file_out, chunk, dtype=dtype)
+        files_out.append(file_out)
+    return files_out
+
+def map_points(fname):
+    """
+    Memory-map a points file and return its points as a read-only 2D array view.
+    The map stays open while the view is referenced.
+    """
+    with open(fname, 'rb') as f_in:
+        (dtype, rows, dims) = unpack_header(f_in.read(POINTS_HEADER.size))
+        mm = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=dtype, count=rows*dims, offset=POINTS_HEADER_BYTES).reshape(rows, dims)
+
+def data_files(path):
+    """
+    Return the files of a data set: path itself, or the part_* files of a directory in order.
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, 'part_*')))
+    return [path]
+
+def iter_points(path, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the points of a data set as arrays of up to chunk_rows rows.
+    Points files are memory-mapped and yielded as views. Other files are parsed as .csv.
+    """
+    for fname in data_files(path):
+        if is_points_file(fname):
+            points = map_points(fname)
+            for start in range(0, len(points), chunk_rows):
+                yield points[start:start+chunk_rows]
+        else:
+            for chunk in iter_csv(fname, chunk_rows=chunk_rows):
+                yield chunk
+    return
+
+def points_reader(fd, size, url, params=None):
+    """
+    Disco reader of a points file blob. Yield its points as array views of up to params['block_rows'] rows,
+    so that map tasks assign blocks without parsing.
+    """
+    block_rows = CHUNK_ROWS if params is None else params.get('block_rows', CHUNK_ROWS)
+    data = fd.read()
+    (dtype, rows, dims) = unpack_header(data)
+    points = np.frombuffer(data, dtype=dtype, count=rows*dims, offset=POINTS_HEADER_BYTES).reshape(rows, dims)
+    for start in range(0, rows, block_rows):
+        yield points[start:start+block_rows]
+    return
+
+def sq_dists(points, centers):
+    """
+    Return the squared distances of points to centers as an array of shape (len(points), len(centers)).
+    """
+    # Squared distances as |x|^2 - 2 x.c + |c|^2, computed as one matrix product.
+    dists = (np.einsum('ij,ij->i', points, points)[:, np.newaxis]
+             - 2.0 * np.dot(points, centers.T) + np.einsum('ij,ij->i', centers, centers))
+    return np.maximum(dists, 0.0)
+
+def assign(points, centers):
+    """
+    Assign points to their nearest centers with one distance computation.
+    Return the labels and the squared distances to the nearest centers.
+    """
+    dists = sq_dists(points, centers)
+    labels = np.argmin(dists, axis=1)
+    return (labels, dists[np.arange(len(points)), labels])
+
+def partial_sums(points, centers):
+    """
+    Assign points to their nearest centers.
+    Return the per-cluster sums of the points, the counts, and the sums of squared distances.
+    """
+    (labels, min_dists) = assign(points, centers)
+    n_clusters = len(centers)
+    counts = np.bincount(labels, minlength=n_clusters)
+    sums = np.zeros_like(centers)
+    for dim in range(points.shape[1]):
+        sums[:, dim] = np.bincount(labels, weights=points[:, dim], minlength=n_clusters)
+    inertia = np.bincount(labels, weights=min_dists, minlength=n_clusters)
+    return (sums, counts, inertia)
+
+def sample_candidates(points, centers, oversampling, cost_before, seed, round_idx):
+    """
+    Sample candidate centers for a round of k-means|| (Bahmani et al., "Scalable k-means++", 2012)
+    from a block of points, in the same pass that computes the cost of the centers.
+    A point x is a candidate with probability min(1, oversampling * d(x)^2 / cost), where cost is the total over all
+    points, so it is known only after the pass. Draw u uniform for each point and give it the score d(x)^2 / u:
+    x is a candidate if its score is at least cost / oversampling. The cost up to each point is at most the total,
+    so keep the points whose score is at least (cost_before + cost so far) / oversampling,
+    and select among them with select_candidates once the total is known.
+    u is drawn from (seed, round_idx, block checksum), so the sample does not depend on the order of blocks.
+    Return the block's cost, the kept points, and their scores.
+    """
+    (_, min_dists) = assign(points, centers)
+    rng = np.random.RandomState([seed, round_idx, zlib.crc32(np.ascontiguousarray(points).tobytes()) & 0xffffffff])
+    # 1 - u is uniform on (0, 1].
+    scores = min_dists / (1.0 - rng.random_sample(len(points)))
+    keep = scores * oversampling >= cost_before + np.cumsum(min_dists)
+    return (min_dists.sum(), np.array(points[keep], dtype=np.float64), scores[keep])
+
+def select_candidates(candidates, scores, cost, oversampling):
+    """
+    Return the candidates of a k-means|| round whose scores are at least the total cost / oversampling.
+    """
+    return candidates[scores * oversampling >= cost]
+
+def greedy_kmeans_pp(points, n_clusters, rng, weights=None):
+    """
+    Choose n_clusters of the points as centers by greedy k-means++, as scikit-learn's kmeans_plusplus does:
+    draw 2 + log(n_clusters) trials per center with probabilities proportional to weight * d(x)^2
+    and keep the trial of least weighted cost. Points have weight 1 by default.
+    Return the centers.
+    """
+    weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=np.float64)
+    n_trials = 2 + int(np.log(n_clusters))
+    probs = weights / weights.sum() if weights.sum() > 0 else np.ones(len(points)) / len(points)
+    centers = [points[rng.choice(len(points), p=probs)]]
+    min_dists = assign(points, np.array(centers))[1]
+    for _ in range(1, n_clusters):
+        probs = weights * min_dists
+        # All points with weight coincide with centers: choose among the rest uniformly.
+        probs = probs / probs.sum() if probs.sum() > 0 else (min_dists > 0) / max(1, (min_dists > 0).sum())
+        trials = rng.choice(len(points), size=n_trials, p=probs)
+        # Squared distances to the nearest center with each trial added, one row per trial.
+        trial_dists = np.minimum(min_dists, sq_dists(points, points[trials]).T)
+        best = np.argmin(np.dot(trial_dists, weights))
+        centers.append(points[trials[best]])
+        min_dists = trial_dists[best]
+    return np.array(centers, dtype=np.float64)
+
+def weighted_kmeans(points, weights, n_clusters, seed=0, n_init=10, max_iter=100):
+    """
+    Cluster a few weighted points in memory, to reduce k-means|| candidates to n_clusters centers.
+    Each of n_init runs chooses centers by greedy k-means++ with the weights,
+    then runs Lloyd iterations with weighted means. Return the centers of the run of least weighted cost.
+    Raise ValueError if there are fewer points than clusters.
+    """
+    if len(points) < n_clusters:
+        raise ValueError(("{num} candidates are fewer than {n_clusters} clusters.").format(
+            num=len(points), n_clusters=n_clusters))
+    rng = np.random.RandomState(seed)
+    weights = np.asarray(weights, dtype=np.float64)
+    (best_centers, best_cost) = (None, None)
+    for _ in range(n_init):
+        centers = greedy_kmeans_pp(points, n_clusters, rng, weights=weights)
+        for _ in range(max_iter):
+            labels = assign(points, centers)[0]
+            counts = np.bincount(labels, weights=weights, minlength=n_clusters)
+            new_centers = centers.copy()
+            for dim in range(points.shape[1]):
+                sums = np.bincount(labels, weights=weights*points[:, dim], minlength=n_clusters)
+                new_centers[counts > 0, dim] = sums[counts > 0] / counts[counts > 0]
+            if np.array_equal(new_centers, centers):
+                break
+            centers = new_centers
+        cost = np.dot(assign(points, centers)[1], weights)
+        if (best_cost is None) or (cost < best_cost):
+            (best_centers, best_cost) = (centers, cost)
+    return best_centers
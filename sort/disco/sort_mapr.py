@@ -5,9 +5,19 @@ Sort records from a Disco tag. Output .txt.
 
 from __future__ import print_function
 import argparse
+import heapq
+import itertools
+import os
+import sys
 from disco.core import Job, result_iterator
+from disco.ddfs import DDFS
 from disco.util import kvgroup
 from disco.func import chain_reader
+# Disco ships modules imported by the job module to the slave nodes.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from partition import hash_partition, range_partition, split_points
+import runlength
+import sparseindex
         
 class Sort(Job):
     """
@@ -33,27 +43,73 @@ class Sort(Job):
             out.add(line, sum(count))
         return None
 
-def main(tag, file_out):
+def sample_tag(tag, num_samples, num_blobs=10):
+    """
+    Sample about num_samples lines from the start of num_blobs evenly spaced blobs of a tag,
+    as TeraSort samples its input splits.
+    """
+    blobs = list(DDFS().blobs(tag))
+    blobs = blobs[::max(1, len(blobs) // num_blobs)][:num_blobs]
+    samples = []
+    for blob in blobs:
+        samples.extend(itertools.islice(result_iterator([blob], reader=chain_reader),
+                                        max(1, num_samples // len(blobs))))
+    return samples
+
+def main(tag, file_out, partitions=1, partitioner='hash', num_samples=10**5, run_length=False,
+         index_every=None):
     """
     Run Sort map-reduce job and write output, including duplicate lines.
+    With partitioner 'hash', lines are hash partitioned across reduces. Each reduce's output is sorted,
+    so merge the reduce outputs to write all lines sorted.
+    With partitioner 'range', split points sampled from the input assign ranges of lines to reduces,
+    so concatenate the reduce outputs in order.
+    Duplicates are written in chunks straight from the results. If run_length, write each
+    distinct line once as 'line<TAB>count' instead; expand with common/runlength.py.
+    If index_every, also write a sparse index of every index_every-th distinct line to file_out + '.idx'
+    for lookups with common/sparseindex.py.
     """
 
     # Import since slave nodes do not have same namespace as master.
-    from sort_map_reduce import Sort
-    job = Sort().run(input=[tag], map_reader=chain_reader)
+    from sort_mapr import Sort
+    if partitioner == 'range':
+        params = {'split_points': split_points(sample_tag(tag, num_samples), partitions)}
+        job = Sort().run(input=[tag], map_reader=chain_reader,
+                         partitions=partitions, partition=range_partition, params=params)
+    else:
+        job = Sort().run(input=[tag], map_reader=chain_reader,
+                         partitions=partitions, partition=hash_partition)
+    results = job.wait(show=False)
+    if partitioner == 'range':
+        rows = itertools.chain(*[result_iterator([result]) for result in results])
+    else:
+        rows = heapq.merge(*[result_iterator([result]) for result in results])
     
-    with open(file_out, 'w') as f_out:
-        for (line, total) in result_iterator(job.wait(show=False)):
-            # Write out duplicates.
-            line_list = [line]*total
-            for string in line_list:
-                f_out.write(string)
+    with open(file_out, 'wb') as f_out:
+        index = None
+        if index_every:
+            index = sparseindex.IndexWriter(f_out, sparseindex.index_path(file_out), every=index_every)
+        for (line, total) in rows:
+            if index is not None:
+                index.mark(line)
+            if run_length:
+                f_out.write(runlength.format_run(line, total))
+            else:
+                # Write out duplicates.
+                runlength.write_repeated(f_out, line, total)
+        if index is not None:
+            index.close()
     return None
 
 if __name__ == '__main__':
 
     tag_default = "data:sort"
     file_out_default = "output.txt"
+    partitions_default = 1
+    partitioner_default = 'hash'
+    num_samples_default = 10**5
+    run_length_default = False
+    index_every_default = None
     
     parser = argparse.ArgumentParser(description="Sort lines from a tagged Disco data set using map-reduce.")
     parser.add_argument("--tag",
@@ -62,7 +118,36 @@ if __name__ == '__main__':
     parser.add_argument("--file_out",
                         default=file_out_default,
                         help="Output file. Default: {default}".format(default=file_out_default))
+    parser.add_argument("--partitions",
+                        default=partitions_default,
+                        type=int,
+                        help=("Number of reduce partitions."
+                              +" Default: {default}").format(default=partitions_default))
+    parser.add_argument("--partitioner",
+                        default=partitioner_default,
+                        choices=['hash', 'range'],
+                        help=("Assign lines to partitions by 'hash', then merge the partitions,"
+                              +" or by 'range' between sampled split points, then concatenate the partitions."
+                              +" Default: {default}").format(default=partitioner_default))
+    parser.add_argument("--num_samples",
+                        default=num_samples_default,
+                        type=int,
+                        help=("Number of lines to sample for split points with --partitioner range."
+                              +" Default: {default}").format(default=num_samples_default))
+    parser.add_argument("--run_length",
+                        default=run_length_default,
+                        action='store_true',
+                        help=("Write each distinct line once as 'line<TAB>count'."
+                              +" Expand with common/runlength.py. Default: {default}").format(default=run_length_default))
+    parser.add_argument("--index_every",
+                        default=index_every_default,
+                        type=int,
+                        help=("If set, also write a sparse index of every Nth distinct line to file_out + '.idx'"
+                              +" for lookups with common/sparseindex.py --format lines, or --format runs"
+                              +" with --run_length. Default: {default}").format(default=index_every_default))
     args = parser.parse_args()
     print(args)
 
-    main(tag=args.tag, file_out=args.file_out)
+    main(tag=args.tag, file_out=args.file_out, partitions=args.partitions,
+         partitioner=args.partitioner, num_samples=args.num_samples, run_length=args.run_length,
+         index_every=args.index_every)
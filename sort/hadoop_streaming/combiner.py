@@ -5,22 +5,58 @@ Combiner for sort with Hadoop streaming.
 
 from __future__ import print_function
 import sys
+import os
+import argparse
+import collections
+# Hadoop streaming ships streamio.py and spill.py next to this script with -file,
+# otherwise import them from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import spill
+import streamio
 
-def main(stdin):
+def main(stdin, stdout=sys.stdout, max_mb=256, tmp_dir=None):
     """
-    Take unsorted standard input from mapper and return sorted block.
-    Value is just a place holder.
+    Take unsorted 'line\\tcount' records from mapper, merge identical lines
+    by adding their counts, and print 'line\\tcount' records sorted by line.
+    The count follows the last tab, so lines may contain tabs.
+    If the distinct lines exceed max_mb megabytes, spill them to sorted runs
+    on local disk and merge the runs at end.
     """
-    for line_num in sorted(stdin):
-        # Remove trailing newlines.
-        line_num = line_num.rstrip()
-        # Omit empty lines.
-        try:
-            (line, num) = line_num.rsplit('\t', 1)
-            print(("{line}\t{num}").format(line=line, num=num))
-        except ValueError:
-            pass
+    with spill.SpillCounter(max_bytes=int(max_mb * 2**20), tmp_dir=tmp_dir) as counter:
+        for records in streamio.read_lines(stdin):
+            # Remove trailing newlines.
+            # Omit lines without a tab-separated count, e.g. empty lines.
+            # Tally identical records of the block in C, then parse each distinct record once.
+            tallies = collections.Counter(record for record in map(bytes.rstrip, records) if b'\t' in record)
+            for (record, num) in tallies.items():
+                (line, _, count) = record.rpartition(b'\t')
+                counter.add(line, num * int(count))
+        with streamio.BatchWriter(stdout) as writer:
+            (lines, counts) = ([], [])
+            for (line, count) in counter.items():
+                lines.append(line)
+                counts.append(b'%d' % count)
+                if len(lines) >= 2**14:
+                    writer.write_columns(lines, counts)
+                    (lines, counts) = ([], [])
+            writer.write_columns(lines, counts)
     return None
 
 if __name__ == '__main__':
-    main(stdin=sys.stdin)
+
+    max_mb_default = 256
+    tmp_dir_default = None
+
+    parser = argparse.ArgumentParser(description="Combiner for sort with Hadoop streaming.")
+    parser.add_argument("--max_mb",
+                        default=max_mb_default,
+                        type=float,
+                        help=("Memory budget in MB for distinct lines before spilling a sorted run to disk."
+                              +" Default: {default}").format(default=max_mb_default))
+    parser.add_argument("--tmp_dir",
+                        default=tmp_dir_default,
+                        help=("Local directory for spilled runs."
+                              +" Default: {default} (system temporary directory)").format(default=tmp_dir_default))
+    args = parser.parse_args()
+
+    main(stdin=sys.stdin, max_mb=args.max_mb, tmp_dir=args.tmp_dir)
@@ -5,18 +5,24 @@ Mapper for sort with Hadoop streaming.
 
 from __future__ import print_function
 import sys
+import os
+# Hadoop streaming ships streamio.py next to this script with -file,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import streamio
 
-def main(stdin):
+def main(stdin, stdout=sys.stdout):
     """
     Print lines from standard in.
     Value is just a place holder.
     """
-    for line in stdin:
-        # Remove trailing newlines.
-        line = line.rstrip()
-        # Omit empty lines.
-        if line != '':
-            print(("{line}\t{num}").format(line=line, num=1))
+    with streamio.BatchWriter(stdout) as writer:
+        for lines in streamio.read_lines(stdin):
+            # Remove trailing newlines.
+            # Omit empty lines.
+            lines = [line for line in map(bytes.rstrip, lines) if line]
+            if len(lines) > 0:
+                writer.write(b'\t1\n'.join(lines) + b'\t1\n')
     return None
 
 if __name__ == '__main__':
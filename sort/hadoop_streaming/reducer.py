@@ -5,21 +5,31 @@ Reducer for sort with Hadoop streaming.
 
 from __future__ import print_function
 import sys
+import os
+# Hadoop streaming ships streamio.py and runlength.py next to this script with -file,
+# otherwise import them from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import runlength
+import streamio
 
-def main(stdin):
+def main(stdin, stdout=sys.stdout):
     """
     Take sorted standard in from Hadoop and return lines.
-    Value is just a place holder.
+    Value is just a place holder, or a count of identical lines from the combiner:
+    'line\\tcount' is expanded to count 'line\\t1' lines.
     """
-    for line_num in stdin:
-        # Remove trailing newlines.
-        line_num = line_num.rstrip()
-        # Omit empty lines.
-        try:
-            (line, num) = line_num.rsplit('\t', 1)
-            print(("{line}\t{num}").format(line=line, num=num))
-        except ValueError:
-            pass
+    with streamio.BatchWriter(stdout) as writer:
+        for lines in streamio.read_lines(stdin):
+            # Remove trailing newlines.
+            # Omit lines without a tab-separated place holder, e.g. empty lines.
+            line_nums = [line_num for line_num in map(bytes.rstrip, lines) if b'\t' in line_num]
+            # Without a combiner, every count is 1.
+            if all(line_num.endswith(b'\t1') for line_num in line_nums):
+                writer.write_lines(line_nums)
+                continue
+            for line_num in line_nums:
+                (line, count) = runlength.parse_run(line_num)
+                runlength.write_repeated(writer, line + b'\t1\n', count)
     return None
 
 if __name__ == '__main__':
@@ -4,10 +4,43 @@ Module for MRJob.
 Following https://pythonhosted.org/mrjob/guides/quickstart.html
 """
 
+import os
+import sys
 from mrjob.job import MRJob
+# Ship mrprotocol.py with the job, e.g. --py-files common/mrprotocol.py,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import mrprotocol
 
 class MRSort(MRJob):
 
+    def configure_args(self):
+        """
+        Add the protocol between steps.
+        """
+        super(MRSort, self).configure_args()
+        self.add_passthru_arg('--protocol', choices=sorted(mrprotocol.PROTOCOLS), default='json',
+                              help=("Encoding of lines and counts: 'json' (mrjob's default), 'raw' text,"
+                                    +" or 'binary' bytes. See common/mrprotocol.py."))
+
+    def input_protocol(self):
+        """
+        Read input lines with the selected protocol.
+        """
+        return mrprotocol.PROTOCOLS[self.options.protocol][0]()
+
+    def internal_protocol(self):
+        """
+        Pass (key, count) between steps with the selected protocol.
+        """
+        return mrprotocol.PROTOCOLS[self.options.protocol][1]()
+
+    def output_protocol(self):
+        """
+        Write (key, count) output with the selected protocol.
+        """
+        return mrprotocol.PROTOCOLS[self.options.protocol][2]()
+
     def mapper(self, _, line):
         """
         Read in the line then yield as the key.
@@ -16,16 +49,20 @@ class MRSort(MRJob):
         """
         yield (line, 1)
 
-    # No combiner since the keys are the lines,
-    # and it's very unlikely that a mapper has multiple identical lines.
-    
-    def reducer(self, line, count):
+    def combiner(self, line, counts):
+        """
+        Merge identical lines of a mapper into one (line, count),
+        so that inputs with many repeated lines, e.g. logs, shuffle less.
+        """
+        yield (line, sum(counts))
+
+    def reducer(self, line, counts):
         """
         Hadoop sorts the keys (lines) before sending to the reducer.
-        Read in the line then yield as the key.
-        The value is just a place holder.
+        Read in the line then yield as the key
+        with the number of times it occurs.
         """
-        yield (line, count)
+        yield (line, sum(counts))
 
 if __name__ == '__main__':
     MRSort.run()
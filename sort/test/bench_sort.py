@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Benchmark in-memory line sorters: Python's sorted() on the lines of a file
+against common/npsort.py on the file as one buffer.
+Report time and peak RSS of each in a separate process and check the outputs are byte-identical.
+"""
+
+from __future__ import print_function, division
+import argparse
+import hashlib
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import npsort
+
+def sort_python(file_in, file_out):
+    """
+    Sort with sorted() on the lines, as sort_nomapr.py does in memory.
+    """
+    with open(file_in, 'rb') as f_in:
+        lines = f_in.readlines()
+    with open(file_out, 'wb') as f_out:
+        f_out.writelines(sorted(lines))
+    return None
+
+def run(sorter, file_in, file_out, queue):
+    """
+    Run one sorter and put its time and peak RSS on the queue.
+    """
+    sort_fn = sort_python if sorter == 'python' else npsort.sort_file
+    time_start = time.time()
+    sort_fn(file_in, file_out)
+    seconds = time.time() - time_start
+    # Linux reports ru_maxrss in KB.
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    queue.put((seconds, peak_rss_mb))
+    return None
+
+def md5sum(fname):
+    """
+    Return the MD5 hex digest of a file.
+    """
+    md5 = hashlib.md5()
+    with open(fname, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(2**20), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def main(file_in, tmp_dir=None):
+    """
+    Run each sorter in its own process and print a comparison.
+    """
+    with open(file_in, 'rb') as f_in:
+        num_lines = sum(block.count(b'\n') for block in iter(lambda: f_in.read(2**20), b''))
+    print(("{sorter:<8} {lines:>12} {seconds:>9} {rss:>12} {md5:>34}").format(
+        sorter='sorter', lines='lines', seconds='seconds', rss='peak RSS MB', md5='output MD5'))
+    for sorter in ['python', 'numpy']:
+        (fd, file_out) = tempfile.mkstemp(dir=tmp_dir)
+        os.close(fd)
+        try:
+            queue = multiprocessing.Queue()
+            proc = multiprocessing.Process(target=run, args=(sorter, file_in, file_out, queue))
+            proc.start()
+            (seconds, peak_rss_mb) = queue.get()
+            proc.join()
+            print(("{sorter:<8} {lines:>12d} {seconds:>9.2f} {rss:>12.1f} {md5:>34}").format(
+                sorter=sorter, lines=num_lines, seconds=seconds, rss=peak_rss_mb, md5=md5sum(file_out)))
+        finally:
+            os.remove(file_out)
+    return None
+
+if __name__ == '__main__':
+
+    file_in_default = "input.txt"
+    tmp_dir_default = None
+
+    parser = argparse.ArgumentParser(description="Benchmark sorted() against the NumPy line sorter.")
+    parser.add_argument("--file_in",
+                        default=file_in_default,
+                        help="Input file. Default: {default}".format(default=file_in_default))
+    parser.add_argument("--tmp_dir",
+                        default=tmp_dir_default,
+                        help=("Directory for sorted outputs."
+                              +" Default: {default} (system temporary directory)").format(default=tmp_dir_default))
+    args = parser.parse_args()
+    print(args)
+
+    main(file_in=args.file_in, tmp_dir=args.tmp_dir)
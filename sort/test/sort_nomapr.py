@@ -2,22 +2,54 @@
 """
 Sort a .txt file without map-reduce and output to a .txt file 
 to check the map-reduce implentation.
+Lines are sorted bytewise. With a memory budget, sort externally:
+spill sorted runs to temporary files and merge them.
+With the numpy sorter, sort in memory without a Python object per line.
+With several processes, range-partition the lines into one bucket per process
+and sort the buckets in parallel.
 """
 
 from __future__ import print_function
 import argparse
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import extsort
 
-def main(file_in, file_out):
+def main(file_in, file_out, max_mb=None, tmp_dir=None, sorter='python', num_procs=1):
     """
     Read in lines, sort lines, write out sorted lines.
+    If max_mb, hold at most about max_mb megabytes of lines in memory.
+    If sorter is 'numpy', sort the file as one buffer with common/npsort.py.
+    If num_procs > 1, sort in parallel with common/parsort.py, which needs numpy.
+    Output is byte-identical either way.
     """
 
-    with open(file_in, 'r') as f_in:
-        lines = [line for line in f_in]
-
-    with open(file_out, 'w') as f_out:
-        for string in sorted(lines):
-            f_out.write(string)
+    if num_procs > 1:
+        if max_mb is not None:
+            raise ValueError("The parallel sort sorts in memory. Omit max_mb.")
+        # Import here so that the serial sorters do not need numpy.
+        import parsort
+        seconds = parsort.sort_file(file_in, file_out, num_procs=num_procs, sorter=sorter, tmp_dir=tmp_dir)
+        print(("INFO: Phase seconds: {seconds}").format(seconds=seconds))
+    elif sorter == 'numpy':
+        if max_mb is not None:
+            raise ValueError("The numpy sorter sorts in memory. Omit max_mb.")
+        # Import here so that the other sorters do not need numpy.
+        import npsort
+        npsort.sort_file(file_in, file_out)
+    elif max_mb is None:
+        with open(file_in, 'rb') as f_in:
+            lines = f_in.readlines()
+        lines.sort()
+        with open(file_out, 'wb') as f_out:
+            f_out.writelines(lines)
+    else:
+        with extsort.ExternalSort(max_bytes=int(max_mb * 2**20), tmp_dir=tmp_dir) as sorter:
+            with open(file_in, 'rb') as f_in:
+                sorter.read(f_in)
+            with open(file_out, 'wb') as f_out:
+                f_out.writelines(sorter.lines())
 
     return None
 
@@ -25,6 +57,10 @@ if __name__ == '__main__':
 
     file_in_default = "input.txt"
     file_out_default = "output.txt"
+    max_mb_default = None
+    tmp_dir_default = None
+    sorter_default = 'python'
+    num_procs_default = 1
 
     parser = argparse.ArgumentParser(description="Sort a file without map-reduce.")
     parser.add_argument("--file_in",
@@ -33,7 +69,28 @@ if __name__ == '__main__':
     parser.add_argument("--file_out",
                         default=file_out_default,
                         help="Output file. Default: {default}".format(default=file_out_default))
+    parser.add_argument("--max_mb",
+                        default=max_mb_default,
+                        type=float,
+                        help=("Memory budget in MB for lines. If set, sort externally by spilling sorted runs"
+                              +" to disk and merging them. Default: {default} (sort in memory)").format(default=max_mb_default))
+    parser.add_argument("--tmp_dir",
+                        default=tmp_dir_default,
+                        help=("Directory for sorted runs with --max_mb or buckets with --num_procs."
+                              +" Default: {default} (system temporary directory)").format(default=tmp_dir_default))
+    parser.add_argument("--num_procs",
+                        default=num_procs_default,
+                        type=int,
+                        help=("Number of processes. If more than 1, range-partition the lines by sampled split points"
+                              +" into one bucket per process and sort the buckets in parallel (needs numpy)."
+                              +" Default: {default}").format(default=num_procs_default))
+    parser.add_argument("--sorter",
+                        default=sorter_default,
+                        choices=['python', 'numpy'],
+                        help=("Sort lines with Python's sort, or as one buffer with NumPy prefix keys"
+                              +" (in memory only). Default: {default}").format(default=sorter_default))
     args = parser.parse_args()
     print(args)
 
-    main(file_in=args.file_in, file_out=args.file_out)
+    main(file_in=args.file_in, file_out=args.file_out, max_mb=args.max_mb, tmp_dir=args.tmp_dir,
+         sorter=args.sorter, num_procs=args.num_procs)
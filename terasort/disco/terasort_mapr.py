@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Sort TeraSort records from a Disco tag by their 10-byte keys. Output .txt.
+Records from terasort/teragen.py are loaded with sort/disco/load.py.
+"""
+
+from __future__ import print_function
+import argparse
+import itertools
+import os
+import sys
+from disco.core import Job, result_iterator
+from disco.ddfs import DDFS
+from disco.func import chain_reader
+# Disco ships modules imported by the job module to the slave nodes.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from partition import range_partition, split_points
+
+# Record layout of terasort/teragen.py.
+KEY_BYTES = 10
+
+class TeraSort(Job):
+    """
+    Map each record to its key and value.
+    Reduce the records by sorting.
+    """
+
+    def map(self, line, params):
+        """
+        Map:
+        Slice the record at the fixed key width: (key, value)
+        """
+
+        yield (line[:KEY_BYTES], line[KEY_BYTES:])
+
+    def reduce(self, rows_iter, out, params):
+        """
+        Reduce:
+        Sort the (key, value) tuples of a key range.
+        """
+
+        for (key, value) in sorted(rows_iter):
+            out.add(key, value)
+        return None
+
+def sample_keys(tag, num_samples, num_blobs=10):
+    """
+    Sample about num_samples keys from the start of num_blobs evenly spaced blobs of a tag,
+    as TeraSort samples its input splits.
+    """
+    blobs = list(DDFS().blobs(tag))
+    blobs = blobs[::max(1, len(blobs) // num_blobs)][:num_blobs]
+    samples = []
+    for blob in blobs:
+        lines = itertools.islice(result_iterator([blob], reader=chain_reader), max(1, num_samples // len(blobs)))
+        samples.extend(line[:KEY_BYTES] for line in lines)
+    return samples
+
+def main(tag, file_out, partitions=1, num_samples=10**5):
+    """
+    Run TeraSort map-reduce job and write output.
+    Split points sampled from the input keys assign a range of keys to each reduce,
+    so concatenate the reduce outputs in order.
+    """
+
+    # Import since slave nodes do not have same namespace as master.
+    from terasort_mapr import TeraSort
+    params = {'split_points': split_points(sample_keys(tag, num_samples), partitions)}
+    job = TeraSort().run(input=[tag], map_reader=chain_reader,
+                         partitions=partitions, partition=range_partition, params=params)
+    results = job.wait(show=False)
+    rows = itertools.chain(*[result_iterator([result]) for result in results])
+    with open(file_out, 'wb') as f_out:
+        f_out.writelines(key + value for (key, value) in rows)
+    return None
+
+if __name__ == '__main__':
+
+    tag_default = "data:terasort"
+    file_out_default = "output.txt"
+    partitions_default = 1
+    num_samples_default = 10**5
+
+    parser = argparse.ArgumentParser(description="Sort TeraSort records from a Disco tag.")
+    parser.add_argument("--tag",
+                        default=tag_default,
+                        help="Input tag. Default: {default}".format(default=tag_default))
+    parser.add_argument("--file_out",
+                        default=file_out_default,
+                        help="Output file. Default: {default}".format(default=file_out_default))
+    parser.add_argument("--partitions",
+                        default=partitions_default,
+                        type=int,
+                        help=("Number of reduces, each sorting one range of keys."
+                              +" Default: {default}").format(default=partitions_default))
+    parser.add_argument("--num_samples",
+                        default=num_samples_default,
+                        type=int,
+                        help=("Number of input keys to sample for split points."
+                              +" Default: {default}").format(default=num_samples_default))
+    args = parser.parse_args()
+    print(args)
+
+    main(tag=args.tag, file_out=args.file_out, partitions=args.partitions, num_samples=args.num_samples)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""
+Mapper for TeraSort with Hadoop streaming.
+"""
+
+from __future__ import print_function
+import sys
+import os
+# Hadoop streaming ships streamio.py next to this script with -file,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import streamio
+
+# Record layout of terasort/teragen.py.
+RECORD_BYTES = 100
+KEY_BYTES = 10
+
+def main(stdin, stdout=sys.stdout):
+    """
+    Print records from standard in as 'key<TAB>value' so that Hadoop sorts by the key.
+    Records are fixed width, so blocks are sliced at record offsets instead of split into lines.
+    """
+    with streamio.BatchWriter(stdout) as writer:
+        for block in streamio.read_blocks(stdin):
+            if len(block) % RECORD_BYTES != 0:
+                raise ValueError(("Input block of {size} bytes is not whole {record_bytes}-byte records.").format(
+                    size=len(block), record_bytes=RECORD_BYTES))
+            writer.write(b''.join([block[idx:idx+KEY_BYTES] + b'\t' + block[idx+KEY_BYTES:idx+RECORD_BYTES]
+                                   for idx in range(0, len(block), RECORD_BYTES)]))
+    return None
+
+if __name__ == '__main__':
+    main(stdin=sys.stdin)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+"""
+Reducer for TeraSort with Hadoop streaming.
+"""
+
+from __future__ import print_function
+import sys
+import os
+# Hadoop streaming ships streamio.py next to this script with -file,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import streamio
+
+def main(stdin, stdout=sys.stdout):
+    """
+    Take 'key<TAB>value' lines sorted by key from Hadoop and return the records.
+    Records have no tabs, so removing every tab in a block restores them.
+    """
+    with streamio.BatchWriter(stdout) as writer:
+        for block in streamio.read_blocks(stdin):
+            writer.write(block.replace(b'\t', b''))
+    return None
+
+if __name__ == '__main__':
+    main(stdin=sys.stdin)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Module for MRJob.
+Sort TeraSort records from terasort/teragen.py by their 10-byte keys.
+Records are read and written as bytes, and passed between steps as 'key<TAB>value' without encoding.
+The local and inline runners sort all reducer input, so the outputs of the reducers, in order,
+are sorted. On Hadoop, use one reducer for one sorted output.
+Following https://pythonhosted.org/mrjob/guides/quickstart.html
+"""
+
+from mrjob.job import MRJob
+from mrjob.protocol import BytesProtocol, BytesValueProtocol
+
+# Record layout of terasort/teragen.py.
+KEY_BYTES = 10
+
+class MRTeraSort(MRJob):
+
+    INPUT_PROTOCOL = BytesValueProtocol
+    INTERNAL_PROTOCOL = BytesProtocol
+    OUTPUT_PROTOCOL = BytesValueProtocol
+
+    def mapper(self, _, record):
+        """
+        Slice the record, without its newline, into its key and value.
+        Hadoop sorts the keys before sending to the reducer.
+        """
+        yield (record[:KEY_BYTES], record[KEY_BYTES:])
+
+    def reducer(self, key, values):
+        """
+        Join the key and each of its values into records.
+        """
+        for value in values:
+            yield (None, key + value)
+
+if __name__ == '__main__':
+    MRTeraSort.run()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Generate TeraSort input, as TeraGen does: 100-byte records with a 10-byte random key and a 90-byte value.
+
+Records are in the ASCII layout of gensort -a, with a newline so that line-oriented frameworks can read them:
+    key (10 printable ASCII bytes) | 2 spaces | row id (32 hex digits) | 2 spaces | filler (53 letters) | newline
+Keys of rows in chunk c of CHUNK_RECORDS rows are drawn from (seed, c) alone,
+so files are written in parallel and the same seed gives the same records for any --num_files and --num_procs.
+"""
+
+from __future__ import print_function, division
+import argparse
+import multiprocessing
+import os
+import numpy as np
+
+# Record layout.
+RECORD_BYTES = 100
+KEY_BYTES = 10
+ROWID_DIGITS = 32
+FILLER_BYTES = RECORD_BYTES - KEY_BYTES - 2 - ROWID_DIGITS - 2 - 1
+
+# Keys are drawn from printable ASCII, ' ' to '~'.
+KEY_MIN = ord(' ')
+KEY_MAX = ord('~')
+
+# Rows per chunk. Each chunk's keys come from its own random stream.
+CHUNK_RECORDS = 2**16
+
+HEX_DIGITS = np.frombuffer(b'0123456789ABCDEF', dtype=np.uint8)
+
+def gen_records(seed, start, stop):
+    """
+    Return rows start to stop as an array of shape (stop - start, RECORD_BYTES).
+    """
+    records = np.empty((stop - start, RECORD_BYTES), dtype=np.uint8)
+    for chunk in range(start // CHUNK_RECORDS, (stop - 1) // CHUNK_RECORDS + 1):
+        rng = np.random.RandomState([seed, chunk])
+        keys = rng.randint(KEY_MIN, KEY_MAX + 1, size=(CHUNK_RECORDS, KEY_BYTES)).astype(np.uint8)
+        lo = max(start, chunk * CHUNK_RECORDS)
+        hi = min(stop, (chunk + 1) * CHUNK_RECORDS)
+        records[lo-start:hi-start, :KEY_BYTES] = keys[lo-chunk*CHUNK_RECORDS:hi-chunk*CHUNK_RECORDS]
+    rows = np.arange(start, stop, dtype=np.uint64)
+    pos = KEY_BYTES
+    records[:, pos:pos+2] = ord(' ')
+    pos += 2
+    # Row ids fit in 64 bits, so the first 16 of the 32 hex digits are zeros.
+    records[:, pos:pos+ROWID_DIGITS-16] = ord('0')
+    shifts = np.arange(60, -4, -4, dtype=np.uint64)
+    records[:, pos+ROWID_DIGITS-16:pos+ROWID_DIGITS] = HEX_DIGITS[(rows[:, np.newaxis] >> shifts) & np.uint64(0xf)]
+    pos += ROWID_DIGITS
+    records[:, pos:pos+2] = ord(' ')
+    pos += 2
+    records[:, pos:pos+FILLER_BYTES] = (ord('A') + (rows[:, np.newaxis] + np.arange(FILLER_BYTES, dtype=np.uint64)) % np.uint64(26))
+    records[:, -1] = ord('\n')
+    return records
+
+def gen_file(args):
+    """
+    Write rows start to stop to a file in chunks. Return the file and its number of rows.
+    """
+    (fname, seed, start, stop) = args
+    # Write whole chunks, so that each chunk's keys are drawn once.
+    bounds = [start] + list(range((start // CHUNK_RECORDS + 1) * CHUNK_RECORDS, stop, CHUNK_RECORDS)) + [stop]
+    with open(fname, 'wb') as f_out:
+        for (lo, hi) in zip(bounds[:-1], bounds[1:]):
+            if hi > lo:
+                f_out.write(gen_records(seed, lo, hi).tobytes())
+    return (fname, stop - start)
+
+def main(dir_out, num_records, num_files=1, seed=0, num_procs=1):
+    """
+    Write num_records records to num_files files in dir_out, in parallel.
+    File i has rows i*num_records//num_files to (i+1)*num_records//num_files.
+    Return the files.
+    """
+    if not os.path.isdir(dir_out):
+        os.makedirs(dir_out)
+    bounds = [idx * num_records // num_files for idx in range(num_files + 1)]
+    gen_args = [(os.path.join(dir_out, ("part_{idx:05d}.txt").format(idx=idx)), seed, bounds[idx], bounds[idx+1])
+                for idx in range(num_files)]
+    pool = multiprocessing.Pool(processes=num_procs)
+    try:
+        fnames = [fname for (fname, _) in pool.map(gen_file, gen_args, chunksize=1)]
+    finally:
+        pool.close()
+        pool.join()
+    print(("INFO: Wrote {num} records of {size} bytes to {num_files} files in {dir_out}").format(
+        num=num_records, size=RECORD_BYTES, num_files=num_files, dir_out=dir_out))
+    return fnames
+
+if __name__ == '__main__':
+
+    arg_default_map = {}
+    arg_default_map['dir_out'] = 'teragen'
+    arg_default_map['num_records'] = 10**6
+    arg_default_map['num_files'] = multiprocessing.cpu_count()
+    arg_default_map['seed'] = 0
+    arg_default_map['num_procs'] = multiprocessing.cpu_count()
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Generate TeraSort input of 100-byte records, as TeraGen does.")
+    parser.add_argument('--dir_out',
+                        default=arg_default_map['dir_out'],
+                        help=(("Output directory for part_NNNNN.txt files.\n"
+                               +"Default: {default}").format(default=arg_default_map['dir_out'])))
+    parser.add_argument('--num_records',
+                        type=int,
+                        default=arg_default_map['num_records'],
+                        help=(("Number of 100-byte records, e.g. 10**7 for 1 GB.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_records'])))
+    parser.add_argument('--num_files',
+                        type=int,
+                        default=arg_default_map['num_files'],
+                        help=(("Number of output files.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_files'])))
+    parser.add_argument('--seed',
+                        type=int,
+                        default=arg_default_map['seed'],
+                        help=(("Random seed.\n"
+                               +"Default: {default}").format(default=arg_default_map['seed'])))
+    parser.add_argument('--num_procs',
+                        type=int,
+                        default=arg_default_map['num_procs'],
+                        help=(("Number of worker processes.\n"
+                               +"Default: {default}").format(default=arg_default_map['num_procs'])))
+    args = parser.parse_args()
+    print(args)
+
+    main(dir_out=args.dir_out, num_records=args.num_records, num_files=args.num_files,
+         seed=args.seed, num_procs=args.num_procs)
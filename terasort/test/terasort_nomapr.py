@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Sort TeraSort records without map-reduce and output to a .txt file
+to check the map-reduce implementations.
+Records are 100 bytes with a 10-byte key, as written by terasort/teragen.py,
+so they are sliced from the input at fixed offsets instead of parsed as lines.
+Records are sorted by key; records with equal keys keep their input order.
+"""
+
+from __future__ import print_function
+import argparse
+import operator
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
+# Record layout of terasort/teragen.py.
+RECORD_BYTES = 100
+KEY_BYTES = 10
+
+# Records per write of sorted output with the numpy sorter.
+WRITE_RECORDS = 2**18
+
+def read_records(files_in):
+    """
+    Read the files into one buffer. Return the buffer and the number of records.
+    Raise ValueError if the data is not whole records.
+    """
+    # Import here so that the python sorter does not need numpy.
+    import npsort
+    (buf, size) = npsort.read_ranges([(fname, 0, None) for fname in files_in])
+    if size % RECORD_BYTES != 0:
+        raise ValueError(("Input of {size} bytes is not whole {record_bytes}-byte records.").format(
+            size=size, record_bytes=RECORD_BYTES))
+    return (buf, size // RECORD_BYTES)
+
+def main(files_in, file_out, sorter='numpy'):
+    """
+    Read in records, sort records by key, write out sorted records.
+    If sorter is 'numpy', sort by the key bytes viewed in place as big-endian integers.
+    Otherwise slice the records into a list and sort with Python's sort.
+    Output is byte-identical either way.
+    """
+
+    if sorter == 'numpy':
+        import numpy as np
+        (buf, num_records) = read_records(files_in)
+        # The first 8 and last 2 bytes of each key as big-endian integers compare as the key does.
+        key_hi = np.ndarray(shape=(num_records,), dtype='>u8', buffer=buf, offset=0, strides=(RECORD_BYTES,))
+        key_lo = np.ndarray(shape=(num_records,), dtype='>u2', buffer=buf, offset=8, strides=(RECORD_BYTES,))
+        order = np.lexsort((key_lo, key_hi))
+        records = buf[:num_records*RECORD_BYTES].reshape(num_records, RECORD_BYTES)
+        with open(file_out, 'wb') as f_out:
+            for idx in range(0, num_records, WRITE_RECORDS):
+                f_out.write(records[order[idx:idx+WRITE_RECORDS]].tobytes())
+    else:
+        data = []
+        for fname in files_in:
+            with open(fname, 'rb') as f_in:
+                data.append(f_in.read())
+        data = b''.join(data)
+        if len(data) % RECORD_BYTES != 0:
+            raise ValueError(("Input of {size} bytes is not whole {record_bytes}-byte records.").format(
+                size=len(data), record_bytes=RECORD_BYTES))
+        records = [data[idx:idx+RECORD_BYTES] for idx in range(0, len(data), RECORD_BYTES)]
+        records.sort(key=operator.itemgetter(slice(0, KEY_BYTES)))
+        with open(file_out, 'wb') as f_out:
+            f_out.writelines(records)
+
+    return None
+
+if __name__ == '__main__':
+
+    files_in_default = ["teragen/part_00000.txt"]
+    file_out_default = "output.txt"
+    sorter_default = 'numpy'
+
+    parser = argparse.ArgumentParser(description="Sort TeraSort records without map-reduce.")
+    parser.add_argument("--files_in",
+                        default=files_in_default,
+                        nargs='+',
+                        help="Input files from teragen.py. Default: {default}".format(default=files_in_default))
+    parser.add_argument("--file_out",
+                        default=file_out_default,
+                        help="Output file. Default: {default}".format(default=file_out_default))
+    parser.add_argument("--sorter",
+                        default=sorter_default,
+                        choices=['python', 'numpy'],
+                        help=("Sort records by the key bytes as NumPy integers, or by sliced keys"
+                              +" with Python's sort. Default: {default}").format(default=sorter_default))
+    args = parser.parse_args()
+    print(args)
+
+    main(files_in=args.files_in, file_out=args.file_out, sorter=args.sorter)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Benchmark CountWords.reduce against the previous sort-then-tally reduce.
+Report reduce time and peak RSS of each in a separate process.
+"""
+
+from __future__ import print_function, division
+import argparse
+import multiprocessing
+import resource
+import time
+from disco.util import kvgroup
+from count_words_mapr import CountWords
+
+class Sink(object):
+    """
+    Stand-in for the Disco reduce output. Count records added.
+    """
+
+    def __init__(self):
+        """
+        Initialize.
+        """
+        self.num_records = 0
+        return None
+
+    def add(self, key, value):
+        """
+        Count a record.
+        """
+        self.num_records += 1
+        return None
+
+def reduce_sorted(rows_iter, out, params):
+    """
+    Previous CountWords.reduce: sort all (word, 1) tuples then tally.
+    """
+    for (word, count) in kvgroup(sorted(rows_iter)):
+        out.add(word, sum(count))
+    return None
+
+def iter_rows(file_in, job, params):
+    """
+    Yield the map output of a file, as the reduce would receive it.
+    """
+    with open(file_in, 'rb') as f_in:
+        for line in f_in:
+            for row in job.map(line, params):
+                yield row
+
+def run(impl, file_in, params, queue):
+    """
+    Run one reduce implementation and put its time and peak RSS on the queue.
+    """
+    job = CountWords()
+    reduce_fn = job.reduce if impl == 'hash_spill' else reduce_sorted
+    out = Sink()
+    time_start = time.time()
+    reduce_fn(iter_rows(file_in, job, params), out, params)
+    seconds = time.time() - time_start
+    # Linux reports ru_maxrss in KB.
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    queue.put((impl, out.num_records, seconds, peak_rss_mb))
+    return None
+
+def main(file_in, reduce_max_mb):
+    """
+    Run each reduce implementation in its own process and print a comparison.
+    """
+    params = {'reduce_max_mb': reduce_max_mb}
+    print(("{impl:<12} {records:>12} {seconds:>9} {rss:>12}").format(
+        impl='reduce', records='words', seconds='seconds', rss='peak RSS MB'))
+    for impl in ['sorted', 'hash_spill']:
+        queue = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=run, args=(impl, file_in, params, queue))
+        proc.start()
+        (impl, num_records, seconds, peak_rss_mb) = queue.get()
+        proc.join()
+        print(("{impl:<12} {records:>12d} {seconds:>9.2f} {rss:>12.1f}").format(
+            impl=impl, records=num_records, seconds=seconds, rss=peak_rss_mb))
+    return None
+
+if __name__ == '__main__':
+
+    file_in_default = "input.txt"
+    reduce_max_mb_default = 256
+
+    parser = argparse.ArgumentParser(description="Benchmark CountWords.reduce time and peak RSS.")
+    parser.add_argument("--file_in",
+                        default=file_in_default,
+                        help="Input file. Default: {default}".format(default=file_in_default))
+    parser.add_argument("--reduce_max_mb",
+                        default=reduce_max_mb_default,
+                        type=float,
+                        help=("Memory budget in MB for the reduce hash table before spilling to disk."
+                              +" Default: {default}").format(default=reduce_max_mb_default))
+    args = parser.parse_args()
+    print(args)
+
+    main(file_in=args.file_in, reduce_max_mb=args.reduce_max_mb)
@@ -6,13 +6,22 @@ Count words from a Disco tag. Output to .csv.
 from __future__ import print_function
 import argparse
 import csv
+import heapq
+import os
+import sys
 from disco.core import Job, result_iterator
-from disco.util import kvgroup
 from disco.func import chain_reader
+# Disco ships modules imported by the job module to the slave nodes.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import sparseindex
+import spill
+import topk
+from partition import hash_partition
 
 class CountWords(Job):
     """
     Map each word to a '1'.
+    Combine the tallies within each map.
     Reduce the tallies to count the words.
     """
 
@@ -26,36 +35,136 @@ class CountWords(Job):
         for word in line.split():
             yield (word, 1)
 
+    def combiner(self, word, count, buf, done, params):
+        """
+        Combine:
+        Tally (word, count) tuples of a map partition in buf.
+        Output the tallies when buf holds params['combine_max_keys'] words (default 2**20)
+        and when the map is done.
+        """
+
+        if done:
+            return buf.items()
+        if word in buf:
+            buf[word] += count
+        else:
+            buf[word] = count
+            if len(buf) >= params.get('combine_max_keys', 2**20):
+                tallies = list(buf.items())
+                buf.clear()
+                return tallies
+        return None
+
     def reduce(self, rows_iter, out, params):
         """
         Reduce:
-        Sort all (word, 1) tuples then tally.
+        Tally all (word, count) tuples in a hash table
+        then output the tallies sorted by word.
+        If the table exceeds params['reduce_max_mb'] megabytes,
+        spill it to disk as a sorted run and merge the runs at end.
         """
-        
-        # kvgroup requires consecutive keys that compare as equal
-        # in order to combine values.
-        for (word, count) in kvgroup(sorted(rows_iter)):
-            out.add(word, sum(count))
+
+        max_bytes = int(params['reduce_max_mb'] * 2**20)
+        with spill.SpillCounter(max_bytes=max_bytes) as counter:
+            counter.update(rows_iter)
+            for (word, total) in counter.items():
+                out.add(word, total)
+        return None
+
+class CountWordsTopK(CountWords):
+    """
+    Map each word to a '1'.
+    Count the words of each map partition in a Space-Saving sketch of
+    params['capacity'] counters instead of tallying every word.
+    Reduce the sketches to the top params['top_k'] words with error bounds.
+    """
+
+    def combiner(self, word, count, buf, done, params):
+        """
+        Combine:
+        Count (word, count) tuples of a map partition in a sketch held in buf.
+        When the map is done, output the sketch as one tuple:
+        (None, (total, [(word, count, error), ...]))
+        """
+
+        if 'sketch' not in buf:
+            buf['sketch'] = topk.SpaceSaving(capacity=params['capacity'])
+        sketch = buf['sketch']
+        if done:
+            return [(None, (sketch.total, sketch.rows()))]
+        sketch.add(word, count)
+        return None
+
+    def reduce(self, rows_iter, out, params):
+        """
+        Reduce:
+        Merge the sketches of the partition and output the top words as
+        (word, (count, error)) tuples, where count - error <= true count <= count.
+        """
+
+        capacity = params['capacity']
+        merged = topk.merge((topk.SpaceSaving.from_rows(rows, capacity=capacity, total=total)
+                             for (_, (total, rows)) in rows_iter), capacity=capacity)
+        for (word, count, error) in merged.top(params['top_k']):
+            out.add(word, (count, error))
         return None
 
-def main(tag, file_out):
+def main(tag, file_out, reduce_max_mb=256, partitions=1, combine_max_keys=2**20,
+         top_k=None, capacity=2**14, index_every=None):
     """
     Run CountWords map-reduce job and write output.
+    Words are hash partitioned across reduces. Each reduce's output is sorted,
+    so merge the reduce outputs to write all words sorted.
+    If top_k, run CountWordsTopK instead and write the top_k words
+    by descending count as word, count, error.
+    If index_every, also write a sparse index of every index_every-th word to file_out + '.idx'
+    for lookups with common/sparseindex.py.
     """
 
+    if top_k and index_every:
+        raise ValueError("The top K words are ordered by count, not by word. Omit index_every.")
     # Import since slave nodes do not have same namespace as master.
-    from count_words_mapr import CountWords
-    job = CountWords().run(input=[tag], map_reader=chain_reader)
+    from count_words_mapr import CountWords, CountWordsTopK
+    if top_k:
+        job = CountWordsTopK().run(input=[tag], map_reader=chain_reader,
+                                   partitions=partitions, partition=hash_partition,
+                                   params={'top_k': top_k, 'capacity': capacity})
+    else:
+        job = CountWords().run(input=[tag], map_reader=chain_reader,
+                               partitions=partitions, partition=hash_partition,
+                               params={'reduce_max_mb': reduce_max_mb,
+                                       'combine_max_keys': combine_max_keys})
+    results = job.wait(show=False)
     with open(file_out, 'w') as f_out:
         writer = csv.writer(f_out, quoting=csv.QUOTE_NONNUMERIC)
-        for (word, total) in result_iterator(job.wait(show=False)):
-            writer.writerow([word, total])
+        if top_k:
+            # Partitions hold disjoint words, so the top words overall are among each partition's top words.
+            rows = [(word, count, error) for (word, (count, error)) in result_iterator(results)]
+            rows.sort(key=lambda row: (-row[1], row[0]))
+            for row in rows[:top_k]:
+                writer.writerow(list(row))
+        else:
+            index = None
+            if index_every:
+                index = sparseindex.IndexWriter(f_out, sparseindex.index_path(file_out), every=index_every)
+            for (word, total) in heapq.merge(*[result_iterator([result]) for result in results]):
+                if index is not None:
+                    index.mark(word)
+                writer.writerow([word, total])
+            if index is not None:
+                index.close()
     return None
 
 if __name__ == '__main__':
 
     tag_default = "data:count_words"
     file_out_default = "output.csv"
+    reduce_max_mb_default = 256
+    partitions_default = 1
+    combine_max_keys_default = 2**20
+    top_k_default = None
+    capacity_default = 2**14
+    index_every_default = None
 
     parser = argparse.ArgumentParser(description="Count words from a tagged Disco data set using map-reduce.")
     parser.add_argument("--tag",
@@ -64,7 +173,39 @@ if __name__ == '__main__':
     parser.add_argument("--file_out",
                         default=file_out_default,
                         help="Output file. Default: {default}".format(default=file_out_default))
+    parser.add_argument("--reduce_max_mb",
+                        default=reduce_max_mb_default,
+                        type=float,
+                        help=("Memory budget in MB for the reduce hash table before spilling to disk."
+                              +" Default: {default}").format(default=reduce_max_mb_default))
+    parser.add_argument("--partitions",
+                        default=partitions_default,
+                        type=int,
+                        help=("Number of reduce partitions. Words are assigned to partitions by hash."
+                              +" Default: {default}").format(default=partitions_default))
+    parser.add_argument("--combine_max_keys",
+                        default=combine_max_keys_default,
+                        type=int,
+                        help=("Maximum distinct words held by the combiner of each map partition before"
+                              +" outputting its tallies. Default: {default}").format(default=combine_max_keys_default))
+    parser.add_argument("--top_k",
+                        default=top_k_default,
+                        type=int,
+                        help=("If set, output only the top K words with error bounds, counted in bounded memory"
+                              +" with Space-Saving sketches. Default: {default}").format(default=top_k_default))
+    parser.add_argument("--capacity",
+                        default=capacity_default,
+                        type=int,
+                        help=("Counters per sketch with --top_k. Larger capacities give tighter error bounds."
+                              +" Default: {default}").format(default=capacity_default))
+    parser.add_argument("--index_every",
+                        default=index_every_default,
+                        type=int,
+                        help=("If set, also write a sparse index of every Nth word to file_out + '.idx'"
+                              +" for lookups with common/sparseindex.py --format csv. Default: {default}").format(default=index_every_default))
     args = parser.parse_args()
     print(args)
     
-    main(tag=args.tag, file_out=args.file_out)
+    main(tag=args.tag, file_out=args.file_out, reduce_max_mb=args.reduce_max_mb,
+         partitions=args.partitions, combine_max_keys=args.combine_max_keys,
+         top_k=args.top_k, capacity=args.capacity, index_every=args.index_every)
@@ -5,31 +5,62 @@ Combiner for wordcount with Hadoop streaming.
 
 from __future__ import print_function
 import sys
+import os
+import argparse
+try:
+    # Python 2: pair up columns without building a list of tuples.
+    from itertools import izip as zip
+except ImportError:
+    pass
+# Hadoop streaming ships streamio.py and spill.py next to this script with -file,
+# otherwise import them from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import spill
+import streamio
 
-def main(stdin):
+def main(stdin, stdout=sys.stdout, max_mb=256, max_runs=64, tmp_dir=None):
     """
-    Take unsorted standard input from mapper, sort the block,
-    and print the aggregated word-count pairs.
+    Take unsorted standard input from mapper, tally the counts by word
+    in a hash table, and print the aggregated word-count pairs sorted by word.
+    If the distinct words exceed max_mb megabytes, spill them to sorted runs
+    on local disk and merge the runs at end.
+    At most max_runs run files are kept open; beyond that they are merged into one.
     """
-    (word, count) = (None, 0)
-    for line in sorted(stdin):
-        (new_word, new_count) = line.split()
-        new_count = int(new_count)
-        # If we've seen this word before, continue tally,...
-        if new_word == word:
-            count += new_count
-        # ...otherwise...
-        else:
-            # ...print the current tally if not at start...
-            if word != None:
-                print(("{word}\t{count}").format(word=word, count=count))
-            # ...and reset the tally.
-            count = new_count
-        # Track the last word seen.
-        word = new_word
-    # At end, print the last tally.
-    print(("{word}\t{count}").format(word=word, count=count))
+    with spill.SpillCounter(max_bytes=int(max_mb * 2**20), max_runs=max_runs, tmp_dir=tmp_dir) as counter:
+        for (words, counts) in streamio.read_columns(stdin):
+            counter.update(zip(words, map(int, counts)))
+        with streamio.BatchWriter(stdout) as writer:
+            (words, counts) = ([], [])
+            for (word, count) in counter.items():
+                words.append(word)
+                counts.append(b'%d' % count)
+                if len(words) >= 2**14:
+                    writer.write_columns(words, counts)
+                    (words, counts) = ([], [])
+            writer.write_columns(words, counts)
     return None
 
 if __name__ == '__main__':
-    main(stdin=sys.stdin)
+
+    max_mb_default = 256
+    max_runs_default = 64
+    tmp_dir_default = None
+
+    parser = argparse.ArgumentParser(description="Combiner for wordcount with Hadoop streaming.")
+    parser.add_argument("--max_mb",
+                        default=max_mb_default,
+                        type=float,
+                        help=("Memory budget in megabytes for distinct words held before spilling"
+                              +" a sorted run to disk. Default: {default}").format(default=max_mb_default))
+    parser.add_argument("--max_runs",
+                        default=max_runs_default,
+                        type=int,
+                        help=("Maximum number of spilled runs kept before merging them into one."
+                              +" Default: {default}").format(default=max_runs_default))
+    parser.add_argument("--tmp_dir",
+                        default=tmp_dir_default,
+                        help=("Local directory for spilled runs."
+                              +" Default: {default} (system temporary directory)").format(default=tmp_dir_default))
+    args = parser.parse_args()
+
+    main(stdin=sys.stdin, max_mb=args.max_mb, max_runs=args.max_runs, tmp_dir=args.tmp_dir)
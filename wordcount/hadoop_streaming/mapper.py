@@ -5,17 +5,78 @@ Mapper for count words with Hadoop streaming.
 
 from __future__ import print_function
 import sys
+import os
+import argparse
+# Hadoop streaming ships streamio.py next to this script with -file,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import streamio
 
-def main(stdin):
+def flush(tallies, writer):
     """
-    Read in line. Parse line into list of words.
-    Print word as a single count.
+    Write the partial tallies as word-count pairs and empty the table.
     """
-    for line in stdin:
-        words = line.split()
-        for word in words:
-            print(("{word}\t{count}").format(word=word, count=1))
+    words = list(tallies.keys())
+    writer.write_columns(words, [b'%d' % tallies[word] for word in words])
+    tallies.clear()
+    return None
+
+def report(counter, amount):
+    """
+    Increment a Hadoop streaming counter by writing to standard error.
+    """
+    print(("reporter:counter:wordcount,{counter},{amount}").format(counter=counter, amount=amount),
+          file=sys.stderr)
+    return None
+
+def main(stdin, stdout=sys.stdout, max_keys=0):
+    """
+    Read in blocks of lines. Parse each block into list of words.
+    If max_keys is 0, print word as a single count.
+    Otherwise, tally words in memory (in-mapper combining) and print the
+    partial tallies whenever the table holds max_keys distinct words, and at end.
+    """
+    with streamio.BatchWriter(stdout) as writer:
+        if max_keys <= 0:
+            for block in streamio.read_blocks(stdin):
+                words = block.split()
+                if len(words) > 0:
+                    writer.write(b'\t1\n'.join(words) + b'\t1\n')
+            return None
+        # Bound memory by the number of distinct words held, not the number of words read.
+        tallies = {}
+        (num_keys, num_flushes) = (0, 0)
+        for block in streamio.read_blocks(stdin):
+            for word in block.split():
+                if word in tallies:
+                    tallies[word] += 1
+                else:
+                    # Flush before the table outgrows its bound.
+                    if len(tallies) >= max_keys:
+                        num_keys += len(tallies)
+                        num_flushes += 1
+                        flush(tallies=tallies, writer=writer)
+                    tallies[word] = 1
+        # At end, flush the last partial tallies.
+        num_keys += len(tallies)
+        num_flushes += 1
+        flush(tallies=tallies, writer=writer)
+    # Keys emitted summed over all flushes. A word flushed more than once is counted each time.
+    report(counter='flushed_keys', amount=num_keys)
+    report(counter='flushes', amount=num_flushes)
     return None
 
 if __name__ == '__main__':
-    main(stdin=sys.stdin)
+
+    max_keys_default = 0
+
+    parser = argparse.ArgumentParser(description="Mapper for count words with Hadoop streaming.")
+    parser.add_argument("--max_keys",
+                        default=max_keys_default,
+                        type=int,
+                        help=("Combine counts in the mapper, holding at most this many distinct words"
+                              +" in memory before flushing. 0 prints every word with a single count."
+                              +" Default: {default}").format(default=max_keys_default))
+    args = parser.parse_args()
+
+    main(stdin=sys.stdin, max_keys=args.max_keys)
@@ -5,29 +5,65 @@ Reducer for count words with Hadoop streaming.
 
 from __future__ import print_function
 import sys
+import os
+try:
+    # Python 2: pair up columns without building a list of tuples.
+    from itertools import izip as zip
+except ImportError:
+    pass
+# Hadoop streaming ships streamio.py next to this script with -file,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import streamio
 
-def main(stdin):
+def tally(words, counts):
     """
-    Aggregate the word-count pairs.
+    Tally a block of word-count pairs sorted by word.
+    Return lists of the distinct words and their totals, in order.
     """
-    (word, count) = (None, 0)
-    for line in stdin:
-        (new_word, new_count) = line.split()
+    # With only single counts, as from a mapper without a combiner,
+    # a word's total is the length of its run of consecutive pairs.
+    # Find where each run ends without a Python loop over the pairs.
+    if counts.count(b'1') == len(counts):
+        ends = sorted(dict(zip(words, range(len(words)))).values())
+        starts = [-1]
+        starts.extend(ends[:-1])
+        return ([words[end] for end in ends], [end - start for (start, end) in zip(starts, ends)])
+    (distinct, totals) = ([], [])
+    word = None
+    for (new_word, new_count) in zip(words, counts):
         new_count = int(new_count)
         # If we've seen this word before, continue tally,...
         if new_word == word:
-            count += new_count
-        # ...otherwise...
+            totals[-1] += new_count
+        # ...otherwise start a new tally.
         else:
-            # ...print the current tally if not at start...
-            if word != None:
-                print(("{word}\t{count}").format(word=word, count=count))
-            # ...and reset the tally.
-            count = new_count
+            distinct.append(new_word)
+            totals.append(new_count)
         # Track the last word seen.
         word = new_word
-    # At end, print the last tally.
-    print(("{word}\t{count}").format(word=word, count=count))
+    return (distinct, totals)
+
+def main(stdin, stdout=sys.stdout):
+    """
+    Aggregate the word-count pairs.
+    """
+    (word, count) = (None, 0)
+    with streamio.BatchWriter(stdout) as writer:
+        for (new_words, new_counts) in streamio.read_columns(stdin):
+            (words, counts) = tally(new_words, new_counts)
+            # If the block starts with the last word seen, continue tally,...
+            if words[0] == word:
+                counts[0] += count
+            # ...otherwise print the current tally if not at start.
+            elif word != None:
+                writer.write_columns([word], [b'%d' % count])
+            # The last word of a block may continue in the next block.
+            writer.write_columns(words[:-1], [b'%d' % count for count in counts[:-1]])
+            (word, count) = (words[-1], counts[-1])
+        # At end, print the last tally.
+        if word != None:
+            writer.write_columns([word], [b'%d' % count])
     return None
 
 if __name__ == '__main__':
@@ -4,10 +4,43 @@ Module for MRJob.
 Following https://pythonhosted.org/mrjob/guides/quickstart.html
 """
 
+import os
+import sys
 from mrjob.job import MRJob
+# Ship mrprotocol.py with the job, e.g. --py-files common/mrprotocol.py,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import mrprotocol
 
 class MRWordcount(MRJob):
 
+    def configure_args(self):
+        """
+        Add the protocol between steps.
+        """
+        super(MRWordcount, self).configure_args()
+        self.add_passthru_arg('--protocol', choices=sorted(mrprotocol.PROTOCOLS), default='json',
+                              help=("Encoding of words and counts: 'json' (mrjob's default), 'raw' text,"
+                                    +" or 'binary' bytes. See common/mrprotocol.py."))
+
+    def input_protocol(self):
+        """
+        Read input lines with the selected protocol.
+        """
+        return mrprotocol.PROTOCOLS[self.options.protocol][0]()
+
+    def internal_protocol(self):
+        """
+        Pass (key, count) between steps with the selected protocol.
+        """
+        return mrprotocol.PROTOCOLS[self.options.protocol][1]()
+
+    def output_protocol(self):
+        """
+        Write (key, count) output with the selected protocol.
+        """
+        return mrprotocol.PROTOCOLS[self.options.protocol][2]()
+
     def mapper(self, _, line):
         """
         Read in line. Parse line into list of words.
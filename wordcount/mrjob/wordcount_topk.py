@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Module for MRJob.
+Count only the top K words in bounded memory with Space-Saving sketches.
+Each mapper counts its words in a sketch and outputs the sketch once.
+One reducer merges the sketches and outputs the top K words as
+word, [count, error], where count - error <= true count <= count.
+Following https://pythonhosted.org/mrjob/guides/quickstart.html
+"""
+
+import os
+import sys
+from mrjob.job import MRJob
+# Ship topk.py with the job, e.g. --py-files common/topk.py,
+# otherwise import it from the repository's common directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import topk
+
+class MRWordcountTopK(MRJob):
+
+    def configure_args(self):
+        """
+        Add the number of top words and the sketch capacity.
+        """
+        super(MRWordcountTopK, self).configure_args()
+        self.add_passthru_arg('--top_k', type=int, default=1000,
+                              help="Number of most frequent words to output.")
+        self.add_passthru_arg('--capacity', type=int, default=2**14,
+                              help=("Counters per sketch. Memory per task is O(capacity)."
+                                    +" Larger capacities give tighter error bounds."))
+
+    def mapper_init(self):
+        """
+        Make an empty sketch for this mapper.
+        """
+        self.sketch = topk.SpaceSaving(capacity=self.options.capacity)
+
+    def mapper(self, _, line):
+        """
+        Read in line. Parse line into list of words.
+        Count the words in the sketch.
+        """
+        self.sketch.update(line.split())
+        return iter(())
+
+    def mapper_final(self):
+        """
+        Yield the sketch as rows of (word, count, error) with the number of words counted.
+        All sketches go to one reducer.
+        """
+        yield (None, [self.sketch.total, self.sketch.rows()])
+
+    def reducer(self, _, sketches):
+        """
+        Merge the sketches and yield the top K words with their counts and errors.
+        """
+        capacity = self.options.capacity
+        merged = topk.merge((topk.SpaceSaving.from_rows(rows, capacity=capacity, total=total)
+                             for (total, rows) in sketches), capacity=capacity)
+        for (word, count, error) in merged.top(self.options.top_k):
+            yield (word, [count, error])
+
+if __name__ == '__main__':
+    MRWordcountTopK.run()
@@ -2,39 +2,118 @@
 """
 Count words without map-reduce from a .txt file and output to .csv
 as check for map-reduce implentation.
+Words are bytes, written as Latin-1 text, which maps each byte to one character,
+so that the output is byte-identical under Python 2 and 3 and to wordcount/disco/output.csv.
+Compare the output to a map-reduce output with --file_compare.
 """
 
 from __future__ import print_function
 import argparse
+import collections
 import csv
+import filecmp
+import io
+import multiprocessing
+import os
+import sys
 
-def main(file_in, file_out):
+def chunk_offsets(file_in, num_chunks):
     """
-    Read in lines, flatten list of lines to list of words,
-    sort and tally words, write out tallies.
+    Split a file into byte ranges that start and end at line boundaries.
+    Return a list of (start, stop) offsets.
     """
+    size = os.path.getsize(file_in)
+    bounds = [0]
+    with open(file_in, 'rb') as f_in:
+        for idx in range(1, num_chunks):
+            # Seek to the approximate boundary then advance to the next line.
+            offset = max(size * idx // num_chunks, bounds[-1])
+            f_in.seek(offset)
+            if offset > 0:
+                f_in.readline()
+            bounds.append(f_in.tell())
+    bounds.append(size)
+    return [(start, stop) for (start, stop) in zip(bounds[:-1], bounds[1:]) if stop > start]
 
-    with open(file_in, 'r') as f_in:
-        word_lists = [line.split() for line in f_in]
+def count_chunk(file_in, start, stop):
+    """
+    Tally words in the lines within a byte range of a file.
+    """
+    counts = collections.Counter()
+    with open(file_in, 'rb') as f_in:
+        f_in.seek(start)
+        pos = start
+        for line in f_in:
+            counts.update(line.split())
+            pos += len(line)
+            if pos >= stop:
+                break
+    return counts
+
+def count_chunk_star(args):
+    """
+    Unpack arguments for count_chunk since Pool.imap passes a single argument.
+    """
+    return count_chunk(*args)
+
+def write_tallies(file_out, tallies):
+    """
+    Write (word, count) tallies with words as bytes to a .csv file as the Python 2 csv module writes them.
+    """
+    if bytes is str:
+        with open(file_out, 'wb') as f_out:
+            writer = csv.writer(f_out, quoting=csv.QUOTE_NONNUMERIC)
+            for (word, count) in tallies:
+                writer.writerow([word, count])
+    else:
+        # Decode losslessly so that the csv module writes the words' bytes unchanged.
+        with io.open(file_out, 'w', encoding='latin_1', newline='') as f_out:
+            writer = csv.writer(f_out, quoting=csv.QUOTE_NONNUMERIC)
+            for (word, count) in tallies:
+                writer.writerow([word.decode('latin_1'), count])
+    return None
 
-    # Flatten the list
-    # http://stackoverflow.com/questions/952914/\
-    # making-a-flat-list-out-of-list-of-lists-in-python
-    words = [word for word_list in word_lists for word in word_list]
-    counts = map(words.count, words)
-    tallies = sorted(set(zip(words, counts)))
+def main(file_in, file_out, num_procs=1, file_compare=None):
+    """
+    Read in lines and tally words in a single pass, write out tallies sorted by word.
+    If num_procs > 1, split the file at line boundaries, tally the chunks
+    in a process pool, and merge the tallies.
+    If file_compare is given, return whether the output is byte-identical to it.
+    """
 
-    with open(file_out, 'w') as f_out:
-        writer = csv.writer(f_out, quoting=csv.QUOTE_NONNUMERIC)
-        for (word, count) in tallies:
-            writer.writerow([word, count])
+    if num_procs <= 1:
+        counts = collections.Counter()
+        with open(file_in, 'rb') as f_in:
+            for line in f_in:
+                counts.update(line.split())
+    else:
+        # Use more chunks than processes to balance uneven lines.
+        chunks = [(file_in, start, stop) for (start, stop) in chunk_offsets(file_in, 4*num_procs)]
+        pool = multiprocessing.Pool(processes=num_procs)
+        try:
+            counts = collections.Counter()
+            for chunk_counts in pool.imap_unordered(count_chunk_star, chunks):
+                counts.update(chunk_counts)
+        finally:
+            pool.close()
+            pool.join()
+    tallies = sorted(counts.items())
 
+    write_tallies(file_out, tallies)
+
+    if file_compare is not None:
+        same = filecmp.cmp(file_out, file_compare, shallow=False)
+        print(("INFO: Output {file_out} {result} {file_compare}").format(
+            file_out=file_out, result='matches' if same else 'does NOT match', file_compare=file_compare))
+        return same
     return None
 
 if __name__ == '__main__':
-    
+
     file_in_default = "input.txt"
     file_out_default = "output.csv"
+    num_procs_default = 1
+    file_compare_default = None
 
     parser = argparse.ArgumentParser(description="Count words in a file without map-reduce.")
     parser.add_argument("--file_in",
@@ -43,7 +122,17 @@ if __name__ == '__main__':
     parser.add_argument("--file_out",
                         default=file_out_default,
                         help="Output file. Default: {default}".format(default=file_out_default))
+    parser.add_argument("--num_procs",
+                        default=num_procs_default,
+                        type=int,
+                        help=("Number of processes to count chunks of the file in parallel."
+                              +" Default: {default}").format(default=num_procs_default))
+    parser.add_argument("--file_compare",
+                        default=file_compare_default,
+                        help=("Output to compare byte for byte, e.g. ../disco/output.csv."
+                              +" Exit with status 1 if they differ. Default: {default}").format(default=file_compare_default))
     args = parser.parse_args()
     print(args)
-    
-    main(file_in=args.file_in, file_out=args.file_out)
+
+    same = main(file_in=args.file_in, file_out=args.file_out, num_procs=args.num_procs, file_compare=args.file_compare)
+    sys.exit(1 if same is False else 0)